@@ -0,0 +1,252 @@
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import chain, islice
+from typing import Iterable, Iterator, Sequence
+import multiprocessing
+import os
+
+import numpy as np
+
+from app.core.engine import CompiledFSM, NO_STATE
+
+
+ACCEPTED = 0
+REJECTED = 1
+NO_TRANSITION = 2
+INVALID_INPUT = 3
+
+STATUS_NAMES = ["Accepted", "Rejected", "No transition", "Invalid Input"]
+
+DEFAULT_SHARD_SIZE = 5000
+
+# Engine snapshot installed once per worker process by _init_worker
+_worker_engine: CompiledFSM | None = None
+
+
+@dataclass
+class BatchResult:
+    final_states: np.ndarray
+    statuses: np.ndarray
+    steps: np.ndarray
+    outputs: list[str] | None = None
+
+    def __len__(self):
+        return len(self.statuses)
+
+    def to_dicts(self, engine: CompiledFSM) -> list[dict]:
+        """Convert to the result dicts shown and exported by the batch tester"""
+        results = []
+        for i in range(len(self.statuses)):
+            status = int(self.statuses[i])
+            if status == INVALID_INPUT:
+                results.append({"final_state": "N/A", "output": "N/A", "status": STATUS_NAMES[status]})
+                continue
+            results.append({
+                "final_state": engine.state_names[self.final_states[i]],
+                "output": self.outputs[i] if self.outputs is not None else "",
+                "status": STATUS_NAMES[status]
+            })
+        return results
+
+
+def pack_inputs(engine: CompiledFSM, tests: Sequence[Sequence[str]]) -> tuple[np.ndarray, np.ndarray]:
+    """Encode tokenized inputs into a padded (n, max_len) symbol array plus lengths.
+
+    Unknown symbols and padding are both stored as ``engine.num_symbols``,
+    the extra column of the table returned by ``_build_tables``.
+    """
+    n = len(tests)
+    lengths = np.fromiter((len(test) for test in tests), dtype=np.int64, count=n)
+    total = int(lengths.sum())
+    max_len = int(lengths.max()) if n else 0
+
+    get = engine.symbol_index.get
+    unknown = engine.num_symbols
+    flat = np.fromiter((get(symbol, unknown) for symbol in chain.from_iterable(tests)),
+                       dtype=np.int32, count=total)
+
+    packed = np.full((n, max_len), unknown, dtype=np.int32)
+    if total:
+        rows = np.repeat(np.arange(n), lengths)
+        starts = np.cumsum(lengths) - lengths
+        cols = np.arange(total) - np.repeat(starts, lengths)
+        packed[rows, cols] = flat
+    return packed, lengths
+
+
+def _build_tables(engine: CompiledFSM) -> tuple[np.ndarray, np.ndarray, int]:
+    """Return (next_state, transition) matrices with an absorbing dead row and unknown column"""
+    num_states = engine.num_states
+    num_symbols = engine.num_symbols
+    dead = num_states
+
+    next_state = np.full((num_states + 1, num_symbols + 1), dead, dtype=np.int32)
+    transitions = np.full((num_states + 1, num_symbols + 1), NO_STATE, dtype=np.int32)
+    if num_states and num_symbols:
+        table = np.asarray(engine.next_state, dtype=np.int32).reshape(num_states, num_symbols)
+        next_state[:num_states, :num_symbols] = np.where(table == NO_STATE, dead, table)
+        transitions[:num_states, :num_symbols] = np.asarray(
+            engine.transition_table, dtype=np.int32).reshape(num_states, num_symbols)
+    return next_state, transitions, dead
+
+
+def run_batch(engine: CompiledFSM, tests: Sequence[Sequence[str]], mode: str = "Moore",
+              collect_outputs: bool = True) -> BatchResult:
+    """Run every tokenized test input in lockstep over a NumPy transition matrix.
+
+    Inputs are sorted by length so that the strings still running at step t
+    always form a prefix of the batch and each step is one fancy-indexed
+    lookup. The engine must have exactly one initial state.
+    """
+    initial = engine.initial_state
+    if initial == NO_STATE:
+        raise ValueError(engine.check_initial_state())
+
+    packed, lengths = pack_inputs(engine, tests)
+    n, max_len = packed.shape
+
+    statuses = np.full(n, REJECTED, dtype=np.int8)
+
+    valid = np.ones(engine.num_symbols + 1, dtype=bool)
+    valid[:engine.num_symbols] = engine.valid_symbols
+    valid[engine.num_symbols] = not engine.restricted_alphabet
+    in_range = np.arange(max_len) < lengths[:, None]
+    invalid = (~valid[packed] & in_range).any(axis=1)
+
+    next_state, transition_table, dead = _build_tables(engine)
+
+    order = np.argsort(-lengths, kind="stable")
+    packed = packed[order]
+    sorted_lengths = lengths[order]
+
+    state = np.full(n, initial, dtype=np.int32)
+    stuck = np.full(n, NO_STATE, dtype=np.int32)
+    steps = sorted_lengths.copy()
+    path = np.full((n, max_len), NO_STATE, dtype=np.int32) if collect_outputs else None
+
+    # Number of inputs still running at each step, since lengths are descending
+    active_counts = np.searchsorted(-sorted_lengths, -np.arange(max_len), side="left")
+
+    for t in range(max_len):
+        count = active_counts[t]
+        previous = state[:count]
+        symbols = packed[:count, t]
+        nxt = next_state[previous, symbols]
+
+        died = np.flatnonzero((nxt == dead) & (previous != dead))
+        if died.size:
+            stuck[died] = previous[died]
+            steps[died] = t
+
+        if path is not None:
+            path[:count, t] = transition_table[previous, symbols]
+        state[:count] = nxt
+
+    unsort = np.empty_like(order)
+    unsort[order] = np.arange(n)
+    state = state[unsort]
+    stuck = stuck[unsort]
+    steps = steps[unsort]
+
+    failed = state == dead
+    final_states = np.where(failed, stuck, state)
+    accepting = np.asarray(engine.accepting + [False], dtype=bool)
+    statuses[accepting[final_states]] = ACCEPTED
+    statuses[failed] = NO_TRANSITION
+    statuses[invalid] = INVALID_INPUT
+
+    outputs = None
+    if path is not None:
+        outputs = _collect_outputs(engine, path[unsort], steps, mode)
+
+    return BatchResult(final_states, statuses, steps, outputs)
+
+
+def _collect_outputs(engine: CompiledFSM, path: np.ndarray, steps: np.ndarray, mode: str) -> list[str]:
+    if mode.lower() == "mealy":
+        values = engine.transition_outputs
+    else:
+        values = [engine.state_outputs[destination] for destination in engine.transition_destinations]
+    table = np.asarray(values + [""], dtype=object)
+    # NO_STATE (-1) after the last step indexes the trailing empty string
+    labels = table[path]
+    return [",".join(labels[i, :steps[i]]) for i in range(len(steps))]
+
+
+def tokenize(line: str, delimiter: str = "") -> list[str]:
+    """Split one test line into symbols, per character when no delimiter is set"""
+    return list(line) if delimiter == "" else line.split(delimiter)
+
+
+def _init_worker(engine: CompiledFSM):
+    global _worker_engine
+    _worker_engine = engine
+
+
+def _run_shard(lines: list[str], delimiter: str, mode: str, collect_outputs: bool) -> BatchResult:
+    tests = [tokenize(line, delimiter) for line in lines]
+    return run_batch(_worker_engine, tests, mode, collect_outputs)
+
+
+def iter_shards(lines: Iterable[str], shard_size: int = DEFAULT_SHARD_SIZE) -> Iterator[tuple[int, list[str]]]:
+    """Cut an iterable of lines into (offset, lines) shards without materializing it"""
+    iterator = iter(lines)
+    offset = 0
+    while True:
+        shard = list(islice(iterator, shard_size))
+        if not shard:
+            return
+        yield offset, shard
+        offset += len(shard)
+
+
+def run_batch_parallel(engine: CompiledFSM, lines: Iterable[str], delimiter: str = "", mode: str = "Moore",
+                       workers: int | None = None, shard_size: int = DEFAULT_SHARD_SIZE,
+                       collect_outputs: bool = True) -> Iterator[tuple[int, list[str], BatchResult]]:
+    """Run raw test lines across a process pool, yielding (offset, lines, result) per shard.
+
+    The engine is pickled once per worker through the pool initializer and
+    only the raw lines of each shard travel to the workers. ``lines`` may be
+    a lazy iterable such as FileInputStream.lines(); at most two shards per
+    worker are in flight, so memory stays bounded. Shards are yielded in
+    completion order and ``offset`` is the index of the shard's first line.
+    Closing the generator early cancels the pending shards.
+    """
+    if engine.initial_state == NO_STATE:
+        raise ValueError(engine.check_initial_state())
+
+    workers = workers or os.cpu_count() or 1
+    shards = iter_shards(lines, shard_size)
+
+    if workers == 1:
+        _init_worker(engine)
+        for offset, shard in shards:
+            yield offset, shard, _run_shard(shard, delimiter, mode, collect_outputs)
+        return
+
+    first = next(shards, None)
+    if first is None:
+        return
+    second = next(shards, None)
+    if second is None:
+        _init_worker(engine)
+        yield first[0], first[1], _run_shard(first[1], delimiter, mode, collect_outputs)
+        return
+
+    # Spawned workers never inherit the GUI process' Qt state
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker, initargs=(engine,))
+    pending = {}
+    queued = chain([first, second], shards)
+    try:
+        for offset, shard in islice(queued, 2 * workers):
+            pending[pool.submit(_run_shard, shard, delimiter, mode, collect_outputs)] = (offset, shard)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                offset, shard = pending.pop(future)
+                yield offset, shard, future.result()
+                for next_offset, next_shard in islice(queued, 1):
+                    pending[pool.submit(_run_shard, next_shard, delimiter, mode, collect_outputs)] = (next_offset, next_shard)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
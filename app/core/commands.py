@@ -5,7 +5,13 @@ from app.ui.items.transition import TransitionItem
 from app.ui.items.comment import CommentItem
 from utils.constants import DEFAULT_MODEL_PATH
 from app.ui.dialogs.save_machine import SaveMachineDialog
+from app.core.engine import CompiledFSM
+from app.core.minimize import minimize_json
+from app.core.nfa import determinize_json
+from app.core.model import StateData, TransitionData
+from contextlib import contextmanager, nullcontext
 import json
+import zlib
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -14,10 +20,26 @@ if TYPE_CHECKING:
     from app.core.validator import FSMValidator
 
 
+# The undo history keeps at most UNDO_MAX_COMMANDS entries and about
+# UNDO_MAX_BYTES, dropping the oldest first. Only the newest
+# UNDO_LIVE_COMMANDS entries hold graphics items; older ones are compacted
+# to model data and rebuild their items when undone.
+UNDO_MAX_COMMANDS = 500
+UNDO_MAX_BYTES = 64 * 1024 * 1024
+UNDO_LIVE_COMMANDS = 20
+
+# Rough memory estimates used for the byte limit, measured with PyQt5
+COMMAND_BYTES = 256
+STATE_ITEM_BYTES = 5 * 1024
+TRANSITION_ITEM_BYTES = 24 * 1024      # Mostly the label's text document
+DATA_BYTES = 512
+
+
 class BaseCommand:
     logging_level: str = ""
     log: str = ""
     calling_class: str = ""
+    rebuilds_items: bool = False    # Replaces every model item with new ones built from JSON
 
     def __init__(self):
         pass
@@ -31,30 +53,134 @@ class BaseCommand:
     def redo(self):
         pass
 
+    def merge(self, command: "BaseCommand") -> bool:
+        """Fold ``command``, executed right after this one, into this entry"""
+        return False
+
+    def is_noop(self) -> bool:
+        """Whether undoing this entry would change nothing, e.g. after merges"""
+        return False
+
+    def compact(self):
+        """Drop references to graphics items, keeping what undo needs as data"""
+        pass
+
+    def estimated_size(self) -> int:
+        """Approximate memory kept alive by this entry, in bytes"""
+        return COMMAND_BYTES
+
+
+class MacroCommand(BaseCommand):
+    """Commands undone and redone together as one history entry.
+
+    Model notifications of the children are batched, so observers see one
+    change per execute, undo or redo.
+    """
+
+    def __init__(self, commands: list[BaseCommand], log: str = "", model: FSMModel = None):
+        super().__init__()
+        self.commands = commands
+        self.model = model
+        self.calling_class = commands[0].calling_class if commands else ""
+
+        self.logging_level = "INFO"
+        self.log = log or f"{len(commands)} commands"
+
+    def _batch(self):
+        return self.model.batch() if self.model is not None else nullcontext()
+
+    def execute(self):
+        with self._batch():
+            for command in self.commands:
+                command.execute()
+
+    def undo(self):
+        with self._batch():
+            for command in reversed(self.commands):
+                command.undo()
+
+    def redo(self):
+        with self._batch():
+            for command in self.commands:
+                command.redo()
+
+    def compact(self):
+        for command in self.commands:
+            command.compact()
+
+    def estimated_size(self) -> int:
+        return COMMAND_BYTES + sum(command.estimated_size() for command in self.commands)
+
 
 class CommandManager:
-    def __init__(self, logger: ActivityLogger, validator: "FSMValidator"):
+    def __init__(self, logger: ActivityLogger, validator: "FSMValidator", max_commands: int = UNDO_MAX_COMMANDS,
+                 max_bytes: int = UNDO_MAX_BYTES, live_commands: int = UNDO_LIVE_COMMANDS):
         self.undo_stack: list[BaseCommand] = []
         self.redo_stack: list[BaseCommand] = []
         self.logger = logger
         self.validator = validator
         self.redo_button:  QAction | None = None
         self.undo_button:  QAction | None = None
+        self.max_commands = max_commands
+        self.max_bytes = max_bytes
+        self.live_commands = live_commands
+        self._transaction: list[BaseCommand] | None = None
 
     def execute(self, command: BaseCommand):
         command.execute()
-        self.undo_stack.append(command)
+        if self._transaction is not None:
+            self._transaction.append(command)
+            return
+        self._record(command)
+
+    @contextmanager
+    def transaction(self, log: str, model: FSMModel = None):
+        """Record the commands executed inside as one MacroCommand.
+
+        Each command runs right away, but the group is logged and
+        validated once, and undone as a single step. Notifications of
+        ``model`` are batched until the transaction ends. Nested
+        transactions join the outermost one.
+        """
+        if self._transaction is not None:
+            yield
+            return
+        self._transaction = []
+        try:
+            with model.batch() if model is not None else nullcontext():
+                yield
+        finally:
+            commands, self._transaction = self._transaction, None
+            if len(commands) == 1:
+                self._record(commands[0])
+            elif commands:
+                self._record(MacroCommand(commands, log, model))
+
+    def _record(self, command: BaseCommand):
+        if self.undo_stack and self.undo_stack[-1].merge(command):
+            if self.undo_stack[-1].is_noop():
+                self.undo_stack.pop()
+        else:
+            self._push(command)
+            if command.rebuilds_items:
+                self._rebase()
         self.redo_stack.clear()
         self.redo_button.setEnabled(False)
-        self.undo_button.setEnabled(True)
+        self.undo_button.setEnabled(bool(self.undo_stack))
         self.logger.log(f"Command executed: {command.log}",
                         command.calling_class, command.logging_level)
         self.validator.validate()
 
     def undo(self):
         if len(self.undo_stack) > 0:
-            command = self.undo_stack.pop()
+            # Popped once undone, so a failing undo leaves the history intact
+            command = self.undo_stack[-1]
             command.undo()
+            self.undo_stack.pop()
+            if command.rebuilds_items:
+                # Later entries refer to items that no longer exist
+                self.redo_stack.clear()
+                self._rebase()
             self.redo_button.setEnabled(True)
             self.redo_stack.append(command)
             self.logger.log(f"Command undone: {command.log}",
@@ -64,14 +190,46 @@ class CommandManager:
 
     def redo(self):
         if len(self.redo_stack) > 0:
-            command = self.redo_stack.pop()
+            command = self.redo_stack[-1]
             command.redo()
-            self.undo_stack.append(command)
+            self.redo_stack.pop()
+            self._push(command)
+            if command.rebuilds_items:
+                self._rebase()
             self.logger.log(f"Command redone: {command.log}",
                             command.calling_class, command.logging_level)
         else:
             self.redo_button.setEnabled(False)
 
+    def clear(self):
+        """Forget the history, e.g. when another model is shown"""
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+        if self.undo_button is not None:
+            self.undo_button.setEnabled(False)
+        if self.redo_button is not None:
+            self.redo_button.setEnabled(False)
+
+    def _rebase(self):
+        # Compacted entries find their items by id, and ids survive the
+        # JSON round trip of a rebuild
+        for command in self.undo_stack:
+            command.compact()
+
+    def history_size(self) -> int:
+        """Estimated bytes kept alive by the undo history"""
+        return sum(command.estimated_size() for command in self.undo_stack)
+
+    def _push(self, command: BaseCommand):
+        self.undo_stack.append(command)
+        if len(self.undo_stack) > self.live_commands:
+            self.undo_stack[-self.live_commands - 1].compact()
+
+        # The newest entry is always kept, however large
+        size = self.history_size()
+        while len(self.undo_stack) > 1 and (len(self.undo_stack) > self.max_commands or size > self.max_bytes):
+            size -= self.undo_stack.pop(0).estimated_size()
+
     def set_redo_button(self, button: QAction):
         self.redo_button = button
         self.redo_button.triggered.connect(self.redo)
@@ -91,6 +249,8 @@ class AddStateCommand(BaseCommand):
         self.calling_class = scene.__class__.__name__
         self.model = model
 
+        self.state_id = state.id
+
         self.logging_level = "INFO"
         self.log = f"Added state: {self.state.name}, ID: {self.state.id}"
 
@@ -99,9 +259,15 @@ class AddStateCommand(BaseCommand):
         self.scene.addItem(self.state)
 
     def undo(self):
+        if self.state is None:
+            self.state = self.model.get_state_by_id(self.state_id)
         self.model.remove_state(self.state)
         self.scene.removeItem(self.state)
 
+    def compact(self):
+        # The state is in the model whenever this entry is undone
+        self.state = None
+
     def redo(self):
         self.execute()
 
@@ -133,20 +299,42 @@ class ToggleInitialStateCommand(BaseCommand):
         self.scene: QGraphicsScene = scene
         self.calling_class = scene.__class__.__name__
 
+        self.model: FSMModel | None = state.model
+        self.state_id = state.id
+        self.old_value = state.is_initial
+        self.new_value = not state.is_initial
+
         self.logging_level = "INFO"
-        self.log = f"Set state: {self.state.name} is_initial: {not self.state.is_initial}"
+        self.log = f"Set state: {self.state.name} is_initial: {self.new_value}"
 
-    def execute(self):
-        self.state.is_initial = not self.state.is_initial
+    def _set(self, value: bool):
+        if self.state is None:
+            self.state = self.model.get_state_by_id(self.state_id)
+        self.state.is_initial = value
         self.state.update()
 
+    def execute(self):
+        self._set(self.new_value)
+
     def undo(self):
-        self.state.is_initial = not self.state.is_initial
-        self.state.update()
+        self._set(self.old_value)
 
     def redo(self):
         self.execute()
 
+    def merge(self, command: BaseCommand) -> bool:
+        if not isinstance(command, ToggleInitialStateCommand) or command.state_id != self.state_id:
+            return False
+        self.new_value = command.new_value
+        return True
+
+    def is_noop(self) -> bool:
+        return self.old_value == self.new_value
+
+    def compact(self):
+        if self.model is not None:
+            self.state = None
+
 
 class ToggleAcceptingStateCommand(BaseCommand):
     def __init__(self, state: StateItem, scene: QGraphicsScene):
@@ -155,20 +343,42 @@ class ToggleAcceptingStateCommand(BaseCommand):
         self.scene: QGraphicsScene = scene
         self.calling_class = scene.__class__.__name__
 
+        self.model: FSMModel | None = state.model
+        self.state_id = state.id
+        self.old_value = state.is_accepting
+        self.new_value = not state.is_accepting
+
         self.logging_level = "INFO"
-        self.log = f"Set state: {self.state.name} is_accepting: {not self.state.is_accepting}"
+        self.log = f"Set state: {self.state.name} is_accepting: {self.new_value}"
 
-    def execute(self):
-        self.state.is_accepting = not self.state.is_accepting
+    def _set(self, value: bool):
+        if self.state is None:
+            self.state = self.model.get_state_by_id(self.state_id)
+        self.state.is_accepting = value
         self.state.update()
 
+    def execute(self):
+        self._set(self.new_value)
+
     def undo(self):
-        self.state.is_accepting = not self.state.is_accepting
-        self.state.update()
+        self._set(self.old_value)
 
     def redo(self):
         self.execute()
 
+    def merge(self, command: BaseCommand) -> bool:
+        if not isinstance(command, ToggleAcceptingStateCommand) or command.state_id != self.state_id:
+            return False
+        self.new_value = command.new_value
+        return True
+
+    def is_noop(self) -> bool:
+        return self.old_value == self.new_value
+
+    def compact(self):
+        if self.model is not None:
+            self.state = None
+
 
 class DeleteCommand(BaseCommand):
     def __init__(self, item: StateItem | TransitionItem | CommentItem, scene: QGraphicsScene, model: FSMModel = None):
@@ -177,10 +387,17 @@ class DeleteCommand(BaseCommand):
         self.scene = scene
         self.model = model
         self.calling_class = scene.__class__.__name__
+        # Transitions removed with a state; StateItem.transitions also
+        # lists transitions that were deleted on their own before
+        self.transitions: list[TransitionItem] = []
+        # Set instead of the items once compacted
+        self.state_data: StateData | None = None
+        self.transition_data: list[TransitionData] = []
 
         self.logging_level = "INFO"
         if isinstance(item, StateItem):
-            self.log = f"Deleted state: {item.name} with {len(item.transitions)} transitions"
+            count = len({transition for transition in item.transitions if transition.model is model})
+            self.log = f"Deleted state: {item.name} with {count} transitions"
         elif isinstance(item, TransitionItem):
             self.log = f"Deleted transition: From <b>{item.source.name}</b> to <b>{item.destination.name}</b>"
         elif isinstance(item, CommentItem):
@@ -188,15 +405,19 @@ class DeleteCommand(BaseCommand):
 
     def execute(self):
         if isinstance(self.item, StateItem):
-            for transition in self.item.transitions:
-                if transition.scene() is not None:
-                    self.scene.removeItem(transition)
-                if transition.control_points_item.scene() is not None:
-                    self.scene.removeItem(transition.control_points_item)
-
-                self.model.remove_transition(transition)
-            self.scene.removeItem(self.item)
-            self.model.remove_state(self.item)
+            # Self-loops are listed twice
+            self.transitions = list(dict.fromkeys(transition for transition in self.item.transitions
+                                                  if transition.model is self.model))
+            with self.model.batch():
+                for transition in self.transitions:
+                    if transition.scene() is not None:
+                        self.scene.removeItem(transition)
+                    if transition.control_points_item.scene() is not None:
+                        self.scene.removeItem(transition.control_points_item)
+
+                    self.model.remove_transition(transition)
+                self.scene.removeItem(self.item)
+                self.model.remove_state(self.item)
         elif isinstance(self.item, TransitionItem):
             self.scene.removeItem(self.item.control_points_item)
             self.scene.removeItem(self.item)
@@ -205,15 +426,20 @@ class DeleteCommand(BaseCommand):
             self.scene.removeItem(self.item)
 
     def undo(self):
+        if self.item is None:
+            self._rebuild()
         if isinstance(self.item, StateItem):
-            for transition in self.item.transitions:
-                self.scene.addItem(transition.control_points_item)
-                self.scene.addItem(transition)
-            self.scene.addItem(self.item)
-            self.model.add_state(self.item)
+            with self.model.batch():
+                self.scene.addItem(self.item)
+                self.model.add_state(self.item)
+                for transition in self.transitions:
+                    self.model.add_transition(transition)
+                    self.scene.addItem(transition)
+                    transition.reinit()
         elif isinstance(self.item, TransitionItem):
             self.scene.addItem(self.item)
-            self.scene.addItem(self.item.control_points_item)
+            if self.item.control_points_item.scene() is None:
+                self.scene.addItem(self.item.control_points_item)
             self.model.add_transition(self.item)
         elif isinstance(self.item, CommentItem):
             self.scene.addItem(self.item)
@@ -221,6 +447,58 @@ class DeleteCommand(BaseCommand):
     def redo(self):
         self.execute()
 
+    def compact(self):
+        if isinstance(self.item, StateItem):
+            self.state_data = self.item.state_data
+            removed = self.transitions
+        elif isinstance(self.item, TransitionItem):
+            removed = [self.item]
+        else:
+            return      # Comments are not part of the model data
+        # Unlink the removed items from the states that stay, so nothing
+        # keeps them alive once this entry lets go of them
+        for transition in removed:
+            for state in (transition.source, transition.destination):
+                if transition in state.transitions:
+                    state.transitions.remove(transition)
+        self.transition_data = [transition.transition_data for transition in removed]
+        self.item = None
+        self.transitions = []
+
+    def _rebuild(self):
+        """Recreate the deleted items from the data kept by compact"""
+        states = {}
+        if self.state_data is not None:
+            states[self.state_data] = StateItem(state_data=self.state_data)
+
+        def state_item(data: StateData) -> StateItem:
+            if data not in states:
+                states[data] = self.model.get_state_by_id(data.id)
+            return states[data]
+
+        transitions = []
+        for data in self.transition_data:
+            source, destination = state_item(data.source), state_item(data.destination)
+            # The states may have been rebuilt with new data since
+            data.source, data.destination = source.state_data, destination.state_data
+            transitions.append(TransitionItem(source, destination, transition_data=data))
+        if self.state_data is not None:
+            self.item = states[self.state_data]
+            self.transitions = transitions
+        else:
+            self.item = transitions[0]
+        self.state_data = None
+        self.transition_data = []
+
+    def estimated_size(self) -> int:
+        if self.item is None:
+            return COMMAND_BYTES + DATA_BYTES * (len(self.transition_data) + (self.state_data is not None))
+        if isinstance(self.item, StateItem):
+            return COMMAND_BYTES + STATE_ITEM_BYTES + TRANSITION_ITEM_BYTES * len(self.transitions)
+        if isinstance(self.item, TransitionItem):
+            return COMMAND_BYTES + TRANSITION_ITEM_BYTES
+        return COMMAND_BYTES
+
 
 class AddTransitionCommand(BaseCommand):
     def __init__(self, transition: TransitionItem, scene: QGraphicsScene, model: FSMModel = None):
@@ -231,6 +509,8 @@ class AddTransitionCommand(BaseCommand):
         self.calling_class = scene.__class__.__name__
         self.model = model
 
+        self.transition_id = transition.id
+
         self.logging_level = "INFO"
         self.log = f"Added transition: From <b>{self.transition.source.name}</b> to <b>{self.transition.destination.name}</b>"
 
@@ -240,6 +520,8 @@ class AddTransitionCommand(BaseCommand):
         self.transition.reinit()
 
     def undo(self):
+        if self.transition is None:
+            self.transition = self.model.get_transition_by_id(self.transition_id)
         self.model.remove_transition(self.transition)
         self.scene.removeItem(self.transition)
         if self.transition.control_points_item.scene() is not None:
@@ -248,6 +530,10 @@ class AddTransitionCommand(BaseCommand):
     def redo(self):
         self.execute()
 
+    def compact(self):
+        # The transition is in the model whenever this entry is undone
+        self.transition = None
+
 
 class SaveFSMModelCommand(BaseCommand):
     def __init__(self, model: FSMModel):
@@ -331,10 +617,87 @@ class OpenMachine(BaseCommand):
                 json_data = json.load(f)
 
             new_model = FSMModel()
-            new_model.on_change(self.canvas.parent_window.model_dock.update_model_info)
-            new_model.set_path(self.file_path)
-            new_model.from_json(json_data)
+            with new_model.batch():
+                new_model.set_path(self.file_path)
+                new_model.from_json(json_data)
+                new_model.set_is_saved(True)
             self.log = f"Opened machine: {new_model.name}"
-            new_model.set_is_saved(True)
 
             self.canvas.set_new_model(new_model)
+
+
+class ReplaceModelCommand(BaseCommand):
+    """Replace the canvas machine with ``new_json``; undo brings the previous one back"""
+    rebuilds_items = True
+
+    def __init__(self, canvas: "CanvasView", new_json: dict, log: str = "", path: str = None):
+        super().__init__()
+
+        self.canvas: "CanvasView" = canvas
+        self.calling_class = canvas.scene.__class__.__name__
+        self.old_json = canvas.fsm_model.to_json()
+        self.old_path = canvas.fsm_model.path
+        self.new_json = new_json
+        self.path = path if path is not None else self.old_path
+
+        self.logging_level = "INFO"
+        self.log = log or f"Replaced machine: {new_json.get('name', '')}"
+
+    def _load(self, model_json: dict, path: str, is_saved: bool):
+        # The model is reloaded in place, so other history entries keep
+        # their model; comments are not part of the JSON and are kept as is
+        model = self.canvas.fsm_model
+        comments = [item for item in self.canvas.scene.items() if isinstance(item, CommentItem)]
+        for comment in comments:
+            self.canvas.scene.removeItem(comment)
+        with model.batch():
+            model.clear()
+            model.from_json(model_json)
+            model.set_path(path)
+            model.set_is_saved(is_saved)
+        self.canvas.set_new_model(model)
+        for comment in comments:
+            self.canvas.scene.addItem(comment)
+
+    def execute(self):
+        self._load(self._expand(self.new_json), self.path, False)
+
+    def undo(self):
+        self._load(self._expand(self.old_json), self.old_path, False)
+
+    def redo(self):
+        self.execute()
+
+    def compact(self):
+        if isinstance(self.old_json, dict):
+            self.old_json = zlib.compress(json.dumps(self.old_json).encode())
+            self.new_json = zlib.compress(json.dumps(self.new_json).encode())
+
+    def _expand(self, model_json: dict | bytes) -> dict:
+        return json.loads(zlib.decompress(model_json)) if isinstance(model_json, bytes) else model_json
+
+    def estimated_size(self) -> int:
+        if isinstance(self.old_json, bytes):
+            return COMMAND_BYTES + len(self.old_json) + len(self.new_json)
+        records = sum(len(model_json.get("states", [])) + len(model_json.get("transitions", []))
+                      for model_json in (self.old_json, self.new_json))
+        return COMMAND_BYTES + DATA_BYTES * records
+
+
+class MinimizeCommand(ReplaceModelCommand):
+    def __init__(self, canvas: "CanvasView"):
+        super().__init__(canvas, {})
+        model_json = self.old_json
+        # Hopcroft works on the first-match table, which drops the shadowed
+        # transitions of a nondeterministic machine and changes what it accepts
+        engine = CompiledFSM.from_json(model_json)
+        self.determinized = bool(engine.shadowed)
+        if self.determinized:
+            # Raises SubsetExplosionError, a ValueError, for too many subsets
+            model_json = determinize_json(model_json)
+        # Raises ValueError unless the machine has exactly one initial state
+        self.new_json, self.stats = minimize_json(model_json)
+        if self.determinized:
+            self.stats.states_before = engine.num_states
+            self.stats.transitions_before = len(self.old_json.get("transitions", []))
+        self.log = f"Minimized {'determinized ' if self.determinized else ''}machine: {self.stats.summary()}"
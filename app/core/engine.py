@@ -0,0 +1,336 @@
+from array import array
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Iterable, Iterator
+
+if TYPE_CHECKING:
+    from app.ui.items.state import FSMModel
+
+
+NO_STATE = -1
+NO_TRANSITION = -1
+UNKNOWN_SYMBOL = -1
+
+
+def model_rows(fsm_model: "FSMModel") -> tuple[list, list, list]:
+    """Extract (states, input_alphabet, transitions) rows from a live model.
+
+    States are (id, name, output_value, is_accepting, is_initial) and
+    transitions (id, output_value, source_id, destination_id, input_symbols).
+    """
+    states = [(state.id, state.name, state.output_value, state.is_accepting, state.is_initial)
+              for state in fsm_model.states]
+    transitions = [(transition.id, transition.output_value, transition.source.id,
+                    transition.destination.id, transition.input_symbols)
+                   for transition in fsm_model.transitions]
+    return states, sorted(fsm_model.input_alphabet), transitions
+
+
+def json_rows(model_json: dict) -> tuple[list, list, list]:
+    """Extract the same rows as model_rows from the dict produced by FSMModel.to_json"""
+    states = [(state.get("id"), state.get("name", ""), state.get("output_value", ""),
+               state.get("is_accepting", False), state.get("is_initial", False))
+              for state in model_json.get("states", [])]
+    transitions = [(transition.get("id"), transition.get("output_value", ""), transition.get("source"),
+                    transition.get("destination"), transition.get("input_symbols", []))
+                   for transition in model_json.get("transitions", [])]
+    return states, sorted(model_json.get("input_alphabet", [])), transitions
+
+
+@dataclass
+class RunResult:
+    final_state: int
+    outputs: list = field(default_factory=list)
+    status: str = ""
+    steps: int = 0
+
+
+class CompiledFSM:
+    """Qt-free snapshot of an FSMModel as a dense transition table.
+
+    States are numbered in the order of ``fsm_model.states`` and transitions
+    in the order of ``fsm_model.transitions``, so callers holding the model
+    can map indices back to their graphics items. Input symbols are interned
+    into consecutive ids and the table is indexed as
+    ``state * num_symbols + symbol``.
+    """
+
+    def __init__(self):
+        self.state_ids: list[str] = []
+        self.state_names: list[str] = []
+        self.state_outputs: list[str] = []
+        self.accepting: list[bool] = []
+        self.initial_states: list[int] = []
+
+        self.transition_ids: list[str] = []
+        self.transition_outputs: list[str] = []
+        self.transition_sources: list[int] = []
+        self.transition_destinations: list[int] = []
+
+        self.symbols: list[str] = []
+        self.symbol_index: dict[str, int] = {}
+        self.valid_symbols: list[bool] = []
+        self.restricted_alphabet = False
+
+        self.next_state: list[int] = []
+        self.transition_table: list[int] = []
+        # Cells where a later transition to another state was shadowed by the first match
+        self.shadowed: list[int] = []
+
+    @classmethod
+    def from_model(cls, fsm_model: "FSMModel") -> "CompiledFSM":
+        return cls._build(*model_rows(fsm_model))
+
+    @classmethod
+    def from_json(cls, model_json: dict) -> "CompiledFSM":
+        """Compile the dict produced by FSMModel.to_json, without any Qt objects"""
+        return cls._build(*json_rows(model_json))
+
+    @classmethod
+    def _build(cls, states, input_alphabet, transitions) -> "CompiledFSM":
+        compiled = cls()
+
+        state_index = {}
+        for i, (state_id, name, output_value, is_accepting, is_initial) in enumerate(states):
+            state_index.setdefault(state_id, i)
+            compiled.state_ids.append(state_id)
+            compiled.state_names.append(name)
+            compiled.state_outputs.append(output_value)
+            compiled.accepting.append(is_accepting)
+            if is_initial:
+                compiled.initial_states.append(i)
+
+        alphabet = [symbol for symbol in input_alphabet]
+        compiled.restricted_alphabet = len(alphabet) > 0
+        for symbol in alphabet:
+            compiled._intern(symbol)
+        for _, _, _, _, input_symbols in transitions:
+            for symbol in input_symbols:
+                compiled._intern(symbol)
+
+        allowed = set(alphabet)
+        compiled.valid_symbols = [not compiled.restricted_alphabet or symbol in allowed
+                                  for symbol in compiled.symbols]
+
+        num_symbols = len(compiled.symbols)
+        size = len(compiled.state_ids) * num_symbols
+        compiled.next_state = [NO_STATE] * size
+        compiled.transition_table = [NO_TRANSITION] * size
+
+        for t, (transition_id, output_value, source_id, destination_id, input_symbols) in enumerate(transitions):
+            compiled.transition_ids.append(transition_id)
+            compiled.transition_outputs.append(output_value)
+
+            source = state_index.get(source_id, NO_STATE)
+            destination = state_index.get(destination_id, NO_STATE)
+            compiled.transition_sources.append(source)
+            compiled.transition_destinations.append(destination)
+            if source == NO_STATE or destination == NO_STATE:
+                continue
+
+            row = source * num_symbols
+            for symbol in input_symbols:
+                cell = row + compiled.symbol_index[symbol]
+                # First matching transition wins, as in the original list scan
+                if compiled.next_state[cell] == NO_STATE:
+                    compiled.next_state[cell] = destination
+                    compiled.transition_table[cell] = t
+                elif compiled.next_state[cell] != destination:
+                    compiled.shadowed.append(cell)
+
+        return compiled
+
+    def _intern(self, symbol: str) -> int:
+        index = self.symbol_index.get(symbol)
+        if index is None:
+            index = len(self.symbols)
+            self.symbol_index[symbol] = index
+            self.symbols.append(symbol)
+        return index
+
+    @property
+    def num_states(self) -> int:
+        return len(self.state_ids)
+
+    @property
+    def num_symbols(self) -> int:
+        return len(self.symbols)
+
+    @property
+    def initial_state(self) -> int:
+        """Index of the single initial state, or NO_STATE"""
+        if len(self.initial_states) != 1:
+            return NO_STATE
+        return self.initial_states[0]
+
+    def symbol_id(self, symbol: str) -> int:
+        return self.symbol_index.get(symbol, UNKNOWN_SYMBOL)
+
+    def encode(self, inputs: Iterable[str]) -> list[int]:
+        """Translate input symbols to interned ids (UNKNOWN_SYMBOL if absent)"""
+        get = self.symbol_index.get
+        return [get(symbol, UNKNOWN_SYMBOL) for symbol in inputs]
+
+    def is_valid_symbol(self, symbol_id: int) -> bool:
+        if symbol_id == UNKNOWN_SYMBOL:
+            return not self.restricted_alphabet
+        return self.valid_symbols[symbol_id]
+
+    def step(self, state: int, symbol_id: int) -> tuple[int, int]:
+        """Return (next_state, transition) for one input, NO_STATE if none"""
+        if symbol_id == UNKNOWN_SYMBOL:
+            return NO_STATE, NO_TRANSITION
+        cell = state * len(self.symbols) + symbol_id
+        return self.next_state[cell], self.transition_table[cell]
+
+    @property
+    def is_deterministic(self) -> bool:
+        return not self.shadowed and len(self.initial_states) <= 1
+
+    def describe_cell(self, cell: int) -> str:
+        state, symbol = divmod(cell, len(self.symbols))
+        return f"{self.state_names[state]} on '{self.symbols[symbol]}'"
+
+    def check_initial_state(self) -> str:
+        """Return an error status for the initial state, or an empty string"""
+        if not self.initial_states:
+            return "No initial state"
+        if len(self.initial_states) > 1:
+            return "Multiple initial states"
+        return ""
+
+    def run(self, inputs: Iterable[str], mode: str = "Moore") -> RunResult:
+        """Run a sequence of input symbols from the initial state.
+
+        Status is one of "Accepted", "Rejected", "No transition",
+        "Invalid Input", "No initial state" or "Multiple initial states",
+        matching the strings reported by the batch tester.
+        """
+        error = self.check_initial_state()
+        if error:
+            return RunResult(NO_STATE, [], error, 0)
+
+        symbol_ids = self.encode(inputs)
+        for symbol_id in symbol_ids:
+            if not self.is_valid_symbol(symbol_id):
+                return RunResult(NO_STATE, [], "Invalid Input", 0)
+
+        return self.run_encoded(symbol_ids, mode)
+
+    def run_encoded(self, symbol_ids: list[int], mode: str = "Moore") -> RunResult:
+        """Run already encoded and validated symbol ids"""
+        mealy = mode.lower() == "mealy"
+        num_symbols = len(self.symbols)
+        next_state = self.next_state
+        transition_table = self.transition_table
+        state_outputs = self.state_outputs
+        transition_outputs = self.transition_outputs
+
+        state = self.initial_state
+        outputs = []
+        steps = 0
+        for symbol_id in symbol_ids:
+            if symbol_id == UNKNOWN_SYMBOL:
+                return RunResult(state, outputs, "No transition", steps)
+            cell = state * num_symbols + symbol_id
+            destination = next_state[cell]
+            if destination == NO_STATE:
+                return RunResult(state, outputs, "No transition", steps)
+            if mealy:
+                outputs.append(transition_outputs[transition_table[cell]])
+            else:
+                outputs.append(state_outputs[destination])
+            state = destination
+            steps += 1
+
+        status = "Accepted" if self.accepting[state] else "Rejected"
+        return RunResult(state, outputs, status, steps)
+
+
+# A Trace stores the state every TRACE_CHECKPOINT_INTERVAL ticks, so restoring
+# a tick replays at most that many steps, and keeps at most TRACE_MAX_STEPS
+# symbols (4 bytes each) before dropping the oldest ones
+TRACE_CHECKPOINT_INTERVAL = 1024
+TRACE_MAX_STEPS = 1 << 24
+
+
+class Trace:
+    """Execution trace of one simulation run as compact int arrays.
+
+    The trace covers the ticks from ``start`` to ``end``. ``symbols[i]`` is
+    the symbol id consumed by the step from tick start + i, and
+    ``checkpoints[k]`` is the state at tick start + k * interval. States and
+    transitions in between are replayed from the nearest checkpoint through
+    the engine tables. ``error`` is the failure that stopped the run after
+    the last recorded step and ``exhausted`` is set once the input ran out.
+    """
+
+    def __init__(self, initial_state: int = NO_STATE, engine: CompiledFSM | None = None, start: int = 0,
+                 interval: int = TRACE_CHECKPOINT_INTERVAL, max_steps: int = TRACE_MAX_STEPS):
+        self.engine = engine
+        self.interval = interval
+        self.max_steps = max(max_steps, 2 * interval)
+        self.error = ""
+        self.exhausted = False
+        self.restart(initial_state, start)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.symbols)
+
+    @property
+    def finished(self) -> bool:
+        return self.exhausted or bool(self.error)
+
+    def restart(self, state: int, tick: int):
+        """Drop the recorded steps and continue from ``state`` at ``tick``"""
+        self.start = tick
+        self.checkpoints = array("i", [state])
+        self.symbols = array("i")
+        self.state = state      # State at the end of the trace
+
+    def record(self, symbol_id: int, state: int):
+        self.symbols.append(symbol_id)
+        self.state = state
+        if len(self.symbols) % self.interval == 0:
+            self.checkpoints.append(state)
+            if len(self.symbols) > self.max_steps:
+                self.trim()
+
+    def trim(self):
+        """Keep about the newest max_steps / 2 steps once more than max_steps are kept"""
+        if len(self.symbols) <= self.max_steps:
+            return
+        blocks = (len(self.symbols) - self.max_steps // 2) // self.interval
+        del self.symbols[:blocks * self.interval]
+        del self.checkpoints[:blocks]
+        self.start += blocks * self.interval
+
+    def steps(self, tick: int, count: int) -> Iterator[tuple[int, int, int]]:
+        """(symbol_id, transition, state after the step) for ``count`` steps from ``tick``"""
+        offset = tick - self.start
+        base = offset - offset % self.interval
+        num_symbols = len(self.engine.symbols)
+        next_state = self.engine.next_state
+        transition_table = self.engine.transition_table
+        state = self.checkpoints[base // self.interval]
+        for i, symbol_id in enumerate(self.symbols[base:offset + count], base):
+            cell = state * num_symbols + symbol_id
+            state = next_state[cell]
+            if i >= offset:
+                yield symbol_id, transition_table[cell], state
+
+    def state_at(self, tick: int) -> int:
+        offset = tick - self.start
+        if offset == len(self.symbols):
+            return self.state
+        if offset % self.interval == 0:
+            return self.checkpoints[offset // self.interval]
+        for _, _, state in self.steps(tick - 1, 1):
+            return state
+
+    def symbol_at(self, tick: int) -> int:
+        """Symbol id consumed by the step from ``tick``"""
+        return self.symbols[tick - self.start]
@@ -1,15 +1,37 @@
 from .generators import PythonGenerator, CppGenerator, JavaGenerator
+from .generators.base import template_version
+from app.core.engine import model_rows
+from app.core.nfa import determinize_json
+from collections import OrderedDict
 from typing import TYPE_CHECKING
+import hashlib
+import json
 
 if TYPE_CHECKING:
     from app.ui.items.state import FSMModel
 
 
+# Generated sources kept by (content hash, template version, generator, style, determinize)
+OUTPUT_CACHE_SIZE = 64
+_output_cache: OrderedDict[tuple, str] = OrderedDict()
+
+
+def content_hash(name: str, rows: tuple) -> str:
+    """Hash of everything the generated code depends on, from model_rows or json_rows"""
+    return hashlib.sha256(json.dumps([name, rows]).encode()).hexdigest()
+
+
+def model_hash(fsm_model: "FSMModel") -> str:
+    return content_hash(fsm_model.name, model_rows(fsm_model))
+
+
 class CodeGenerator:
     """Main code generator class that handles different language generators"""
     
-    def __init__(self, fsm_model: "FSMModel"):
+    def __init__(self, fsm_model: "FSMModel", determinize: bool = False, style: str = "map"):
         self.fsm_model = fsm_model
+        self.determinize = determinize   # Generate from the subset-construction DFA
+        self.style = style               # One of generators.base.STYLES
         self.generators = {
             'python': PythonGenerator,
             'cpp': CppGenerator,
@@ -23,9 +45,31 @@ class CodeGenerator:
             raise ValueError(f"Unsupported language: {language}")
         
         generator_class = self.generators[language.lower()]
-        generator = generator_class(self.fsm_model)
-        return generator.generate()
+        key = (model_hash(self.fsm_model), template_version(), generator_class.__name__, self.style, self.determinize)
+        code = _output_cache.get(key)
+        if code is not None:
+            _output_cache.move_to_end(key)
+            return code
+
+        generator = generator_class(self._target_model(), self.style)
+        code = generator.generate()
+        _output_cache[key] = code
+        if len(_output_cache) > OUTPUT_CACHE_SIZE:
+            _output_cache.popitem(last=False)
+        return code
     
     def get_supported_languages(self) -> list:
         """Get list of supported languages"""
-        return list(self.generators.keys())
\ No newline at end of file
+        return list(self.generators.keys())
+
+    def get_supported_styles(self, language: str) -> list:
+        """Get list of generation styles available for a language"""
+        return list(self.generators[language.lower()].STYLES)
+
+    def _target_model(self) -> "FSMModel":
+        if not self.determinize:
+            return self.fsm_model
+        # Same model class as the input, so headless MachineData stays Qt-free
+        dfa_model = type(self.fsm_model)()
+        dfa_model.from_json(determinize_json(self.fsm_model.to_json()))
+        return dfa_model
@@ -1,18 +1,67 @@
 from abc import ABC, abstractmethod
 from typing import TYPE_CHECKING
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from app.core.engine import CompiledFSM
+import hashlib
+import json
 import os
+import re
 
 if TYPE_CHECKING:
     from app.ui.items.state import FSMModel
 
 
+# "map" looks transitions up by (state name, symbol) strings, "table" emits
+# integer enums and a flat next_state[state * num_symbols + symbol] array
+STYLES = ("map", "table")
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), 'templates')
+
+_environment: Environment | None = None
+_bytecode_cache_dir: str | None = os.environ.get("FSM_TEMPLATE_CACHE_DIR") or None
+_template_version: str | None = None
+
+
+def get_environment() -> Environment:
+    """Process-wide Jinja2 environment, so templates are parsed once and shared by all generators"""
+    global _environment
+    if _environment is None:
+        bytecode_cache = FileSystemBytecodeCache(_bytecode_cache_dir) if _bytecode_cache_dir else None
+        _environment = Environment(loader=FileSystemLoader(TEMPLATE_DIR), bytecode_cache=bytecode_cache)
+    return _environment
+
+
+def configure_template_cache(directory: str | None):
+    """Persist compiled templates under ``directory`` across runs, or keep them in memory only with None"""
+    global _environment, _bytecode_cache_dir
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    _bytecode_cache_dir = directory
+    _environment = None
+
+
+def template_version() -> str:
+    """Hash of all template sources, which changes whenever any generated output could"""
+    global _template_version
+    if _template_version is None:
+        digest = hashlib.sha256()
+        for name in sorted(os.listdir(TEMPLATE_DIR)):
+            digest.update(name.encode())
+            with open(os.path.join(TEMPLATE_DIR, name), "rb") as f:
+                digest.update(f.read())
+        _template_version = digest.hexdigest()
+    return _template_version
+
+
 class BaseCodeGenerator(ABC):
-    def __init__(self, fsm_model: "FSMModel"):
+    STYLES = STYLES     # Styles with a template for this language
+
+    def __init__(self, fsm_model: "FSMModel", style: str = "map"):
+        if style not in self.STYLES:
+            raise ValueError(f"Unsupported generation style: {style}")
         self.fsm_model = fsm_model
-        # Setup Jinja2 environment
-        template_dir = os.path.join(os.path.dirname(__file__), 'templates')
-        self.env = Environment(loader=FileSystemLoader(template_dir))
+        self.style = style
+        self.env = get_environment()
     
     @abstractmethod
     def generate(self) -> str:
@@ -30,6 +79,28 @@ class BaseCodeGenerator(ABC):
         """Get all accepting states"""
         return [state for state in self.fsm_model.states if state.is_accepting]
     
+    def template_name(self, language: str) -> str:
+        """Template for ``language`` in the selected style"""
+        return f"{language}.j2" if self.style == "map" else f"{language}_{self.style}.j2"
+
+    def get_table(self) -> dict:
+        """Dense transition table with the simulator's first-match semantics"""
+        engine = CompiledFSM.from_model(self.fsm_model)
+        return {
+            "num_states": engine.num_states,
+            "num_symbols": engine.num_symbols,
+            "state_names": engine.state_names,
+            "state_idents": self.enum_identifiers(engine.state_names),
+            "symbols": engine.symbols,
+            "symbol_idents": self.enum_identifiers(engine.symbols),
+            # Byte value of every single-byte symbol, None for longer symbols
+            "symbol_bytes": [symbol.encode()[0] if len(symbol.encode()) == 1 else None
+                             for symbol in engine.symbols],
+            "next_state": engine.next_state,
+            "accepting": engine.accepting,
+            "initial": engine.initial_states[0] if engine.initial_states else -1
+        }
+
     def render_template(self, template_name: str) -> str:
         """Render a Jinja2 template with FSM data"""
         template = self.env.get_template(template_name)
@@ -37,8 +108,26 @@ class BaseCodeGenerator(ABC):
             fsm_model=self.fsm_model,
             initial_state=self.get_initial_state(),
             accepting_states=self.get_accepting_states(),
-            sanitize_name=self.sanitize_class_name
+            sanitize_name=self.sanitize_class_name,
+            table=self.get_table() if self.style != "map" else None,
+            quote=lambda value: json.dumps(value, ensure_ascii=False)
         )
+
+    def enum_identifiers(self, names: list[str]) -> list[str]:
+        """Unique upper-case identifiers for enum members, in the order of ``names``"""
+        identifiers = []
+        used = set()
+        for name in names:
+            identifier = re.sub(r'[^a-zA-Z0-9]+', '_', name).strip('_').upper() or "EMPTY"
+            if identifier[0].isdigit():
+                identifier = "N" + identifier
+            candidate, n = identifier, 1
+            while candidate in used:
+                n += 1
+                candidate = f"{identifier}_{n}"
+            used.add(candidate)
+            identifiers.append(candidate)
+        return identifiers
     
     def sanitize_class_name(self, name: str) -> str:
         """Sanitize class name for the target language"""
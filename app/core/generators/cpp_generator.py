@@ -1,11 +1,15 @@
-from .base import BaseCodeGenerator
+from .base import BaseCodeGenerator, STYLES
 import re
 
 
 class CppGenerator(BaseCodeGenerator):
+    # "switch" compiles to jump tables: nested switches per step and a
+    # direct-threaded goto loop for feed()
+    STYLES = STYLES + ("switch",)
+
     def generate(self) -> str:
         """Generate C++ code for the FSM"""
-        return self.render_template('cpp.j2')
+        return self.render_template(self.template_name('cpp'))
     
     def sanitize_class_name(self, name: str) -> str:
         """Sanitize class name for C++ (PascalCase)"""
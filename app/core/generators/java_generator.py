@@ -2,10 +2,95 @@ from .base import BaseCodeGenerator
 import re
 
 
+# Chars per string constant, which is limited to 65535 bytes of modified
+# UTF-8 where a char takes up to 3 bytes
+JAVA_CHUNK_CHARS = 16384
+
+# Class file limits: bytes of code per method, including the static
+# initializer, and entries in the constant pool
+JAVA_MAX_METHOD_BYTES = 65535
+JAVA_MAX_CONSTANTS = 65535
+
+
 class JavaGenerator(BaseCodeGenerator):
     def generate(self) -> str:
         """Generate Java code for the FSM"""
-        return self.render_template('java.j2')
+        return self.render_template(self.template_name('java'))
+
+    def get_table(self) -> dict:
+        """Transition table, with the per-state arrays encoded as Java string literals.
+
+        An array initializer compiles to code in the static initializer,
+        which exceeds the 64 KB method limit for large machines. NEXT_STATE
+        entries are stored plus one, so -1 becomes 0, in one char, or in two
+        chars (high and low half) when the state count does not fit in a
+        char. Names are stored as their length followed by their chars, and
+        ACCEPTING as a bitset of 16 states per char.
+        """
+        table = super().get_table()
+        wide = table["num_states"] >= 0xFFFF
+        chars = []
+        for value in table["next_state"]:
+            value += 1
+            if wide:
+                chars.append(value >> 16)
+            chars.append(value & 0xFFFF)
+        accepting = [0] * ((table["num_states"] + 15) // 16)
+        for state, is_accepting in enumerate(table["accepting"]):
+            if is_accepting:
+                accepting[state // 16] |= 1 << state % 16
+        table["wide"] = wide
+        table["next_state_chunks"] = self.string_chunks(chars)
+        table["state_name_chunks"] = self.string_chunks(self.encode_names(table["state_names"]))
+        table["symbol_chunks"] = self.string_chunks(self.encode_names(table["symbols"]))
+        table["accepting_chunks"] = self.string_chunks(accepting)
+        self.check_class_limits(table)
+        return table
+
+    @staticmethod
+    def encode_names(names: list[str]) -> list[int]:
+        """UTF-16 chars of every name, each preceded by its length"""
+        chars = []
+        for name in names:
+            units = name.encode("utf-16-le")
+            units = [int.from_bytes(units[i:i + 2], "little") for i in range(0, len(units), 2)]
+            if len(units) > 0xFFFF:
+                raise ValueError(f"Name is too long for the Java table style: {name[:20]}...")
+            chars.append(len(units))
+            chars.extend(units)
+        return chars
+
+    def string_chunks(self, chars: list[int]) -> list[str]:
+        """Escaped contents of the string literals holding ``chars``"""
+        return ["".join(map(self.escape_char, chars[i:i + JAVA_CHUNK_CHARS]))
+                for i in range(0, len(chars), JAVA_CHUNK_CHARS)]
+
+    @staticmethod
+    def check_class_limits(table: dict):
+        """Raise ValueError if the generated class would exceed a class file limit"""
+        chunks = sum(len(table[key]) for key in ("next_state_chunks", "state_name_chunks",
+                                                 "symbol_chunks", "accepting_chunks"))
+        # Each chunk is one array store of about 8 bytes in the static
+        # initializer; the rest of it is well under 1 KB
+        if 8 * chunks + 1024 > JAVA_MAX_METHOD_BYTES:
+            raise ValueError(f"Transition table has too many cells for the Java table style ({chunks} string constants)")
+        # Every STATE_ and SYMBOL_ constant takes a name and a value entry,
+        # and every string constant two entries
+        constants = 2 * (table["num_states"] + table["num_symbols"]) + 2 * chunks + 256
+        if constants > JAVA_MAX_CONSTANTS:
+            raise ValueError(f"Machine has too many states and symbols for the Java table style "
+                             f"({table['num_states']} states, {table['num_symbols']} symbols)")
+
+    @staticmethod
+    def escape_char(code: int) -> str:
+        """``code`` as it appears inside a Java string literal"""
+        if 0x20 <= code < 0x7F and code not in (0x22, 0x5C):
+            return chr(code)
+        if code < 0x100:
+            # Unicode escapes are translated before lexing, so a \u000a would
+            # end the line inside the literal
+            return f"\\{code:03o}"
+        return f"\\u{code:04x}"
     
     def sanitize_class_name(self, name: str) -> str:
         """Sanitize class name for Java (PascalCase, no reserved words)"""
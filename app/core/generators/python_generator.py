@@ -5,7 +5,7 @@ import re
 class PythonGenerator(BaseCodeGenerator):
     def generate(self) -> str:
         """Generate Python code for the FSM"""
-        return self.render_template('python.j2')
+        return self.render_template(self.template_name('python'))
     
     def sanitize_class_name(self, name: str) -> str:
         """Sanitize class name for Python (PascalCase)"""
@@ -0,0 +1,104 @@
+import codecs
+import mmap
+import os
+from typing import Iterator
+
+
+# Longest line FileInputStream.lines() decodes; a longer one is one huge
+# symbol or test input, which would have to be held in memory at once
+MAX_LINE_BYTES = 1 << 20
+# Bytes read at a time when lines are split into several symbols
+CHUNK_BYTES = 1 << 16
+
+
+class InputLineTooLongError(ValueError):
+    pass
+
+
+class FileInputStream:
+    """Lazily tokenizes an input file.
+
+    In per-line mode every non-empty line is one symbol. Otherwise each line
+    is split on ``delimiter``, or into single characters when the delimiter
+    is empty, so line breaks always separate symbols. Lines are read through
+    a read-only memory map and split lines in chunks, so memory use grows
+    neither with the file size nor with the length of a line. A line or a
+    symbol longer than MAX_LINE_BYTES raises InputLineTooLongError. The
+    stream can be iterated more than once.
+    """
+
+    def __init__(self, path: str, delimiter: str = "", per_line: bool = True, encoding: str = "utf-8"):
+        self.path = path
+        self.delimiter = delimiter
+        self.per_line = per_line
+        self.encoding = encoding
+
+    def size(self) -> int:
+        return os.path.getsize(self.path)
+
+    def lines(self) -> Iterator[str]:
+        """Yield every line without its line terminator"""
+        if self.size() == 0:
+            return
+        with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start, size, number = 0, len(mm), 1
+            while start < size:
+                # Look for the line end no further than the longest allowed line
+                end = mm.find(b"\n", start, start + MAX_LINE_BYTES + 1)
+                if end == -1:
+                    if size - start > MAX_LINE_BYTES:
+                        raise self._too_long(f"Line {number}")
+                    end = size
+                yield mm[start:end].decode(self.encoding, errors="replace").rstrip("\r\n")
+                start = end + 1
+                number += 1
+
+    def _chunks(self) -> Iterator[str]:
+        """Yield the decoded file text, at most CHUNK_BYTES at a time"""
+        decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+        with open(self.path, "rb") as f:
+            for data in iter(lambda: f.read(CHUNK_BYTES), b""):
+                yield decoder.decode(data)
+        yield decoder.decode(b"", final=True)
+
+    def _split(self, line: str) -> list[str]:
+        return list(line) if self.delimiter == "" else line.split(self.delimiter)
+
+    def _too_long(self, what: str) -> InputLineTooLongError:
+        return InputLineTooLongError(f"{what} of {self.path} is longer than {MAX_LINE_BYTES} bytes")
+
+    def __iter__(self) -> Iterator[str]:
+        if self.per_line:
+            yield from filter(None, self.lines())
+            return
+
+        # The end of the current line, whose last symbol may still continue,
+        # and whether symbols of that line were already yielded
+        pending = ""
+        started = False
+        for text in self._chunks():
+            lines = (pending + text).split("\n")
+            pending = lines.pop()
+            for line in lines:
+                line = line.rstrip("\r")
+                if line or started:
+                    yield from self._split(line)
+                started = False
+            # Symbols of the unfinished line that later text cannot change
+            if self.delimiter == "":
+                # Trailing carriage returns are dropped if the line ends here
+                done = pending.rstrip("\r")
+                pending = pending[len(done):]
+                yield from done
+                started = started or bool(done)
+            else:
+                # Split from the left like str.split, so only the last symbol can change
+                *done, pending = pending.split(self.delimiter)
+                if done:
+                    yield from done
+                    started = True
+            if len(pending.encode(self.encoding, errors="replace")) > MAX_LINE_BYTES:
+                raise self._too_long("A symbol")
+        pending = pending.rstrip("\r")
+        if pending or started:
+            yield from self._split(pending)
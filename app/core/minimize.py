@@ -0,0 +1,224 @@
+from collections import deque
+from dataclasses import dataclass, field
+import copy
+
+from app.core.engine import CompiledFSM, NO_STATE, NO_TRANSITION
+
+
+@dataclass
+class MinimizationStats:
+    states_before: int = 0
+    states_after: int = 0
+    transitions_before: int = 0
+    transitions_after: int = 0
+    unreachable_removed: int = 0
+    merged: list[list[str]] = field(default_factory=list)   # Names of states merged together
+
+    def summary(self) -> str:
+        return (f"{self.states_before} -> {self.states_after} states, "
+                f"{self.transitions_before} -> {self.transitions_after} transitions")
+
+
+@dataclass
+class Minimization:
+    """Result of hopcroft(): the equivalence classes of the reachable states.
+
+    ``blocks`` lists the original state indices of every new state in model
+    order, ``state_block`` maps an original state index to its new state or
+    NO_STATE if it was unreachable, and ``initial_block`` is the new initial
+    state.
+    """
+    blocks: list[list[int]]
+    state_block: list[int]
+    initial_block: int
+
+
+def reachable_states(engine: CompiledFSM) -> list[int]:
+    """Indices of the states reachable from the initial state, in model order"""
+    num_symbols = engine.num_symbols
+    next_state = engine.next_state
+    seen = [False] * engine.num_states
+    seen[engine.initial_state] = True
+    queue = deque([engine.initial_state])
+    while queue:
+        row = queue.popleft() * num_symbols
+        for destination in next_state[row:row + num_symbols]:
+            if destination != NO_STATE and not seen[destination]:
+                seen[destination] = True
+                queue.append(destination)
+    return [i for i in range(engine.num_states) if seen[i]]
+
+
+def hopcroft(engine: CompiledFSM, state_keys: list | None = None, transition_keys: list | None = None) -> Minimization:
+    """Merge equivalent reachable states with Hopcroft's O(n·k·log n) partition refinement.
+
+    States start out split by acceptance, Moore output and, per symbol, the
+    Mealy output of the transition taken, so neither kind of output is lost.
+    ``state_keys`` and ``transition_keys`` optionally add per-state and
+    per-transition values (e.g. actions) that must also match. Missing
+    transitions lead to an explicit sink, so "no transition" stays distinct
+    from rejecting. The engine must have exactly one initial state.
+    """
+    if engine.initial_state == NO_STATE:
+        raise ValueError(engine.check_initial_state())
+
+    states = reachable_states(engine)
+    n = len(states)
+    sink = n
+    local = {state: i for i, state in enumerate(states)}
+    num_symbols = engine.num_symbols
+    next_state = engine.next_state
+    transition_table = engine.transition_table
+
+    # delta[q * num_symbols + c] over the reachable states plus the sink
+    delta = [sink] * ((n + 1) * num_symbols)
+    keys = []
+    for q, state in enumerate(states):
+        row = state * num_symbols
+        signature = []
+        for c in range(num_symbols):
+            destination = next_state[row + c]
+            if destination == NO_STATE:
+                signature.append(None)
+                continue
+            delta[q * num_symbols + c] = local[destination]
+            transition = transition_table[row + c]
+            signature.append((engine.transition_outputs[transition],
+                              transition_keys[transition] if transition_keys is not None else None))
+        keys.append((engine.accepting[state], engine.state_outputs[state],
+                     state_keys[state] if state_keys is not None else None, tuple(signature)))
+    keys.append(None)
+
+    # Initial partition
+    block_of = [0] * (n + 1)
+    blocks: list[set[int]] = []
+    key_block = {}
+    for q, key in enumerate(keys):
+        b = key_block.get(key)
+        if b is None:
+            b = len(blocks)
+            key_block[key] = b
+            blocks.append(set())
+        blocks[b].add(q)
+        block_of[q] = b
+
+    inverse: dict[int, list[int]] = {}
+    for q in range(n + 1):
+        base = q * num_symbols
+        for c in range(num_symbols):
+            inverse.setdefault(delta[base + c] * num_symbols + c, []).append(q)
+
+    pending = deque((b, c) for b in range(len(blocks)) for c in range(num_symbols))
+    in_pending = set(pending)
+    while pending:
+        splitter = pending.popleft()
+        in_pending.discard(splitter)
+        a, c = splitter
+
+        touched: dict[int, list[int]] = {}
+        for q in blocks[a]:
+            for p in inverse.get(q * num_symbols + c, ()):
+                touched.setdefault(block_of[p], []).append(p)
+
+        for b, members in touched.items():
+            if len(members) == len(blocks[b]):
+                continue
+            new = len(blocks)
+            blocks.append(set(members))
+            blocks[b].difference_update(members)
+            for p in members:
+                block_of[p] = new
+            for d in range(num_symbols):
+                if (b, d) in in_pending:
+                    entry = (new, d)
+                else:
+                    entry = (new, d) if len(members) <= len(blocks[b]) else (b, d)
+                pending.append(entry)
+                in_pending.add(entry)
+
+    # Number the new states by their first member in model order, without the sink
+    numbering = {}
+    result_blocks = []
+    state_block = [NO_STATE] * engine.num_states
+    for q, state in enumerate(states):
+        b = block_of[q]
+        if b not in numbering:
+            numbering[b] = len(result_blocks)
+            result_blocks.append([])
+        result_blocks[numbering[b]].append(state)
+        state_block[state] = numbering[b]
+
+    return Minimization(result_blocks, state_block, state_block[engine.initial_state])
+
+
+def minimize_json(model_json: dict) -> tuple[dict, MinimizationStats]:
+    """Minimize a model in FSMModel.to_json form and return the new JSON plus stats.
+
+    Every new state reuses the first state of its class (id, name, layout).
+    Each of its transitions that wins at least one table cell is kept, with
+    only those symbols and retargeted to the representative destination.
+    Transitions without input symbols and unreachable states are dropped.
+    """
+    engine = CompiledFSM.from_json(model_json)
+    states_json = model_json.get("states", [])
+    transitions_json = model_json.get("transitions", [])
+
+    state_keys = [(tuple(s.get("entry_actions", [])), tuple(s.get("exit_actions", []))) for s in states_json]
+    transition_keys = [(t.get("guard_condition", ""), tuple(t.get("actions", []))) for t in transitions_json]
+    minimization = hopcroft(engine, state_keys, transition_keys)
+
+    representatives = [block[0] for block in minimization.blocks]
+    num_symbols = engine.num_symbols
+
+    new_states = [copy.deepcopy(states_json[r]) for r in representatives]
+    for state_json, r in zip(new_states, representatives):
+        state_json["is_initial"] = r == representatives[minimization.initial_block]
+
+    new_transitions = []
+    for r in representatives:
+        row = r * num_symbols
+        symbols_by_transition: dict[int, list[str]] = {}
+        for c in range(num_symbols):
+            transition = engine.transition_table[row + c]
+            if transition != NO_TRANSITION:
+                symbols_by_transition.setdefault(transition, []).append(engine.symbols[c])
+
+        for transition in sorted(symbols_by_transition):
+            original = transitions_json[transition]
+            winning = set(symbols_by_transition[transition])
+            transition_json = copy.deepcopy(original)
+            transition_json["input_symbols"] = [s for s in original.get("input_symbols", []) if s in winning]
+            destination = representatives[minimization.state_block[engine.transition_destinations[transition]]]
+            transition_json["destination"] = states_json[destination].get("id")
+            if destination != engine.transition_destinations[transition]:
+                place_control_point(transition_json, states_json[r], states_json[destination])
+            new_transitions.append(transition_json)
+
+    new_json = copy.deepcopy({k: v for k, v in model_json.items() if k not in ("states", "transitions")})
+    new_json["states"] = new_states
+    new_json["transitions"] = new_transitions
+
+    stats = MinimizationStats(
+        states_before=engine.num_states,
+        states_after=len(new_states),
+        transitions_before=len(transitions_json),
+        transitions_after=len(new_transitions),
+        unreachable_removed=engine.num_states - sum(len(block) for block in minimization.blocks),
+        merged=[[engine.state_names[s] for s in block] for block in minimization.blocks if len(block) > 1]
+    )
+    return new_json, stats
+
+
+def place_control_point(transition_json: dict, source_json: dict, destination_json: dict):
+    """Place the control point of a retargeted transition between its new endpoints"""
+    source = source_json.get("properties", {})
+    destination = destination_json.get("properties", {})
+    sx, sy = source.get("x", 0), source.get("y", 0)
+    dx, dy = destination.get("x", 0), destination.get("y", 0)
+    if source_json.get("id") == destination_json.get("id"):
+        x, y = sx - 100, sy
+    else:
+        x, y = (sx + dx) / 2, (sy + dy) / 2
+    control_point = transition_json.setdefault("properties", {}).setdefault("control_point", {})
+    control_point["x"] = x
+    control_point["y"] = y
@@ -0,0 +1,225 @@
+from dataclasses import dataclass, field
+import json
+import uuid
+
+
+DEFAULT_STATE_BG = "#abdbe3"
+DEFAULT_STATE_BORDER = "#e28743"
+DEFAULT_STATE_TEXT = "#000000"
+DEFAULT_TRANSITION_COLOR = "#1e81b0"
+
+
+@dataclass(slots=True, eq=False)
+class StateData:
+    id: str
+    name: str = ""
+    is_initial: bool = False
+    is_accepting: bool = False
+    output_value: str = ""
+    entry_actions: list[str] = field(default_factory=list)
+    exit_actions: list[str] = field(default_factory=list)
+    x: float = 0.0
+    y: float = 0.0
+    bg_color: str = DEFAULT_STATE_BG
+    border_color: str = DEFAULT_STATE_BORDER
+    text_color: str = DEFAULT_STATE_TEXT
+
+
+@dataclass(slots=True, eq=False)
+class TransitionData:
+    id: str
+    source: StateData
+    destination: StateData
+    label: str = ""
+    input_symbols: list[str] = field(default_factory=list)
+    guard_condition: str = ""
+    output_value: str = ""
+    actions: list[str] = field(default_factory=list)
+    control_x: float = 0.0
+    control_y: float = 0.0
+    control_point_color: str = DEFAULT_TRANSITION_COLOR
+    color: str = DEFAULT_TRANSITION_COLOR
+    width: float = 2
+
+
+@dataclass
+class ModelDelta:
+    """Changes made to a model during one batch, see FSMModel.batch"""
+    states_added: int = 0
+    states_removed: int = 0
+    states_changed: int = 0         # Renamed, or initial/accepting flag changed
+    transitions_added: int = 0
+    transitions_removed: int = 0
+    cleared: bool = False
+    # (event, item, old_value) of add and remove events, replayable one by
+    # one; None once a rename, flag change or clear makes that unsafe
+    events: list | None = field(default_factory=list, compare=False, repr=False)
+
+    def record(self, event: str, item=None, old_value=None):
+        if event in ("state_added", "state_removed", "transition_added", "transition_removed"):
+            if self.events is not None:
+                self.events.append((event, item, old_value))
+        else:
+            self.events = None
+        if event == "state_added":
+            self.states_added += 1
+        elif event == "state_removed":
+            self.states_removed += 1
+        elif event in ("state_renamed", "state_initial", "state_accepting"):
+            self.states_changed += 1
+        elif event == "transition_added":
+            self.transitions_added += 1
+        elif event == "transition_removed":
+            self.transitions_removed += 1
+        elif event == "cleared":
+            self.cleared = True
+
+    def __bool__(self) -> bool:
+        return self != ModelDelta()
+
+    def summary(self) -> str:
+        parts = ["cleared"] if self.cleared else []
+        parts += [f"{count} {what}" for count, what in (
+            (self.states_added, "states added"),
+            (self.states_removed, "states removed"),
+            (self.states_changed, "states changed"),
+            (self.transitions_added, "transitions added"),
+            (self.transitions_removed, "transitions removed")
+        ) if count]
+        return ", ".join(parts) or "no changes"
+
+
+class MachineData:
+    """Qt-free machine loaded from or saved to the FSMModel.to_json format.
+
+    It exposes the attributes the engine, validator and code generators
+    read from FSMModel (``name``, ``states``, ``transitions``,
+    ``input_alphabet``), so headless tools and worker processes can use
+    them without a QApplication or any graphics items.
+    """
+
+    __slots__ = ("id", "name", "path", "input_alphabet", "output_alphabet", "states", "transitions", "comments",
+                 "_states_by_id")
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.name = ""
+        self.path = None
+        self.input_alphabet: set[str] = set()
+        self.output_alphabet: set[str] = set()
+        self.states: list[StateData] = []
+        self.transitions: list[TransitionData] = []
+        self.comments: list[dict] = []      # Kept as saved, they do not affect the machine
+        self._states_by_id: dict[str, StateData] = {}
+
+    @classmethod
+    def load(cls, path: str) -> "MachineData":
+        with open(path, "r") as f:
+            model_json = json.load(f)
+        model = cls()
+        model.from_json(model_json)
+        model.path = path
+        return model
+
+    def get_state_by_id(self, state_id) -> StateData | None:
+        return self._states_by_id.get(state_id)
+
+    def add_state(self, state: StateData):
+        self.states.append(state)
+        self._states_by_id.setdefault(state.id, state)
+
+    def add_transition(self, transition: TransitionData):
+        self.transitions.append(transition)
+
+    def from_json(self, model_json: dict):
+        self.id = model_json.get("id", uuid.uuid4().hex)
+        self.name = model_json.get("name", "")
+        self.input_alphabet = set(model_json.get("input_alphabet", []))
+        self.output_alphabet = set(model_json.get("output_alphabet", []))
+
+        for state_json in model_json.get("states", []):
+            props = state_json.get("properties", {})
+            self.add_state(StateData(
+                state_json.get("id") or uuid.uuid4().hex,
+                state_json.get("name", ""),
+                state_json.get("is_initial", False),
+                state_json.get("is_accepting", False),
+                state_json.get("output_value", ""),
+                state_json.get("entry_actions", []),
+                state_json.get("exit_actions", []),
+                props.get("x", 0),
+                props.get("y", 0),
+                props.get("bg_color", DEFAULT_STATE_BG),
+                props.get("border_color", DEFAULT_STATE_BORDER),
+                props.get("text_color", DEFAULT_STATE_TEXT)
+            ))
+
+        for transition_json in model_json.get("transitions", []):
+            source = self.get_state_by_id(transition_json.get("source"))
+            destination = self.get_state_by_id(transition_json.get("destination"))
+            if source is None or destination is None:
+                continue
+            props = transition_json.get("properties", {})
+            cp_props = props.get("control_point", {})
+            self.add_transition(TransitionData(
+                transition_json.get("id") or uuid.uuid4().hex,
+                source,
+                destination,
+                transition_json.get("label", ""),
+                transition_json.get("input_symbols", []),
+                transition_json.get("guard_condition", ""),
+                transition_json.get("output_value", ""),
+                transition_json.get("actions", []),
+                cp_props.get("x", 0),
+                cp_props.get("y", 0),
+                cp_props.get("color", DEFAULT_TRANSITION_COLOR),
+                props.get("color", DEFAULT_TRANSITION_COLOR),
+                props.get("width", 2)
+            ))
+
+        self.comments = list(model_json.get("comments", []))
+
+    def to_json(self) -> dict:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "path": self.path,
+            "input_alphabet": list(self.input_alphabet),
+            "output_alphabet": list(self.output_alphabet),
+            "states": [{
+                "id": state.id,
+                "name": state.name,
+                "is_initial": state.is_initial,
+                "is_accepting": state.is_accepting,
+                "output_value": state.output_value,
+                "entry_actions": state.entry_actions,
+                "exit_actions": state.exit_actions,
+                "properties": {
+                    "x": state.x,
+                    "y": state.y,
+                    "bg_color": state.bg_color,
+                    "border_color": state.border_color,
+                    "text_color": state.text_color
+                }
+            } for state in self.states],
+            "transitions": [{
+                "id": transition.id,
+                "source": transition.source.id,
+                "destination": transition.destination.id,
+                "label": transition.label,
+                "input_symbols": transition.input_symbols,
+                "guard_condition": transition.guard_condition,
+                "output_value": transition.output_value,
+                "actions": transition.actions,
+                "properties": {
+                    "control_point": {
+                        "x": transition.control_x,
+                        "y": transition.control_y,
+                        "color": transition.control_point_color
+                    },
+                    "color": transition.color,
+                    "width": transition.width
+                }
+            } for transition in self.transitions],
+            "comments": self.comments
+        }
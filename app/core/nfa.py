@@ -0,0 +1,254 @@
+from collections import deque
+from typing import TYPE_CHECKING, Iterable
+
+from app.core.engine import CompiledFSM, json_rows, model_rows, NO_STATE, NO_TRANSITION, UNKNOWN_SYMBOL
+from app.core.minimize import place_control_point
+
+if TYPE_CHECKING:
+    from app.ui.items.state import FSMModel
+
+
+# Upper bound on the number of subsets a determinization may create
+DEFAULT_MAX_SUBSETS = 10000
+
+
+class SubsetExplosionError(ValueError):
+    pass
+
+
+def iter_bits(mask: int) -> Iterable[int]:
+    """Indices of the set bits of ``mask``, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def merge_outputs(values: Iterable[str]) -> str:
+    """Combine the outputs of several active states or transitions"""
+    unique = []
+    for value in values:
+        if value and value not in unique:
+            unique.append(value)
+    return "|".join(unique)
+
+
+class DeterminizedFSM(CompiledFSM):
+    """CompiledFSM produced by subset construction.
+
+    ``subsets[i]`` is the bitset of NFA states that DFA state i stands for
+    and ``transition_members[t]`` the NFA transitions taken together by DFA
+    transition t. Outputs of merged states and transitions are joined by
+    merge_outputs.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.subsets: list[int] = []
+        self.transition_members: list[list[int]] = []
+
+
+class NFA:
+    """Bitset view of a possibly nondeterministic model.
+
+    States and symbols are numbered as in CompiledFSM (kept as ``engine``,
+    which holds the first-match table). ``successors[state * num_symbols +
+    symbol]`` has bit i set when some transition leads to state i, so a set
+    of active states advances with one OR per active state.
+    """
+
+    def __init__(self, states: list, input_alphabet: list, transitions: list):
+        self.engine = CompiledFSM._build(states, input_alphabet, transitions)
+        engine = self.engine
+        num_symbols = engine.num_symbols
+
+        self.successors = [0] * (engine.num_states * num_symbols)
+        self.matches: dict[int, list[int]] = {}
+        for t, (_, _, _, _, input_symbols) in enumerate(transitions):
+            source = engine.transition_sources[t]
+            destination = engine.transition_destinations[t]
+            if source == NO_STATE or destination == NO_STATE:
+                continue
+            for symbol in input_symbols:
+                cell = source * num_symbols + engine.symbol_index[symbol]
+                self.successors[cell] |= 1 << destination
+                matches = self.matches.setdefault(cell, [])
+                if t not in matches:
+                    matches.append(t)
+
+        self.initial = 0
+        for i in engine.initial_states:
+            self.initial |= 1 << i
+        self.accepting = 0
+        for i, is_accepting in enumerate(engine.accepting):
+            if is_accepting:
+                self.accepting |= 1 << i
+
+    @classmethod
+    def from_model(cls, fsm_model: "FSMModel") -> "NFA":
+        return cls(*model_rows(fsm_model))
+
+    @classmethod
+    def from_json(cls, model_json: dict) -> "NFA":
+        return cls(*json_rows(model_json))
+
+    def step(self, active: int, symbol_id: int) -> int:
+        """Return the set of states reachable from ``active`` on one symbol"""
+        if symbol_id == UNKNOWN_SYMBOL:
+            return 0
+        num_symbols = self.engine.num_symbols
+        successors = self.successors
+        result = 0
+        for state in iter_bits(active):
+            result |= successors[state * num_symbols + symbol_id]
+        return result
+
+    def run(self, inputs: Iterable[str]) -> tuple[int, str]:
+        """Simulate directly on bitsets and return (active states, status)
+
+        Statuses match CompiledFSM.run, so the whole input is checked
+        against the alphabet before the first step.
+        """
+        if not self.initial:
+            return 0, "No initial state"
+        symbol_ids = self.engine.encode(inputs)
+        if not all(self.engine.is_valid_symbol(symbol_id) for symbol_id in symbol_ids):
+            return 0, "Invalid Input"
+        active = self.initial
+        for symbol_id in symbol_ids:
+            following = self.step(active, symbol_id)
+            if not following:
+                return active, "No transition"
+            active = following
+        return active, "Accepted" if active & self.accepting else "Rejected"
+
+    def determinize(self, max_states: int = DEFAULT_MAX_SUBSETS) -> DeterminizedFSM:
+        """Subset construction over the reachable subsets of states.
+
+        Every subset is created once and looked up by its bitset afterwards.
+        The empty subset is left out, so it shows up as a missing transition.
+        Raises SubsetExplosionError once more than ``max_states`` subsets
+        would be needed.
+        """
+        engine = self.engine
+        num_symbols = engine.num_symbols
+        dfa = DeterminizedFSM()
+        dfa.symbols = list(engine.symbols)
+        dfa.symbol_index = dict(engine.symbol_index)
+        dfa.valid_symbols = list(engine.valid_symbols)
+        dfa.restricted_alphabet = engine.restricted_alphabet
+
+        index: dict[int, int] = {}
+        id_sources: dict[str, int] = {}     # Transition id -> the subset that uses it
+        queue = deque()
+
+        def add_subset(mask: int) -> int:
+            if len(dfa.subsets) >= max_states:
+                raise SubsetExplosionError(f"Subset construction exceeded {max_states} states")
+            i = len(dfa.subsets)
+            index[mask] = i
+            dfa.subsets.append(mask)
+            members = list(iter_bits(mask))
+            dfa.state_ids.append("+".join(engine.state_ids[m] for m in members))
+            if len(members) == 1:
+                dfa.state_names.append(engine.state_names[members[0]])
+            else:
+                dfa.state_names.append("{" + ",".join(engine.state_names[m] for m in members) + "}")
+            dfa.state_outputs.append(merge_outputs(engine.state_outputs[m] for m in members))
+            dfa.accepting.append(bool(mask & self.accepting))
+            dfa.next_state.extend([NO_STATE] * num_symbols)
+            dfa.transition_table.extend([NO_TRANSITION] * num_symbols)
+            queue.append(i)
+            return i
+
+        if self.initial:
+            dfa.initial_states.append(add_subset(self.initial))
+
+        while queue:
+            i = queue.popleft()
+            members = list(iter_bits(dfa.subsets[i]))
+            for c in range(num_symbols):
+                target = 0
+                for m in members:
+                    target |= self.successors[m * num_symbols + c]
+                if not target:
+                    continue
+                j = index.get(target)
+                if j is None:
+                    j = add_subset(target)
+
+                taken = sorted({t for m in members for t in self.matches.get(m * num_symbols + c, ())})
+                t = len(dfa.transition_ids)
+                transition_id = "+".join(engine.transition_ids[k] for k in taken)
+                if id_sources.setdefault(transition_id, i) != i:
+                    # The same NFA transitions leave several subsets
+                    transition_id = f"{transition_id}@{i}"
+                dfa.transition_ids.append(transition_id)
+                dfa.transition_outputs.append(merge_outputs(engine.transition_outputs[k] for k in taken))
+                dfa.transition_sources.append(i)
+                dfa.transition_destinations.append(j)
+                dfa.transition_members.append(taken)
+                dfa.next_state[i * num_symbols + c] = j
+                dfa.transition_table[i * num_symbols + c] = t
+
+        return dfa
+
+
+def determinize_json(model_json: dict, max_states: int = DEFAULT_MAX_SUBSETS) -> dict:
+    """Return the deterministic equivalent of a model in FSMModel.to_json form.
+
+    Each subset becomes a state placed at the centre of its members, and DFA
+    transitions between the same pair of states with the same output are
+    merged into one transition carrying all of their symbols.
+    """
+    dfa = NFA.from_json(model_json).determinize(max_states)
+    states_json = model_json.get("states", [])
+    transitions_json = model_json.get("transitions", [])
+
+    new_states = []
+    for i, mask in enumerate(dfa.subsets):
+        members = [states_json[m] for m in iter_bits(mask)]
+        positions = [m.get("properties", {}) for m in members]
+        properties = dict(positions[0])
+        properties["x"] = sum(p.get("x", 0) for p in positions) / len(positions)
+        properties["y"] = sum(p.get("y", 0) for p in positions) / len(positions)
+        new_states.append({
+            "id": dfa.state_ids[i],
+            "name": dfa.state_names[i],
+            "is_initial": i in dfa.initial_states,
+            "is_accepting": dfa.accepting[i],
+            "output_value": dfa.state_outputs[i],
+            "entry_actions": [a for m in members for a in m.get("entry_actions", [])],
+            "exit_actions": [a for m in members for a in m.get("exit_actions", [])],
+            "properties": properties
+        })
+
+    grouped: dict[tuple[int, int, str], dict] = {}
+    num_symbols = dfa.num_symbols
+    for cell, t in enumerate(dfa.transition_table):
+        if t == NO_TRANSITION:
+            continue
+        source, destination = dfa.transition_sources[t], dfa.transition_destinations[t]
+        key = (source, destination, dfa.transition_outputs[t])
+        transition_json = grouped.get(key)
+        if transition_json is None:
+            first = transitions_json[dfa.transition_members[t][0]]
+            transition_json = {
+                "id": dfa.transition_ids[t],
+                "source": dfa.state_ids[source],
+                "destination": dfa.state_ids[destination],
+                "label": first.get("label", ""),
+                "input_symbols": [],
+                "guard_condition": first.get("guard_condition", ""),
+                "output_value": dfa.transition_outputs[t],
+                "actions": [a for k in dfa.transition_members[t] for a in transitions_json[k].get("actions", [])],
+                "properties": {k: v for k, v in first.get("properties", {}).items() if k != "control_point"}
+            }
+            place_control_point(transition_json, new_states[source], new_states[destination])
+            grouped[key] = transition_json
+        transition_json["input_symbols"].append(dfa.symbols[cell % num_symbols])
+
+    new_json = {k: v for k, v in model_json.items() if k not in ("states", "transitions")}
+    new_json["states"] = new_states
+    new_json["transitions"] = list(grouped.values())
+    return new_json
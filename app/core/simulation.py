@@ -1,7 +1,13 @@
+from collections import deque
 from enum import Enum
+from itertools import islice
 from app.ui.items.state import FSMModel
-from typing import TYPE_CHECKING
+from app.core.engine import CompiledFSM, Trace, NO_STATE, UNKNOWN_SYMBOL
+from app.core.input_stream import InputLineTooLongError
+from app.core.nfa import NFA, SubsetExplosionError, iter_bits
+from typing import TYPE_CHECKING, Iterable, Iterator
 from PyQt5.QtCore import QTimer
+import time
 
 
 if TYPE_CHECKING:
@@ -16,69 +22,306 @@ class SimulationStates(Enum):
     ERROR = 4
 
 
+# Turbo mode runs engine steps for TURBO_SLICE_SECONDS per event-loop pass,
+# checking the clock every TURBO_CHUNK_SIZE steps, and refreshes the dock at
+# most TURBO_FRAME_RATE times per second with the last TURBO_MAX_LINES outputs
+TURBO_SLICE_SECONDS = 0.008
+TURBO_CHUNK_SIZE = 2048
+TURBO_FRAME_RATE = 30
+TURBO_MAX_LINES = 20
+
+
 class Simulation:
     def __init__(self, fsm_model: FSMModel, dock: "SimulationDock"  = None):
         self.fsm_model = fsm_model
         self.inputs: list[str] = []
+        self.input_source: Iterator[str] = iter(())
+        self.current_input = ""
+        self.turbo = False
+        self.nondeterministic = False
+        self.fast_forward = False
+        self.steps_per_second = 0.0
+        self._pending_outputs: deque[str] = deque(maxlen=TURBO_MAX_LINES)
+        self._skipped_outputs = 0
+        self._frame_time = 0.0
+        self._frame_ticks = 0
         self.state = SimulationStates.IDLE
         self.current_state: StateItem = None
+        self.engine: CompiledFSM = None
+        self.state_index = NO_STATE
+        # Graphics items behind each engine state and transition, captured when the
+        # engine is compiled; NFA mode groups several items per subset state
+        self.state_groups: list[list[StateItem]] = []
+        self.transition_groups = []
         self.ticks = 0
-        self.outputs: list[str] = []
+        self.trace = Trace()
         self.using_keyboard_inputs = False
         self.speed = 1
         self.mode = "Moore"
         self.dock = dock
 
         self.timer = QTimer()
-        self.timer.timeout.connect(self._transition)
+        self.timer.timeout.connect(self._tick)
+
+    @property
+    def current_state_name(self) -> str:
+        if self.current_state is None:
+            return ""
+        return self.engine.state_names[self.state_index]
 
     def start(self, input: str, mode: str = "Moore", delimiter: str = "", speed: int = 1,  is_keyboard_inputs: bool = False):
+        if not self._prepare():
+            return
+    
+        self.inputs = [char for char in input] if delimiter == "" else input.split(delimiter)
+        
+        if self.engine.restricted_alphabet and is_keyboard_inputs == False:
+            if not all(self.engine.is_valid_symbol(self.engine.symbol_id(symbol)) for symbol in self.inputs):
+                self.state = SimulationStates.ERROR
+                self.log(f"Input alphabet does not match the input: {input}", "ERROR")
+                return
+
+        self._begin(iter(self.inputs), mode, speed, is_keyboard_inputs)
+
+    def start_stream(self, source: Iterable[str], mode: str = "Moore", speed: int = 1, fast: bool = False):
+        """Start a simulation that pulls symbols lazily from an iterable.
+
+        The alphabet is checked symbol by symbol as the input is consumed.
+        With ``fast`` the whole input is run immediately via run_to_completion.
+        """
+        if not self._prepare():
+            return
+
+        self.inputs = []
+        self._begin(iter(source), mode, speed, False)
+        if fast:
+            self.run_to_completion()
+
+    def _prepare(self) -> bool:
         self.fsm_model = self.dock.parent_window.canvas.fsm_model
 
         if self.state != SimulationStates.IDLE and self.state != SimulationStates.COMPLETED and self.state != SimulationStates.ERROR:
-            return
+            return False
+
+        state_items = list(self.fsm_model.states)
+        transition_items = list(self.fsm_model.transitions)
+        if self.nondeterministic:
+            try:
+                self.engine = NFA.from_model(self.fsm_model).determinize()
+            except SubsetExplosionError as e:
+                self.state = SimulationStates.ERROR
+                self.log(str(e), "ERROR")
+                return False
+            self.state_groups = [[state_items[i] for i in iter_bits(subset)] for subset in self.engine.subsets]
+            self.transition_groups = [[transition_items[t] for t in members] for members in self.engine.transition_members]
+        else:
+            self.engine = CompiledFSM.from_model(self.fsm_model)
+            self.state_groups = [[item] for item in state_items]
+            self.transition_groups = [[item] for item in transition_items]
+            if self.engine.shadowed:
+                cells = ", ".join(self.engine.describe_cell(cell) for cell in self.engine.shadowed[:5])
+                self.log(f"Nondeterministic transitions ({cells}) only follow the first match; "
+                         f"enable NFA mode to follow all of them", "WARNING")
 
-        initial_states = [s for s in self.fsm_model.states if s.is_initial]
+        initial_states = self.engine.initial_states
         if not initial_states:
             self.state = SimulationStates.ERROR
             self.log("No initial state defined", "ERROR")
-            return
+            return False
         if len(initial_states) > 1:
             self.state = SimulationStates.ERROR
-            self.log(f"Multiple initial states: {[s.name for s in initial_states]}", "ERROR")
-            return
-    
-        self.inputs = [char for char in input] if delimiter == "" else input.split(delimiter)
-        
-        if len(self.fsm_model.input_alphabet) != 0 and is_keyboard_inputs == False:
-            if not (set(self.inputs) <= set(self.fsm_model.input_alphabet)):
-                self.state = SimulationStates.ERROR
-                self.log(f"Input alphabet does not match the input: {input}", "ERROR")
-                return
+            self.log(f"Multiple initial states: {[self.engine.state_names[i] for i in initial_states]}", "ERROR")
+            return False
+        return True
 
-        self.current_state = initial_states[0]
+    def _begin(self, source: Iterator[str], mode: str, speed: int, is_keyboard_inputs: bool):
+        self.input_source = source
+        self.current_input = ""
+        self.state_index = self.engine.initial_state
+        self.current_state = self.state_groups[self.state_index][0]
         self.speed = speed
         self.mode = mode
         self.using_keyboard_inputs = is_keyboard_inputs
         self.ticks = 0
-        self.outputs = []
+        self.trace = Trace(self.state_index, self.engine)
+        self.steps_per_second = 0.0
         self.state = SimulationStates.RUNNING
-        self.current_state.animate_active()
-
-        self.timer.start(int(1000 * speed))
+        self._start_timer()
 
         self.log(f"Simulation started in {mode} mode", "INFO")
-        self.log(f"Initial state: {self.current_state.name}", "INFO")
+        self.log(f"Initial state: {self.current_state_name}", "INFO")
 
         if self.dock is not None:
             self.dock.update_status()
 
+    def set_turbo(self, enabled: bool):
+        """Switch between animated ticks and time-sliced turbo stepping"""
+        if self.turbo == enabled:
+            return
+        self.turbo = enabled
+        if self.state == SimulationStates.RUNNING and not self.fast_forward:
+            self._start_timer()
+            self.log(f"Turbo mode {'enabled' if enabled else 'disabled'}", "INFO")
+
+    def run_to_completion(self):
+        """Consume the remaining input as fast as possible.
+
+        This runs like turbo mode, except that per-step outputs are not
+        logged and the steps are not recorded, so seeking back afterwards
+        stops where the fast-forward ended. Pausing or stopping cancels it.
+        """
+        if self.state not in (SimulationStates.RUNNING, SimulationStates.PAUSED) or self.fast_forward:
+            return
+
+        self.fast_forward = True
+        self.state = SimulationStates.RUNNING
+        self.log("Running simulation to completion", "INFO")
+        self._start_timer()
+
+        if self.dock is not None:
+            self.dock.update_status()
+
+    def _start_timer(self):
+        if self.turbo or self.fast_forward:
+            self._stop_animation()
+            self._frame_time = time.perf_counter()
+            self._frame_ticks = self.ticks
+            self.timer.start(0)
+        else:
+            self._animate_active()
+            self.timer.start(int(1000 * self.speed))
+
+    def _tick(self):
+        if self.turbo or self.fast_forward:
+            self._turbo_slice()
+        else:
+            self._transition()
+
+    def _turbo_slice(self):
+        """Run engine steps for one time slice without touching graphics items"""
+        if self.state != SimulationStates.RUNNING:
+            return
+
+        trace = self.trace
+        if self.ticks < trace.end:
+            # Resuming after seeking back: the recorded steps need no replay
+            self._show_tick(trace.end)
+            self._frame_ticks = self.ticks
+        if trace.finished:
+            self._end_of_trace()
+            return
+
+        engine = self.engine
+        symbol_index = engine.symbol_index
+        num_symbols = engine.num_symbols
+        next_state = engine.next_state
+        transition_table = engine.transition_table
+        check_alphabet = engine.restricted_alphabet and not self.using_keyboard_inputs
+        record = not self.fast_forward
+        mealy = self.mode == "Mealy"
+        values = engine.transition_outputs if mealy else engine.state_outputs
+        pending = self._pending_outputs
+        record_symbol = trace.symbols.append
+        record_checkpoint = trace.checkpoints.append
+        interval = trace.interval
+        next_checkpoint = trace.start + len(trace.checkpoints) * interval
+
+        state = self.state_index
+        ticks = self.ticks
+        error = None
+        exhausted = False
+        deadline = time.perf_counter() + TURBO_SLICE_SECONDS
+        while True:
+            consumed = 0
+            try:
+                for symbol in islice(self.input_source, TURBO_CHUNK_SIZE):
+                    consumed += 1
+                    symbol_id = symbol_index.get(symbol, UNKNOWN_SYMBOL)
+                    if check_alphabet and not engine.is_valid_symbol(symbol_id):
+                        error = f"Input symbol {symbol} is not in the input alphabet"
+                        break
+                    if symbol_id == UNKNOWN_SYMBOL:
+                        error = f"No transition found for input {symbol}"
+                        break
+                    cell = state * num_symbols + symbol_id
+                    destination = next_state[cell]
+                    if destination == NO_STATE:
+                        error = f"No transition found for input {symbol}"
+                        break
+                    state = destination
+                    transition = transition_table[cell]
+                    ticks += 1
+                    if record:
+                        record_symbol(symbol_id)
+                        if ticks == next_checkpoint:
+                            record_checkpoint(state)
+                            next_checkpoint += interval
+                        output_value = values[transition] if mealy else values[state]
+                        if len(pending) == TURBO_MAX_LINES:
+                            self._skipped_outputs += 1
+                        pending.append(output_value)
+            except InputLineTooLongError as e:
+                error = str(e)
+            if consumed:
+                self.current_input = symbol
+            if error is not None:
+                break
+            if consumed < TURBO_CHUNK_SIZE:
+                exhausted = True
+                break
+            if time.perf_counter() >= deadline:
+                break
+
+        self.state_index = state
+        self.current_state = self.state_groups[state][0]
+        self.ticks = ticks
+        if record:
+            trace.state = state
+            trace.trim()
+        else:
+            trace.restart(state, ticks)
+
+        if error is not None:
+            self._flush_frame()
+            self._fail(error)
+        elif exhausted:
+            trace.exhausted = True
+            self._flush_frame()
+            self._complete()
+        elif time.perf_counter() - self._frame_time >= 1 / TURBO_FRAME_RATE:
+            self._flush_frame()
+            if self.dock is not None:
+                self.dock.update_status()
+
+    def _flush_frame(self):
+        """Write coalesced outputs to the console and update the step rate"""
+        now = time.perf_counter()
+        elapsed = now - self._frame_time
+        if elapsed > 0:
+            self.steps_per_second = (self.ticks - self._frame_ticks) / elapsed
+        self._frame_time = now
+        self._frame_ticks = self.ticks
+
+        if self.dock is None:
+            self._pending_outputs.clear()
+            self._skipped_outputs = 0
+            return
+        if self._skipped_outputs:
+            self.dock.log_to_simulation(f"... {self._skipped_outputs} outputs skipped", "INFO")
+        for output_value in self._pending_outputs:
+            self.dock.log_to_simulation(f"Output: {output_value}", "INFO")
+        self._pending_outputs.clear()
+        self._skipped_outputs = 0
+
     def pause(self):
         if self.state != SimulationStates.RUNNING:
             return
         
-        self.current_state.stop_animation()
+        self._stop_animation()
         self.timer.stop()
+        if self.turbo or self.fast_forward:
+            self._flush_frame()
+        self.fast_forward = False
         self.log("Simulation paused", "INFO")
         self.state = SimulationStates.PAUSED
 
@@ -89,9 +332,8 @@ class Simulation:
         if self.state != SimulationStates.PAUSED:
             return
         
-        self.timer.start(int(1000 * self.speed))
-        self.current_state.animate_active()
         self.state = SimulationStates.RUNNING
+        self._start_timer()
         self.log("Simulation resumed", "INFO")
         if self.dock is not None:
             self.dock.update_status()
@@ -104,13 +346,57 @@ class Simulation:
         if self.dock is not None:
             self.dock.update_status()
 
+    def step_back(self):
+        """Undo the last step by moving one tick back along the trace"""
+        if self.ticks > self.trace.start:
+            self.seek(self.ticks - 1)
+
+    def seek(self, tick: int):
+        """Jump to any recorded tick of the current run.
+
+        The state is restored from the nearest trace checkpoint, replaying at
+        most one checkpoint interval. A running simulation is paused first.
+        A completed or failed run that
+        is moved back before its end becomes paused, and stepping forward from
+        there replays the trace until the end is reached again.
+        """
+        if self.state == SimulationStates.IDLE or self.current_state is None:
+            return
+        if self.state == SimulationStates.RUNNING:
+            self.pause()
+
+        tick = max(self.trace.start, min(tick, self.trace.end))
+        self._show_tick(tick)
+        if self.state != SimulationStates.PAUSED and tick < self.trace.end:
+            self.state = SimulationStates.PAUSED
+        if self.state == SimulationStates.PAUSED:
+            self._animate_active()
+
+        if self.dock is not None:
+            self.dock.update_status()
+
+    def _show_tick(self, tick: int):
+        self._stop_animation()
+        self.ticks = tick
+        self.state_index = self.trace.state_at(tick)
+        self.current_state = self.state_groups[self.state_index][0]
+        self.current_input = self.engine.symbols[self.trace.symbol_at(tick - 1)] if tick > self.trace.start else ""
+
     def stop(self):
         if self.state == SimulationStates.IDLE:
             return
+        if self.current_state is not None:
+            self._stop_animation()
+        self.timer.stop()
+        self.fast_forward = False
+        self._pending_outputs.clear()
+        self._skipped_outputs = 0
         self.state = SimulationStates.IDLE
         self.current_state = None
+        self.state_index = NO_STATE
+        self.input_source = iter(())
         self.ticks = 0
-        self.outputs = []
+        self.trace = Trace()
         self.log("Simulation stopped", "INFO")
         
         if self.dock is not None:
@@ -125,50 +411,91 @@ class Simulation:
         if self.state != SimulationStates.RUNNING and not step:
             return
 
-        if self.ticks >= len(self.inputs):
-            self.state = SimulationStates.COMPLETED
-            self.current_state.stop_animation()
-            self.timer.stop()
-            self.log("Simulation completed", "INFO")
-            if self.current_state.is_accepting:
-                self.dock.log_to_simulation(f"Accepting state: {self.current_state.name}", "INFO")
-            else:
-                self.dock.log_to_simulation(f"Non-accepting state: {self.current_state.name}", "INFO")
-            if self.dock is not None:
-                self.dock.update_status()
+        if self.ticks < self.trace.end:
+            symbol_id, transition, next_state = next(self.trace.steps(self.ticks, 1))
+            self.current_input = self.engine.symbols[symbol_id]
+            self._enter(next_state, transition)
+            return
+        if self.trace.finished:
+            self._end_of_trace()
             return
 
-        next_transition = self.find_transition()
-        self.ticks += 1
+        try:
+            symbol = next(self.input_source, None)
+        except InputLineTooLongError as e:
+            self._fail(str(e))
+            return
+        if symbol is None:
+            self.trace.exhausted = True
+            self._complete()
+            return
 
-        if next_transition is None:
-            self.state = SimulationStates.ERROR
-            self.log(f"No transition found for input {self.inputs[self.ticks - 1]}", "ERROR")
-            self.current_state.stop_animation()
-            self.timer.stop()
-            if self.dock is not None:
-                self.dock.update_status()
+        self.current_input = symbol
+        symbol_id = self.engine.symbol_id(symbol)
+
+        if not self.using_keyboard_inputs and not self.engine.is_valid_symbol(symbol_id):
+            self._fail(f"Input symbol {symbol} is not in the input alphabet")
             return
-        
-        next_transition.animate_simulation_flow()
-        self.current_state.stop_animation()
-        self.current_state = next_transition.destination
-        self.current_state.animate_active()
+
+        next_state, transition = self.engine.step(self.state_index, symbol_id)
+
+        if next_state == NO_STATE:
+            self._fail(f"No transition found for input {symbol}")
+            return
+
+        self.trace.record(symbol_id, next_state)
+        self._enter(next_state, transition)
+
+    def _enter(self, next_state: int, transition: int):
+        for item in self.transition_groups[transition]:
+            item.animate_simulation_flow()
+        self._stop_animation()
+        self.state_index = next_state
+        self.current_state = self.state_groups[next_state][0]
+        self._animate_active()
+        self.ticks += 1
         if self.mode == "Moore":
-            self.dock.log_to_simulation(f"Output: {self.current_state.output_value}", "INFO")
+            self.dock.log_to_simulation(f"Output: {self.engine.state_outputs[next_state]}", "INFO")
         elif self.mode == "Mealy":
-            output_value = next_transition.output_value
-            self.dock.log_to_simulation(f"Output: {output_value}", "INFO")
-            self.outputs.append(output_value)
+            self.dock.log_to_simulation(f"Output: {self.engine.transition_outputs[transition]}", "INFO")
+
+        if self.dock is not None:
+            self.dock.update_status()
+
+    def _end_of_trace(self):
+        """Finish a run whose recorded trace already reached its end"""
+        if self.trace.error:
+            self._fail(self.trace.error)
+        else:
+            self._complete()
 
+    def _complete(self):
+        self.state = SimulationStates.COMPLETED
+        self.fast_forward = False
+        self._stop_animation()
+        self.timer.stop()
+        self.log("Simulation completed", "INFO")
+        if self.engine.accepting[self.state_index]:
+            self.dock.log_to_simulation(f"Accepting state: {self.current_state_name}", "INFO")
+        else:
+            self.dock.log_to_simulation(f"Non-accepting state: {self.current_state_name}", "INFO")
+        if self.dock is not None:
+            self.dock.update_status()
+
+    def _fail(self, message: str):
+        self.trace.error = message
+        self.state = SimulationStates.ERROR
+        self.fast_forward = False
+        self.log(message, "ERROR")
+        self._stop_animation()
+        self.timer.stop()
         if self.dock is not None:
             self.dock.update_status()
         
-    def find_transition(self):
-        for transition in self.current_state.transitions:
-            if transition.source != self.current_state:
-                continue
-            if self.inputs[self.ticks] in transition.input_symbols:
-                return transition
-            
-        return None
\ No newline at end of file
+    def _animate_active(self):
+        for item in self.state_groups[self.state_index]:
+            item.animate_active()
+
+    def _stop_animation(self):
+        for item in self.state_groups[self.state_index]:
+            item.stop_animation()
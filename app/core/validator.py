@@ -1,71 +1,296 @@
-from app.ui.items.state import FSMModel
+from collections import Counter, deque
+from dataclasses import dataclass
+from typing import Callable
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal
+from app.ui.items.state import FSMModel, StateItem
 from app.ui.docks.console import ConsoleDock
 
-class FSMValidator:
+
+# Quiet period after the last edit before a validation run starts
+VALIDATION_DEBOUNCE_MS = 150
+
+
+@dataclass(frozen=True)
+class ValidationSnapshot:
+    """Immutable, Qt-free view of what the validation checks need.
+
+    ``reachable`` is the per-state reachability when it is known, otherwise
+    None and reachability is recomputed from ``edges`` (state index pairs).
+    """
+    revision: int
+    state_names: tuple[str, ...]
+    initial_states: tuple[int, ...]
+    accepting_count: int
+    duplicate_names: tuple[str, ...]
+    reachable: tuple[bool, ...] | None
+    edges: tuple[tuple[int, int], ...] = ()
+
+
+def compute_issues(snapshot: ValidationSnapshot, cancelled: Callable[[], bool] = lambda: False):
+    """Return (issues, reachable) for a snapshot, or None once cancelled"""
+    issues = []
+    names = snapshot.state_names
+    if not names:
+        issues.append("Machine has no states")
+
+    initial_states = snapshot.initial_states
+    if len(initial_states) == 0:
+        issues.append("No initial state defined")
+    elif len(initial_states) > 1:
+        issues.append(f"Multiple initial states: {[names[i] for i in initial_states]}")
+
+    if snapshot.accepting_count == 0:
+        issues.append("No accepting states defined")
+
+    reachable = snapshot.reachable
+    if names and initial_states:
+        if reachable is None:
+            adjacency = [[] for _ in names]
+            for source, destination in snapshot.edges:
+                adjacency[source].append(destination)
+            mask = [False] * len(names)
+            queue = deque(initial_states)
+            for i in initial_states:
+                mask[i] = True
+            while queue:
+                if cancelled():
+                    return None
+                for destination in adjacency[queue.popleft()]:
+                    if not mask[destination]:
+                        mask[destination] = True
+                        queue.append(destination)
+            reachable = tuple(mask)
+
+        unreachable = [name for name, is_reachable in zip(names, reachable) if not is_reachable]
+        if unreachable:
+            issues.append(f"Unreachable states: {unreachable}")
+
+    if snapshot.duplicate_names:
+        issues.append(f"Duplicate state names: {list(snapshot.duplicate_names)}")
+    return issues, reachable
+
+
+class ValidationThread(QThread):
+    issues_ready = pyqtSignal(object, object)
+
+    def __init__(self, snapshot: ValidationSnapshot, parent=None):
+        super().__init__(parent)
+        self.snapshot = snapshot
+
+    def run(self):
+        result = compute_issues(self.snapshot, self.isInterruptionRequested)
+        if result is not None:
+            self.issues_ready.emit(self.snapshot, result)
+
+
+class FSMValidator(QObject):
+    """Validates an FSMModel from counters that follow its item events.
+
+    Initial states, accepting states, name multiplicities and the set of
+    states reachable from an initial state are updated per added, removed
+    or renamed item, so validation does not rescan the whole machine. Only
+    removals that can shrink the reachable set mark it dirty, and it is then
+    recomputed once in O(S + T).
+
+    Runs are debounced and happen on a ValidationThread over an immutable
+    snapshot; a newer edit interrupts the running one and stale results are
+    dropped. issues_changed is emitted only when the issue list differs.
+    """
+
+    issues_changed = pyqtSignal(list)
+
     def __init__(self, fsm_model: FSMModel = None, console_dock: ConsoleDock = None):
-        self.model = fsm_model
+        super().__init__()
+        self.model = None
         self.console_dock = console_dock
         self.issues = []
-    
+        self._revision = 0
+        self._thread: ValidationThread | None = None
+        self._threads: set[ValidationThread] = set()
+
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(VALIDATION_DEBOUNCE_MS)
+        self._debounce.timeout.connect(self._start_run)
+
+        self._initial_states: dict[StateItem, None] = {}
+        self._accepting_count = 0
+        self._name_counts: Counter[str] = Counter()
+        self._duplicate_names: dict[str, None] = {}
+        self._reachable: set[StateItem] = set()
+        self._reachable_dirty = False
+
+        if fsm_model is not None:
+            self._attach(fsm_model)
+
     def validate(self):
-        """Run all FSM validation checks"""
-        self.issues.clear()
-        self._check_empty_machine()
-        self._check_initial_state()
-        self._check_accepting_states()
-        self._check_unreachable_states()
-        self._check_duplicate_names()
-        if self.console_dock:
-            self.console_dock.clear_validation()
-            self.console_dock.append_validation(self.issues)
+        """Schedule a background validation run after the debounce interval"""
+        self._debounce.start()
+
+    def validate_now(self):
+        """Run all FSM validation checks synchronously"""
+        self._debounce.stop()
+        self._cancel_run()
+        if self.model is None:
+            return
+        issues, reachable = compute_issues(self._snapshot())
+        self._apply(issues, reachable)
 
     def set_model(self, model: FSMModel):
-        self.model = model
+        self._attach(model)
         self.validate()
-    
+
     def set_console_dock(self, console_dock: ConsoleDock):
         self.console_dock = console_dock
-    
-    def _check_empty_machine(self):
-        if not self.model.states:
-            self.issues.append("Machine has no states")
-    
-    def _check_initial_state(self):
-        initial_states = [s for s in self.model.states if s.is_initial]
-        if len(initial_states) == 0:
-            self.issues.append("No initial state defined")
-        elif len(initial_states) > 1:
-            self.issues.append(f"Multiple initial states: {[s.name for s in initial_states]}")
-    
-    def _check_accepting_states(self):
-        accepting_states = [s for s in self.model.states if s.is_accepting]
-        if not accepting_states:
-            self.issues.append("No accepting states defined")
-    
-    def _check_unreachable_states(self):
-        if not self.model.states:
+        self.console_dock.clear_validation()
+        self.console_dock.append_validation(self.issues)
+
+    def shutdown(self):
+        """Stop pending and running validation, e.g. before the application quits"""
+        self._debounce.stop()
+        self._cancel_run()
+        for thread in list(self._threads):
+            thread.wait()
+
+    def _snapshot(self) -> ValidationSnapshot:
+        states = list(self.model.states)
+        index = {state: i for i, state in enumerate(states)}
+        initial_states = tuple(index[s] for s in self._initial_states if s in index)
+
+        if self._reachable_dirty:
+            reachable = None
+            edges = tuple((index[t.source], index[t.destination]) for t in self.model.transitions
+                          if t.source in index and t.destination in index)
+        else:
+            reachable = tuple(s in self._reachable for s in states)
+            edges = ()
+
+        return ValidationSnapshot(self._revision, tuple(s.name for s in states), tuple(sorted(initial_states)),
+                                  self._accepting_count, tuple(self._duplicate_names), reachable, edges)
+
+    def _start_run(self):
+        if self.model is None:
             return
-        
-        initial_states = [s for s in self.model.states if s.is_initial]
-        if not initial_states:
+        self._cancel_run()
+        thread = ValidationThread(self._snapshot())
+        thread.issues_ready.connect(self._on_issues_ready)
+        thread.finished.connect(lambda: self._release(thread))
+        self._threads.add(thread)
+        self._thread = thread
+        thread.start()
+
+    def _release(self, thread: ValidationThread):
+        thread.wait()
+        self._threads.discard(thread)
+
+    def _cancel_run(self):
+        if self._thread is not None:
+            self._thread.requestInterruption()
+            self._thread = None
+
+    def _on_issues_ready(self, snapshot: ValidationSnapshot, result):
+        # Results for a model that changed since the snapshot are stale
+        if snapshot.revision != self._revision:
+            return
+        issues, reachable = result
+        self._apply(issues, reachable)
+
+    def _apply(self, issues: list[str], reachable):
+        if self._reachable_dirty and reachable is not None:
+            self._reachable = {s for s, is_reachable in zip(self.model.states, reachable) if is_reachable}
+            self._reachable_dirty = False
+
+        if issues == self.issues:
             return
-        
-        reachable = set(initial_states)
-        queue = list(initial_states)
-        
+        self.issues = issues
+        if self.console_dock:
+            self.console_dock.clear_validation()
+            self.console_dock.append_validation(self.issues)
+        self.issues_changed.emit(self.issues)
+
+    def _attach(self, model: FSMModel):
+        if self.model is not None:
+            self.model.on_item_change_remove(self._on_item_change)
+        self.model = model
+        model.on_item_change(self._on_item_change)
+        self._revision += 1
+        self._rebuild()
+
+    def _rebuild(self):
+        self._initial_states = {s: None for s in self.model.states if s.is_initial}
+        self._accepting_count = sum(1 for s in self.model.states if s.is_accepting)
+        self._name_counts = Counter(s.name for s in self.model.states)
+        self._duplicate_names = {name: None for name, count in self._name_counts.items() if count > 1}
+        self._reachable_dirty = True
+
+    def _on_item_change(self, event: str, item, old_value):
+        self._revision += 1
+        self.validate()
+        self._apply_event(event, item, old_value)
+
+    def _apply_event(self, event: str, item, old_value):
+        if event == "state_added":
+            self._add_name(item.name)
+            if item.is_accepting:
+                self._accepting_count += 1
+            if item.is_initial:
+                self._initial_states[item] = None
+                self._extend_reachable(item)
+        elif event == "state_removed":
+            self._remove_name(item.name)
+            if item.is_accepting:
+                self._accepting_count -= 1
+            self._initial_states.pop(item, None)
+            if item in self._reachable:
+                self._reachable_dirty = True
+        elif event == "state_renamed":
+            self._remove_name(old_value)
+            self._add_name(item.name)
+        elif event == "state_initial":
+            if item.is_initial:
+                self._initial_states[item] = None
+                self._extend_reachable(item)
+            else:
+                self._initial_states.pop(item, None)
+                self._reachable_dirty = True
+        elif event == "state_accepting":
+            self._accepting_count += 1 if item.is_accepting else -1
+        elif event == "transition_added":
+            if item.source in self._reachable:
+                self._extend_reachable(item.destination)
+        elif event == "transition_removed":
+            if item.source in self._reachable and item.destination in self._reachable:
+                self._reachable_dirty = True
+        elif event == "batch" and item.events is not None:
+            # Only adds and removes, which replay against the final items
+            for args in item.events:
+                self._apply_event(*args)
+        elif event in ("cleared", "batch"):
+            self._rebuild()
+
+    def _add_name(self, name: str):
+        self._name_counts[name] += 1
+        if self._name_counts[name] == 2:
+            self._duplicate_names[name] = None
+
+    def _remove_name(self, name: str):
+        self._name_counts[name] -= 1
+        if self._name_counts[name] <= 0:
+            del self._name_counts[name]
+        if self._name_counts[name] < 2:
+            self._duplicate_names.pop(name, None)
+
+    def _extend_reachable(self, state: StateItem):
+        """Add ``state`` and everything reachable from it to the reachable set"""
+        if self._reachable_dirty or state in self._reachable:
+            return
+        self._reachable.add(state)
+        queue = deque([state])
+        transitions = self.model.transitions
         while queue:
-            current = queue.pop(0)
-            for transition in self.model.transitions:
-                if transition.source == current and transition.destination not in reachable:
-                    reachable.add(transition.destination)
+            current = queue.popleft()
+            for transition in current.transitions:
+                if (transition.source is current and transition.destination not in self._reachable
+                        and transition in transitions):
+                    self._reachable.add(transition.destination)
                     queue.append(transition.destination)
-        
-        unreachable = [s.name for s in self.model.states if s not in reachable]
-        if unreachable:
-            self.issues.append(f"Unreachable states: {unreachable}")
-    
-    def _check_duplicate_names(self):
-        names = [s.name for s in self.model.states]
-        duplicates = [name for name in set(names) if names.count(name) > 1]
-        if duplicates:
-            self.issues.append(f"Duplicate state names: {duplicates}")
\ No newline at end of file
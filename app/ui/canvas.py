@@ -1,16 +1,21 @@
-from PyQt5.QtWidgets import QGraphicsView, QGraphicsScene, QGraphicsLineItem
-from PyQt5.QtCore import QRectF, Qt, QPointF, QLineF
-from PyQt5.QtGui import QPainter, QPen
+from PyQt5.QtWidgets import (QGraphicsView, QGraphicsScene, QGraphicsLineItem, QProgressBar,
+                             QStyleOptionGraphicsItem)
+from PyQt5.QtCore import QRectF, Qt, QPointF, QLineF, QTimer
+from PyQt5.QtGui import QPainter, QPen, QPixmap, QBrush, QTransform, QPainterPath, QColor
 from app.ui.items.state import StateItem, FSMModel
-from app.ui.items.transition import TransitionItem
+from app.ui.items.transition import TransitionItem, TransitionLabel, DETAIL_LOD
 from app.ui.items.comment import CommentItem
 from app.core.commands import *
 from typing import TYPE_CHECKING
+import time
 
 if TYPE_CHECKING:
     from app.ui.main_window import MainWindow
 
 
+LOAD_SLICE_SECONDS = 0.03   # Time spent adding items per event loop pass while a model loads
+
+
 class CanvasView(QGraphicsView):
     def __init__(self, parent: "MainWindow"=None):
         super().__init__(parent)
@@ -23,53 +28,185 @@ class CanvasView(QGraphicsView):
         self.selected_tool: str = parent.getSelectedTool()
 
         self.scene: QGraphicsScene = QGraphicsScene(self)
+        # Transitions span large parts of the scene, which makes a BSP index
+        # return most items for every exposed rect at a far higher cost
+        # than scanning them
+        self.scene.setItemIndexMethod(QGraphicsScene.ItemIndexMethod.NoIndex)
         self.setScene(self.scene)
 
         self.temp_line: QGraphicsLineItem = None
         self.starting_state: StateItem = None
 
+        # Items of the current model not yet added to the scene, nearest to the viewport first
+        self._pending_items: list[StateItem | TransitionItem] = []
+        self._pending_index = 0
+        self._slice_end = 0.0
+        self._load_timer = QTimer(self)
+        self._load_timer.setInterval(0)
+        self._load_timer.timeout.connect(self._load_next_slice)
+        self.load_progress = QProgressBar()
+        self.load_progress.setMaximumWidth(200)
+        self.load_progress.setFormat("Loading %v/%m")
+        self.load_progress.hide()
+
         self.scene.setSceneRect(QRectF(0, 0, 2000, 2000))
         self.setRenderHint(QPainter.RenderHint.Antialiasing, True)
 
         self.gridSpacing = 50
         self.gridPen = QPen(Qt.GlobalColor.gray)
         self.gridPen.setWidth(2)
+        self._grid_brush: QBrush = None
+        self._grid_brush_key = None
+        # Below DETAIL_LOD transition items are hidden and their curves are
+        # drawn under the states in one call per colour instead
+        self._details_visible = True
+        self._overview_paths: dict[str, QPainterPath] = {}
+        self._overview_key = None
+        self._overview_pen = QPen()
+        self._overview_pen.setWidth(0)  # Cosmetic hairline
 
         self.setAcceptDrops(True)
         self.viewport().setAcceptDrops(True)
         self.setDragMode(QGraphicsView.DragMode.ScrollHandDrag)
 
     def set_new_model(self, model: FSMModel):
+        """Show ``model``, adding its items to the scene in time slices.
+
+        The model is complete immediately; only its graphics items reach the
+        scene progressively, starting with the states nearest the viewport
+        each followed by its transitions, so the first screen appears at once.
+        """
+        if model is not self.fsm_model:
+            # The history refers to the items of the previous model
+            self.command_manager.clear()
+        # Keep the model dock current for every model shown, however it was created
+        model.on_change(self.parent_window.model_dock.update_model_info)
+        self.parent_window.model_dock.update_model_info(model)
+        self._load_timer.stop()
         self.scene.clear()
         self.fsm_model = model
 
-        for state in self.fsm_model.states:
-            self.scene.addItem(state)
-
-        for transition in self.fsm_model.transitions:
-            self.scene.addItem(transition)
-            transition.reinit()
-            
         for comment in self.fsm_model.comments:
             self.scene.addItem(comment)
 
+        center = self.mapToScene(self.viewport().rect().center())
+
+        def distance(state: StateItem):
+            offset = state.pos() - center
+            return offset.x() * offset.x() + offset.y() * offset.y()
+
+        pending = []
+        queued = set()
+        for state in sorted(self.fsm_model.states, key=distance):
+            pending.append(state)
+            for transition in state.transitions:
+                if transition not in queued:
+                    queued.add(transition)
+                    pending.append(transition)
+        self._pending_items = pending
+        self._pending_index = 0
+        self._slice_end = time.perf_counter()
+
         self.parent_window.validator.set_model(self.fsm_model)
+
+        self._load_next_slice()
+        if self._pending_index < len(self._pending_items):
+            self.load_progress.setRange(0, len(self._pending_items))
+            self.load_progress.setValue(self._pending_index)
+            self.load_progress.show()
+            self._load_timer.start()
+
+    def _load_next_slice(self):
+        # Repainting between slices can take longer than a slice, so match
+        # the slice to it and keep at least half of the time for loading
+        now = time.perf_counter()
+        deadline = now + max(LOAD_SLICE_SECONDS, now - self._slice_end)
+        items = self._pending_items
+        while self._pending_index < len(items):
+            item = items[self._pending_index]
+            self._pending_index += 1
+            # Items deleted from the model while it was loading stay out of the scene
+            if item.model is self.fsm_model and item.scene() is None:
+                self.scene.addItem(item)
+                if isinstance(item, TransitionItem):
+                    item.reinit()
+                    item.setVisible(self._details_visible)
+            if time.perf_counter() >= deadline:
+                break
+        self._slice_end = time.perf_counter()
+
+        if self._pending_index < len(items):
+            self.load_progress.setValue(self._pending_index)
+        else:
+            self._pending_items = []
+            self._pending_index = 0
+            self._load_timer.stop()
+            self.load_progress.hide()
     
     def drawBackground(self, painter, rect):
         super().drawBackground(painter, rect)
 
-        left = int(rect.left()) - (int(rect.left()) % self.gridSpacing)
-        top = int(rect.top()) - (int(rect.top()) % self.gridSpacing)
-
-        points = []
-
-        for x in range(left, int(rect.right()), self.gridSpacing):
-            for y in range(top, int(rect.bottom()), self.gridSpacing):
-                points.append(QPointF(x, y))
-
-        painter.setPen(self.gridPen)
-        for point in points:
-            painter.drawPoint(point)
+        painter.fillRect(rect, self._get_grid_brush(painter.worldTransform().m11()))
+
+        # Hidden items are skipped without calling into them, while painting
+        # thousands of hairlines one item at a time costs more than the lines
+        lod = QStyleOptionGraphicsItem.levelOfDetailFromTransform(painter.worldTransform())
+        if (lod >= DETAIL_LOD) != self._details_visible:
+            self._details_visible = lod >= DETAIL_LOD
+            QTimer.singleShot(0, self._apply_details_visible)
+
+        if not self._details_visible:
+            painter.save()
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing, False)
+            painter.setBrush(Qt.BrushStyle.NoBrush)
+            for color, path in self._get_overview_paths().items():
+                self._overview_pen.setColor(QColor(color))
+                painter.setPen(self._overview_pen)
+                painter.drawPath(path)
+            painter.restore()
+
+    def _apply_details_visible(self):
+        for transition in self.fsm_model.transitions:
+            if transition.scene() is self.scene:
+                transition.setVisible(self._details_visible)
+
+    def _get_overview_paths(self) -> dict[str, QPainterPath]:
+        """Curves of all loaded transitions merged per colour, rebuilt when any of them changes"""
+        key = (self.fsm_model, self.fsm_model.transitions_version)
+        if key != self._overview_key:
+            self._overview_paths = {}
+            for transition in self.fsm_model.transitions:
+                path = transition.path()
+                if path is not None and transition.scene() is self.scene:
+                    self._overview_paths.setdefault(transition.color.name(), QPainterPath()).addPath(path)
+            self._overview_key = key
+        return self._overview_paths
+
+    def _get_grid_brush(self, scale: float) -> QBrush:
+        """Brush tiling one grid cell, rebuilt when the zoom, spacing or pen changes"""
+        key = (self.gridSpacing, scale, self.gridPen.color().rgba(), self.gridPen.widthF())
+        if key != self._grid_brush_key:
+            # Render the cell at device resolution with its point in the middle,
+            # then map it back so points land on multiples of the spacing
+            tile_size = max(1, round(self.gridSpacing * scale))
+            tile_scale = tile_size / self.gridSpacing
+            tile = QPixmap(tile_size, tile_size)
+            tile.fill(Qt.GlobalColor.transparent)
+
+            tile_painter = QPainter(tile)
+            tile_painter.setRenderHint(QPainter.RenderHint.Antialiasing, True)
+            pen = QPen(self.gridPen)
+            pen.setWidthF(self.gridPen.widthF() * tile_scale)
+            tile_painter.setPen(pen)
+            tile_painter.drawPoint(QPointF(tile_size / 2, tile_size / 2))
+            tile_painter.end()
+
+            self._grid_brush = QBrush(tile)
+            self._grid_brush.setTransform(QTransform()
+                                          .translate(-self.gridSpacing / 2, -self.gridSpacing / 2)
+                                          .scale(1 / tile_scale, 1 / tile_scale))
+            self._grid_brush_key = key
+        return self._grid_brush
 
 
     def dragEnterEvent(self, event):
@@ -218,6 +355,24 @@ class CanvasView(QGraphicsView):
             self.temp_line.setLine(QLineF(self.temp_line.line().p1(), p2))
 
         return super().mouseMoveEvent(event)
-            
-            
 
+    def delete_selected(self):
+        """Delete every selected state, transition label and comment as one undo step"""
+        selected = self.scene.selectedItems()
+        states = [item for item in selected if isinstance(item, StateItem)]
+        comments = [item for item in selected if isinstance(item, CommentItem)]
+        # Transitions of deleted states go with them
+        doomed = set(states)
+        transitions = [item.parent for item in selected if isinstance(item, TransitionLabel)
+                       and item.parent.source not in doomed and item.parent.destination not in doomed]
+        count = len(states) + len(transitions) + len(comments)
+        if count == 0:
+            return
+
+        with self.command_manager.transaction(f"Deleted {count} selected items", self.fsm_model):
+            for transition in transitions:
+                self.command_manager.execute(DeleteCommand(transition, self.scene, self.fsm_model))
+            for state in states:
+                self.command_manager.execute(DeleteCommand(state, self.scene, self.fsm_model))
+            for comment in comments:
+                self.command_manager.execute(DeleteCommand(comment, self.scene))
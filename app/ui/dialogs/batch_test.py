@@ -3,13 +3,65 @@ from PyQt5.QtWidgets import (
     QPushButton, QTableWidget, QTableWidgetItem, QProgressBar,
     QComboBox, QSpinBox, QCheckBox, QMessageBox, QLineEdit
 )
+from PyQt5.QtCore import QThread, QSemaphore, pyqtSignal
 import json
+import shutil
+import tempfile
+import textwrap
+from app.core.engine import CompiledFSM
+from app.core.batch import run_batch_parallel
+from app.core.input_stream import FileInputStream, InputLineTooLongError
 
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from app.ui.main_window import MainWindow
 
+
+# The table shows the first BATCH_TABLE_ROWS results; all of them are
+# written to the export file
+BATCH_TABLE_ROWS = 1000
+
+
+class BatchTestThread(QThread):
+    """Run a batch on the process pool and hand each finished shard to the dialog.
+
+    At most MAX_PENDING_SHARDS shards wait for the dialog at a time; the
+    dialog calls shard_handled() for each one, so a slow GUI holds back the
+    pool instead of queueing up results.
+    """
+    MAX_PENDING_SHARDS = 2
+
+    shard_finished = pyqtSignal(int, object, object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, engine: CompiledFSM, lines, delimiter: str, mode: str, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self.lines = lines
+        self.delimiter = delimiter
+        self.mode = mode
+        self.free_slots = QSemaphore(self.MAX_PENDING_SHARDS)
+
+    def run(self):
+        shards = run_batch_parallel(self.engine, self.lines, self.delimiter, self.mode)
+        try:
+            for offset, lines, result in shards:
+                while not self.free_slots.tryAcquire(1, 100):
+                    if self.isInterruptionRequested():
+                        return
+                if self.isInterruptionRequested():
+                    return
+                self.shard_finished.emit(offset, lines, result)
+        except InputLineTooLongError as e:
+            self.failed.emit(str(e))
+        finally:
+            shards.close()
+
+    def shard_handled(self):
+        self.free_slots.release()
+
+
 class BatchTestDialog(QDialog):
     def __init__(self, parent: "MainWindow"=None):
         super().__init__(parent)
@@ -17,13 +69,29 @@ class BatchTestDialog(QDialog):
         self.setFixedSize(600, 500)
         self.parent_window = parent
 
-        self.results = []
+        # Results are spooled to a temporary file as a JSON array in input
+        # order, so memory does not grow with the number of inputs
+        self.results_file = None
+        self.results_count = 0
+        self.next_offset = 0
+        self.waiting_shards: dict[int, list[dict]] = {}
+        self.status_counts: dict[str, int] = {}
+        self.completed = 0
+        self.total = 0      # 0 while streaming from a file
+        self.worker: BatchTestThread | None = None
+        self.input_file: str | None = None
         
         layout = QVBoxLayout()
         
         # Input section
         input_layout = QVBoxLayout()
-        input_layout.addWidget(QLabel("Test Inputs (one per line):"))
+        input_header = QHBoxLayout()
+        input_header.addWidget(QLabel("Test Inputs (one per line):"))
+        input_header.addStretch()
+        self.file_button = QPushButton("Load File")
+        self.file_button.clicked.connect(self.toggle_input_file)
+        input_header.addWidget(self.file_button)
+        input_layout.addLayout(input_header)
         self.input_text = QTextEdit()
         self.input_text.setMaximumHeight(100)
         self.input_text.setPlaceholderText("abc\n123\ntest")
@@ -85,49 +153,147 @@ class BatchTestDialog(QDialog):
         
         self.setLayout(layout)
     
-    def run_tests(self):
-        inputs = [line.strip() for line in self.input_text.toPlainText().split('\n') if line.strip()]
-        if not inputs:
-            self._log("No test inputs provided", "WARNING")
+    def toggle_input_file(self):
+        """Stream test inputs from a file instead of the text box, or go back"""
+        from PyQt5.QtWidgets import QFileDialog
+        
+        if self.input_file is not None:
+            self.input_file = None
+            self.input_text.setEnabled(True)
+            self.input_text.clear()
+            self.file_button.setText("Load File")
             return
         
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "Load Test Inputs", "", "Text Files (*.txt);;All Files (*)")
+        if file_path:
+            self.input_file = file_path
+            self.input_text.setPlainText(f"Streaming inputs from: {file_path}")
+            self.input_text.setEnabled(False)
+            self.file_button.setText("Clear File")
+    
+    def _test_lines(self):
+        """Yield non-empty, stripped test lines from the text box or the input file"""
+        if self.input_file is not None:
+            lines = FileInputStream(self.input_file).lines()
+        else:
+            lines = self.input_text.toPlainText().split('\n')
+        for line in lines:
+            line = line.strip()
+            if line:
+                yield line
+    
+    def run_tests(self):
+        streaming = self.input_file is not None
+        if streaming:
+            inputs = self._test_lines()
+            total = 0
+        else:
+            inputs = list(self._test_lines())
+            total = len(inputs)
+            if not inputs:
+                self._log("No test inputs provided", "WARNING")
+                return
+        
         # Log test configuration
         delimiter = self.delimiter_input.text() or "per character"
-        self._log(f"Starting batch test with {len(inputs)} inputs", "INFO")
+        source = f"file {self.input_file}" if streaming else f"{total} inputs"
+        self._log(f"Starting batch test with {source}", "INFO")
         self._log(f"Mode: {self.mode_combo.currentText()}, Delimiter: {delimiter}", "INFO")
         
         self.progress.setVisible(True)
-        self.progress.setMaximum(len(inputs))
+        # A maximum of 0 shows a busy indicator while the total is unknown
+        self.progress.setMaximum(total)
         self.progress.setValue(0)
         self.run_button.setEnabled(False)
         
-        self.results_table.setRowCount(len(inputs))
-        self.results = []
+        self.results_table.setRowCount(min(total, BATCH_TABLE_ROWS))
+        self.engine = CompiledFSM.from_model(self.parent_window.canvas.fsm_model)
+        if self.engine.shadowed:
+            cells = ", ".join(self.engine.describe_cell(cell) for cell in self.engine.shadowed[:5])
+            self._log(f"Nondeterministic transitions ({cells}) only follow the first match", "WARNING")
+        
+        self._close_results_file()
+        self.results_file = tempfile.TemporaryFile("w+", encoding="utf-8")
+        self.results_file.write("[")
+        self.results_count = 0
+        self.next_offset = 0
+        self.waiting_shards = {}
+        self.status_counts = {}
+        self.completed = 0
+        self.total = total
+        
+        error = self._batch_error()
+        if error:
+            if streaming:
+                # Do not read a possibly huge file just to repeat the same status
+                self._on_tests_finished()
+                return
+            self._on_shard_finished(0, inputs, [{"final_state": "N/A", "output": "N/A", "status": error} for _ in inputs])
+            self._on_tests_finished()
+            return
+        
+        self.worker = BatchTestThread(self.engine, inputs, self.delimiter_input.text(),
+                                      self.mode_combo.currentText().lower(), self)
+        self.worker.shard_finished.connect(self._on_shard_finished)
+        self.worker.failed.connect(lambda message: self._log(f"Batch test stopped: {message}", "ERROR"))
+        self.worker.finished.connect(self._on_tests_finished)
+        self.worker.start()
+    
+    def _on_shard_finished(self, offset: int, lines: list[str], shard):
+        results = shard if isinstance(shard, list) else shard.to_dicts(self.engine)
+        
+        # Only the first rows are shown, placed by offset as shards finish out of order
+        shown = max(0, min(len(results), BATCH_TABLE_ROWS - offset))
+        if shown:
+            if offset + shown > self.results_table.rowCount():
+                self.results_table.setRowCount(offset + shown)
+            self.results_table.setUpdatesEnabled(False)
+            for i, (test_input, result) in enumerate(zip(lines[:shown], results), offset):
+                self.results_table.setItem(i, 0, QTableWidgetItem(test_input))
+                self.results_table.setItem(i, 1, QTableWidgetItem(result['final_state']))
+                self.results_table.setItem(i, 2, QTableWidgetItem(result['output']))
+                self.results_table.setItem(i, 3, QTableWidgetItem(result['status']))
+            self.results_table.setUpdatesEnabled(True)
+        
+        for result in results:
+            self.status_counts[result['status']] = self.status_counts.get(result['status'], 0) + 1
+        self.waiting_shards[offset] = results
+        while self.next_offset in self.waiting_shards:
+            self._write_results(self.waiting_shards.pop(self.next_offset))
+        
+        self.completed += len(results)
+        self.progress.setValue(self.completed)
+        if self.worker is not None:
+            self.worker.shard_handled()
+    
+    def _write_results(self, results: list[dict]):
+        for result in results:
+            self.results_file.write(",\n" if self.results_count else "\n")
+            self.results_file.write(textwrap.indent(json.dumps(result, indent=2), "  "))
+            self.results_count += 1
+        self.next_offset += len(results)
+    
+    def _on_tests_finished(self):
+        self.worker = None
+        if self.progress.maximum() == 0:
+            self.progress.setMaximum(max(self.completed, 1))
+            self.progress.setValue(self.completed)
+        if self.waiting_shards or self.completed < self.total:
+            self._log(f"Batch test cancelled after {self.completed}/{self.total or '?'} inputs", "WARNING")
+            # Keep the finished shards that follow the missing ones
+            for offset in sorted(self.waiting_shards):
+                self._write_results(self.waiting_shards.pop(offset))
+        if self.results_file is not None:
+            self.results_file.write("\n]" if self.results_count else "]")
+            self.results_file.flush()
         
         # Track results statistics
-        accepted = rejected = errors = 0
-        
-        for i, test_input in enumerate(inputs):
-            self._log(f"Testing input {i+1}/{len(inputs)}: '{test_input}'", "INFO")
-            result = self.simulate_input(test_input)
-            self.results.append(result)
-            
-            # Update statistics
-            if result['status'] == 'Accepted':
-                accepted += 1
-            elif result['status'] == 'Rejected':
-                rejected += 1
-            else:
-                errors += 1
-                self._log(f"Error with input '{test_input}': {result['status']}", "WARNING")
-            
-            # Update table
-            self.results_table.setItem(i, 0, QTableWidgetItem(test_input))
-            self.results_table.setItem(i, 1, QTableWidgetItem(result['final_state']))
-            self.results_table.setItem(i, 2, QTableWidgetItem(result['output']))
-            self.results_table.setItem(i, 3, QTableWidgetItem(result['status']))
-            
-            self.progress.setValue(i + 1)
+        accepted = self.status_counts.get('Accepted', 0)
+        rejected = self.status_counts.get('Rejected', 0)
+        errors = self.completed - accepted - rejected
+        if self.completed > BATCH_TABLE_ROWS:
+            self._log(f"Showing the first {BATCH_TABLE_ROWS} of {self.completed} results, export them to see all", "INFO")
         
         # Log final results
         self._log(f"Batch test completed: {accepted} accepted, {rejected} rejected, {errors} errors", "INFO")
@@ -138,86 +304,42 @@ class BatchTestDialog(QDialog):
         if self.auto_export.isChecked():
             self.export_results()
     
-    def simulate_input(self, test_input: str):
+    def _batch_error(self) -> str:
+        """Return a status that applies to every input, or an empty string"""
+        # Background validation may still be debouncing the latest edits
+        self.parent_window.validator.validate_now()
         validation_issues = self.parent_window.validator.issues
         
         if len(validation_issues) > 0:
             self._log(f"FSM validation failed: {len(validation_issues)} issues", "ERROR")
-            return {"final_state": "N/A", "output": "N/A", "status": "Validation Error"}
-
-        _model = self.parent_window.canvas.fsm_model
-        
-        # Parse input based on delimiter
-        delimiter = self.delimiter_input.text()
-        if delimiter == "":
-            inputs = list(test_input)  # Per character
-        else:
-            inputs = test_input.split(delimiter)
-        
-        self._log(f"Parsed input '{test_input}' into symbols: {inputs}", "INFO")
-        
-        # Validate input alphabet
-        if len(_model.input_alphabet) > 0:
-            for inp in inputs:
-                if inp not in _model.input_alphabet:
-                    self._log(f"Symbol '{inp}' not in input alphabet {list(_model.input_alphabet)}", "WARNING")
-                    return {"final_state": "N/A", "output": "N/A", "status": "Invalid Input"}
-        
-        initial_states = [s for s in _model.states if s.is_initial]
-        if not initial_states:
-            self._log("No initial state defined in FSM", "ERROR")
-            return {"final_state": "N/A", "output": "N/A", "status": "No initial state"}
-        
-        if len(initial_states) > 1:
-            self._log(f"Multiple initial states found: {[s.name for s in initial_states]}", "ERROR")
-            return {"final_state": "N/A", "output": "N/A", "status": "Multiple initial states"}
-        
-        current_state = initial_states[0]
-        outputs = []
-        mode = self.mode_combo.currentText().lower()
-        
-        self._log(f"Starting simulation from state '{current_state.name}' in {mode} mode", "INFO")
-        
-        for i, inp in enumerate(inputs):
-            next_state = None
-            transition_output = ""
-            
-            for transition in current_state.transitions:
-                if transition.source == current_state and inp in transition.input_symbols:
-                    next_state = transition.destination
-                    if mode == "mealy":
-                        transition_output = transition.output_value
-                    self._log(f"Step {i+1}: '{inp}' -> {current_state.name} to {next_state.name}", "INFO")
-                    break
-            
-            if next_state is None:
-                self._log(f"No transition found from '{current_state.name}' on input '{inp}'", "WARNING")
-                return {"final_state": current_state.name, "output": ",".join(outputs), "status": "No transition"}
-            
-            current_state = next_state
-            
-            if mode == "moore":
-                output = current_state.output_value
-                outputs.append(output)
-                self._log(f"Moore output: '{output}'", "INFO")
-            else:
-                outputs.append(transition_output)
-                self._log(f"Mealy output: '{transition_output}'", "INFO")
-        
-        status = "Accepted" if current_state.is_accepting else "Rejected"
-        final_output = ",".join(outputs)
-        self._log(f"Simulation ended in state '{current_state.name}' - {status}", "INFO")
-        self._log(f"Final output: '{final_output}'", "INFO")
-        
-        return {"final_state": current_state.name, "output": final_output, "status": status}
+            return "Validation Error"
         
-
-
+        error = self.engine.check_initial_state()
+        if error:
+            self._log(f"Cannot run batch: {error}", "ERROR")
+        return error
+    
+    def done(self, result):
+        if self.worker is not None:
+            self.worker.shard_finished.disconnect()
+            self.worker.failed.disconnect()
+            self.worker.finished.disconnect()
+            self.worker.requestInterruption()
+            self.worker.wait()
+            self.worker = None
+        self._close_results_file()
+        super().done(result)
+    
+    def _close_results_file(self):
+        if self.results_file is not None:
+            self.results_file.close()
+            self.results_file = None
+    
     def export_results(self):
         """Export results to JSON"""
         from PyQt5.QtWidgets import QFileDialog
         
-        if not self.results:
+        if not self.results_count:
             self._log("No results to export", "WARNING")
             return
         
@@ -226,8 +348,10 @@ class BatchTestDialog(QDialog):
         
         if file_path:
             try:
-                with open(file_path, 'w') as f:
-                    json.dump(self.results, f, indent=2)
+                self.results_file.seek(0)
+                with open(file_path, 'w', encoding="utf-8") as f:
+                    shutil.copyfileobj(self.results_file, f)
+                self.results_file.seek(0, 2)
                 self._log(f"Results exported to: {file_path}", "INFO")
                 QMessageBox.information(self, "Export Complete", f"Results exported to:\n{file_path}")
             except Exception as e:
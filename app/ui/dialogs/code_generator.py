@@ -1,6 +1,6 @@
 from PyQt5.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, QTextEdit, 
-    QPushButton, QComboBox, QApplication, QFrame, QMessageBox
+    QPushButton, QComboBox, QApplication, QFrame, QMessageBox, QCheckBox
 )
 from PyQt5.QtCore import Qt
 from app.core.generator import CodeGenerator
@@ -8,6 +8,13 @@ import subprocess
 import tempfile
 
 
+STYLE_LABELS = {
+    "map": "String Map",
+    "table": "Table",
+    "switch": "Switch / Goto",
+}
+
+
 class CodeGeneratorDialog(QDialog):
     def __init__(self, fsm_model, parent=None):
         super().__init__(parent)
@@ -36,11 +43,27 @@ class CodeGeneratorDialog(QDialog):
         self.lang_combo = QComboBox()
         self.lang_combo.setObjectName("langCombo")
         self.lang_combo.addItems(["Python", "C++", "Java"])
-        self.lang_combo.currentTextChanged.connect(self.generate_code)
+        self.lang_combo.currentTextChanged.connect(self.update_styles)
         
+        style_label = QLabel("Style:")
+        style_label.setObjectName("controlLabel")
+
+        self.style_combo = QComboBox()
+        self.style_combo.setObjectName("langCombo")
+        self.style_combo.setToolTip("Table emits integer enums and a flat next-state array, "
+                                    "Switch / Goto compiles to jump tables (C++)")
+        self.style_combo.currentIndexChanged.connect(self.generate_code)
+
+        self.determinize_check = QCheckBox("Determinize (NFA)")
+        self.determinize_check.setToolTip("Generate code for the subset-construction DFA of a nondeterministic machine")
+        self.determinize_check.toggled.connect(self.generate_code)
+
         lang_layout.addWidget(lang_label)
         lang_layout.addWidget(self.lang_combo)
+        lang_layout.addWidget(style_label)
+        lang_layout.addWidget(self.style_combo)
         lang_layout.addStretch()
+        lang_layout.addWidget(self.determinize_check)
         
         # Code display
         self.code_text = QTextEdit()
@@ -73,11 +96,24 @@ class CodeGeneratorDialog(QDialog):
         layout.addLayout(button_layout)
         
         self.setLayout(layout)
+        self.update_styles()
+
+    def update_styles(self):
+        """List the styles of the selected language, keeping the current one if possible"""
+        current = self.style_combo.currentData()
+        styles = CodeGenerator(self.fsm_model).get_supported_styles(self.lang_combo.currentText())
+        self.style_combo.blockSignals(True)
+        self.style_combo.clear()
+        for style in styles:
+            self.style_combo.addItem(STYLE_LABELS.get(style, style), style)
+        self.style_combo.setCurrentIndex(styles.index(current) if current in styles else 0)
+        self.style_combo.blockSignals(False)
         self.generate_code()
     
     def generate_code(self):
         try:
-            generator = CodeGenerator(self.fsm_model)
+            generator = CodeGenerator(self.fsm_model, self.determinize_check.isChecked(),
+                                      self.style_combo.currentData())
             language = self.lang_combo.currentText().lower()
             code = generator.generate_code(language)
             self.code_text.setPlainText(code)
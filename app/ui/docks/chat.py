@@ -292,11 +292,13 @@ class ChatDock(QDockWidget):
             # Update the FSM model
             if hasattr(self.parent_window, 'canvas'):
                 from app.ui.items.state import FSMModel
-                new_model = FSMModel()
-                new_model.from_json(fsm_data)
-                self.parent_window.model_dock.update_model_info(new_model)
-                self.parent_window.canvas.set_new_model(new_model)
-                self.add_message("assistant", f"{action} FSM: {fsm_data.get('name', 'Unnamed')}")
+                from app.core.commands import ReplaceModelCommand
+                canvas = self.parent_window.canvas
+                message = f"{action} FSM: {fsm_data.get('name', 'Unnamed')}"
+                # One undo step; the generated machine is not saved anywhere yet
+                command = ReplaceModelCommand(canvas, fsm_data, message, FSMModel().path)
+                canvas.command_manager.execute(command)
+                self.add_message("assistant", message)
             else:
                 self.add_message("assistant", "FSM generated but canvas not available")
                 
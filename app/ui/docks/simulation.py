@@ -1,11 +1,12 @@
 from PyQt5.QtWidgets import (
     QDockWidget, QFrame, QVBoxLayout, QGroupBox, QLabel, QComboBox, QStackedWidget,
     QLineEdit, QRadioButton, QButtonGroup, QDoubleSpinBox, QPushButton, QHBoxLayout, QTextEdit,
-    QFileDialog
+    QFileDialog, QCheckBox, QSlider
 )
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QIcon
 from app.core.simulation import Simulation, SimulationStates
+from app.core.input_stream import FileInputStream
 
 from utils.constants import ICONS_PATH
 from typing import TYPE_CHECKING
@@ -44,6 +45,11 @@ class SimulationDock(QDockWidget):
         self.fsm_mode_combobox.setStyleSheet(COMBOBOX_STYLE)
         fsm_layout.addWidget(fsm_mode_label)
         fsm_layout.addWidget(self.fsm_mode_combobox)
+        self.nfa_checkbox = QCheckBox("NFA")
+        self.nfa_checkbox.setToolTip("Follow every matching transition by compiling the machine with subset construction")
+        self.nfa_checkbox.setStyleSheet(RADIO_STYLE)
+        self.nfa_checkbox.toggled.connect(self.set_nondeterministic)
+        fsm_layout.addWidget(self.nfa_checkbox)
 
         # Input Mode
         input_layout = QHBoxLayout()
@@ -244,6 +250,12 @@ class SimulationDock(QDockWidget):
         self.stop_button.setFixedSize(36, 36)
         self.stop_button.clicked.connect(self.stop_simulation)
         
+        self.step_back_button = QPushButton("⏮")
+        self.step_back_button.setToolTip("Step Back")
+        self.step_back_button.setStyleSheet(CONTROL_BUTTON_STYLE)
+        self.step_back_button.setFixedSize(36, 36)
+        self.step_back_button.clicked.connect(self.step_back_simulation)
+
         self.reset_button = QPushButton()
         self.reset_button.setIcon(QIcon(f"{ICONS_PATH}/fast.png"))
         self.reset_button.setToolTip("Step Forward")
@@ -251,12 +263,26 @@ class SimulationDock(QDockWidget):
         self.reset_button.setFixedSize(36, 36)
         self.reset_button.clicked.connect(self.step_simulation)
 
+        self.run_to_end_button = QPushButton("⏭")
+        self.run_to_end_button.setToolTip("Run to Completion")
+        self.run_to_end_button.setStyleSheet(CONTROL_BUTTON_STYLE)
+        self.run_to_end_button.setFixedSize(36, 36)
+        self.run_to_end_button.clicked.connect(self.run_to_end_simulation)
+
         control_group_box_layout.addWidget(self.start_button)
         control_group_box_layout.addWidget(self.pause_button)
         control_group_box_layout.addWidget(self.stop_button)
+        control_group_box_layout.addWidget(self.step_back_button)
         control_group_box_layout.addWidget(self.reset_button)
+        control_group_box_layout.addWidget(self.run_to_end_button)
         control_group_box_layout.addStretch()
 
+        self.turbo_checkbox = QCheckBox("Turbo")
+        self.turbo_checkbox.setToolTip("Run many steps per frame without animation")
+        self.turbo_checkbox.setStyleSheet(RADIO_STYLE)
+        self.turbo_checkbox.toggled.connect(self.simulation.set_turbo)
+        control_group_box_layout.addWidget(self.turbo_checkbox)
+
         control_group_box.setLayout(control_group_box_layout)
 
         # Status - more compact
@@ -295,9 +321,31 @@ class SimulationDock(QDockWidget):
         tick_row.addWidget(self.current_tick)
         tick_row.addStretch()
 
+        # Rate row
+        rate_row = QHBoxLayout()
+        rate_label = QLabel("Rate:")
+        rate_label.setStyleSheet(LABEL_STYLE)
+        self.current_rate = QLabel("-")
+        self.current_rate.setStyleSheet(VALUE_LABEL_STYLE)
+        rate_row.addWidget(rate_label)
+        rate_row.addWidget(self.current_rate)
+        rate_row.addStretch()
+
+        # Timeline row, scrubs through the recorded trace
+        timeline_row = QHBoxLayout()
+        timeline_label = QLabel("Timeline:")
+        timeline_label.setStyleSheet(LABEL_STYLE)
+        self.timeline_slider = QSlider(Qt.Orientation.Horizontal)
+        self.timeline_slider.setRange(0, 0)
+        self.timeline_slider.valueChanged.connect(self.seek_simulation)
+        timeline_row.addWidget(timeline_label)
+        timeline_row.addWidget(self.timeline_slider)
+
         status_layout.addLayout(status_row)
         status_layout.addLayout(state_row)
         status_layout.addLayout(tick_row)
+        status_layout.addLayout(rate_row)
+        status_layout.addLayout(timeline_row)
         status.setLayout(status_layout)
 
         # Console - cleaner design
@@ -336,11 +384,10 @@ class SimulationDock(QDockWidget):
 
         if file_path:
             try:
-                with open(file_path, 'r') as f:
-                    self.file_content = f.read()
                 import os
+                size = os.path.getsize(file_path)
                 filename = os.path.basename(file_path)
-                self.label_input_status.setText(f"✓ {filename}")
+                self.label_input_status.setText(f"✓ {filename} ({size / 1024:.1f} KB)")
                 self.label_input_status.setStyleSheet(SUCCESS_LABEL_STYLE)
                 self.input_button.setText("📁 Change File")
                 self.file_path = file_path
@@ -367,12 +414,12 @@ class SimulationDock(QDockWidget):
             
             self.simulation.start(input_string, simulation_mode, delimiter, speed, is_keyboard_inputs)
         elif input_mode == "File":
-            if hasattr(self, 'file_content'):
+            if hasattr(self, 'file_path'):
                 speed = self.speed_input_file.value()
-                delimiter = self.delimiter_input_file.text()
-                is_keyboard_inputs = False
+                per_line = self.delimiter_group_file.checkedButton().text() == "Per Line"
+                source = FileInputStream(self.file_path, self.delimiter_input_file.text(), per_line)
                 
-                self.simulation.start(self.file_content, simulation_mode, delimiter, speed, is_keyboard_inputs)
+                self.simulation.start_stream(source, simulation_mode, speed)
         elif input_mode == "Keyboard":
             input_string = ""
             speed = 1.0
@@ -395,12 +442,34 @@ class SimulationDock(QDockWidget):
         self.simulation.step()
         self.update_status()
 
+    def step_back_simulation(self):
+        self.simulation.step_back()
+        self.update_status()
+
+    def seek_simulation(self, tick: int):
+        if tick != self.simulation.ticks:
+            self.simulation.seek(tick)
+
+    def run_to_end_simulation(self):
+        self.simulation.run_to_completion()
+        self.update_status()
+
     def update_status(self):
         self.current_status.setText(self.simulation.state.name)
         self.current_tick.setText(str(self.simulation.ticks))
+
+        self.timeline_slider.blockSignals(True)
+        self.timeline_slider.setRange(self.simulation.trace.start, self.simulation.trace.end)
+        self.timeline_slider.setValue(self.simulation.ticks)
+        self.timeline_slider.blockSignals(False)
+        
+        if self.simulation.turbo or self.simulation.fast_forward:
+            self.current_rate.setText(f"{self.simulation.steps_per_second:,.0f} steps/s")
+        else:
+            self.current_rate.setText("-")
         
         if self.simulation.current_state:
-            self.current_state_name.setText(self.simulation.current_state.name)
+            self.current_state_name.setText(self.simulation.current_state_name)
         else:
             self.current_state_name.setText("None")
             
@@ -420,11 +489,15 @@ class SimulationDock(QDockWidget):
         # Switch to simulation dock
         self.parent_window.simulation_dock.raise_()
     
+    def set_nondeterministic(self, enabled: bool):
+        self.simulation.nondeterministic = enabled
+
     def _update_ui_state(self):
         is_running = self.simulation.state in [SimulationStates.RUNNING, SimulationStates.PAUSED]
         
         # Disable input controls during simulation
         self.fsm_mode_combobox.setEnabled(not is_running)
+        self.nfa_checkbox.setEnabled(not is_running)
         self.input_mode_combobox.setEnabled(not is_running)
         self.string_input_edit.setEnabled(not is_running)
         self.speed_input.setEnabled(not is_running)
@@ -435,6 +508,9 @@ class SimulationDock(QDockWidget):
         self.start_button.setEnabled(self.simulation.state in [SimulationStates.IDLE, SimulationStates.PAUSED, SimulationStates.COMPLETED, SimulationStates.ERROR])
         self.pause_button.setEnabled(self.simulation.state == SimulationStates.RUNNING)
         self.stop_button.setEnabled(is_running)
+        self.step_back_button.setEnabled(self.simulation.state != SimulationStates.IDLE and self.simulation.ticks > self.simulation.trace.start)
+        self.timeline_slider.setEnabled(self.simulation.state != SimulationStates.IDLE and len(self.simulation.trace) > 0)
+        self.run_to_end_button.setEnabled(is_running and not self.simulation.fast_forward)
     
     def log_to_simulation(self, message: str, level: str = "INFO"):
         """Log a message to the simulation console"""
@@ -458,7 +534,7 @@ class SimulationDock(QDockWidget):
             result = {
                 'step': len(self.last_results),
                 'input': getattr(self.simulation, 'current_input', ''),
-                'state': self.simulation.current_state.name if self.simulation.current_state else '',
+                'state': self.simulation.current_state_name,
                 'output': message.split("Output: ")[1] if "Output: " in message else ''
             }
             self.last_results.append(result)
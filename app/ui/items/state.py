@@ -1,53 +1,70 @@
 from PyQt5.QtWidgets import (
-    QGraphicsItem, QGraphicsPolygonItem, QGraphicsObject)
+    QGraphicsItem, QGraphicsObject)
 from PyQt5.QtCore import QRectF, Qt, QPointF, QLineF, QPropertyAnimation, QEasingCurve
 from PyQt5.QtGui import QPen, QBrush, QPolygonF, QColor
 from app.ui.dialogs.state_editor import StateEditorDialog
-from app.ui.items.transition import TransitionItem
+from app.ui.items.transition import TransitionItem, DETAIL_LOD
+from app.core.model import MachineData, ModelDelta, StateData
 
+from contextlib import contextmanager
+import re
 import uuid
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, KeysView
 
 if TYPE_CHECKING:
     from app.ui.items.transition import TransitionItem
 
 
 class StateItem(QGraphicsObject):
-    def __init__(self, name, is_initial=False, is_accepting=False, id=None, parent=None):
+    """Graphics view of a StateData.
+
+    Machine properties (id, name, flags, output, actions, colours and
+    position) are read from and written to ``state_data``, so the model
+    data stays complete without the scene.
+    """
+
+    def __init__(self, name="", is_initial=False, is_accepting=False, id=None, parent=None,
+                 state_data: StateData = None):
         super().__init__()
         self.transitions: list[TransitionItem] = []
+        self.model: "FSMModel | None" = None     # Set while the state belongs to a model
 
         # State properties
-        if id is not None:
-            self.id = id
-        else:
-            self.id = uuid.uuid4().hex
-        self.name = name
-        self.is_initial = is_initial
-        self.is_accepting = is_accepting
+        if state_data is None:
+            state_data = StateData(id if id is not None else uuid.uuid4().hex, name, is_initial, is_accepting)
+        self.state_data = state_data
         self.comment = ""
         self.is_deleted = False
 
-        # Simulation properties
-        self.output_value = ""      # For Moore machines
-        self.entry_actions: list[str] = []     # Actions on state entry
-        self.exit_actions: list[str] = []      # Actions on state exit
-
         # Visual properties
         self.width = 100
         self.height = 60
 
-        self.bg_color = QColor("#abdbe3")
-        self.border_color = QColor("#e28743")
-        self.text_color = QColor("#000000")
+        self._bg_color = QColor(state_data.bg_color)
+        self._border_color = QColor(state_data.border_color)
+        self._text_color = QColor(state_data.text_color)
         self.font = 'Arial'
+        self._bounds = QRectF()
         self.border_width = 2
 
         self.outerPen = QPen()
         self.innerPen = QPen()
-        self.brush = QBrush()
+        self.textPen = QPen()
+        self.brush = QBrush(Qt.BrushStyle.SolidPattern)
+
+        # Initial state arrow, fixed relative to the state
+        end_point = QPointF(-self.width / 2 + 20, 0)
+        head_size = 12
+        self.arrow_line = QLineF(QPointF(-self.width / 2, 0), end_point)
+        self.arrow_head = QPolygonF([
+            end_point,
+            QPointF(end_point.x() - head_size, end_point.y() - head_size / 1.5),
+            QPointF(end_point.x() - head_size, end_point.y() + head_size / 1.5)
+        ])
 
         self.setZValue(1)
+        # Panning repaints from the cached pixmap instead of calling paint()
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
 
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsMovable, True)
         self.setFlag(
@@ -55,70 +72,162 @@ class StateItem(QGraphicsObject):
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable, True)
 
         self.setAcceptHoverEvents(True)
+        self.setPos(state_data.x, state_data.y)
+
+    @property
+    def id(self) -> str:
+        return self.state_data.id
+
+    @property
+    def name(self) -> str:
+        return self.state_data.name
+
+    @name.setter
+    def name(self, name: str):
+        old_name = self.state_data.name
+        self.state_data.name = name
+        if self.model is not None and old_name != name:
+            self.model._rename_state(self, old_name)
+
+    @property
+    def is_initial(self) -> bool:
+        return self.state_data.is_initial
+
+    @is_initial.setter
+    def is_initial(self, is_initial: bool):
+        old_value = self.state_data.is_initial
+        self.state_data.is_initial = is_initial
+        if self.model is not None and old_value != is_initial:
+            self.model._handle_item_change("state_initial", self, old_value)
+
+    @property
+    def is_accepting(self) -> bool:
+        return self.state_data.is_accepting
+
+    @is_accepting.setter
+    def is_accepting(self, is_accepting: bool):
+        old_value = self.state_data.is_accepting
+        self.state_data.is_accepting = is_accepting
+        if self.model is not None and old_value != is_accepting:
+            self.model._handle_item_change("state_accepting", self, old_value)
+
+    @property
+    def output_value(self) -> str:
+        """Output for Moore machines"""
+        return self.state_data.output_value
+
+    @output_value.setter
+    def output_value(self, output_value: str):
+        self.state_data.output_value = output_value
+
+    @property
+    def entry_actions(self) -> list[str]:
+        return self.state_data.entry_actions
+
+    @entry_actions.setter
+    def entry_actions(self, actions: list[str]):
+        self.state_data.entry_actions = actions
+
+    @property
+    def exit_actions(self) -> list[str]:
+        return self.state_data.exit_actions
+
+    @exit_actions.setter
+    def exit_actions(self, actions: list[str]):
+        self.state_data.exit_actions = actions
+
+    @property
+    def bg_color(self) -> QColor:
+        return self._bg_color
+
+    @bg_color.setter
+    def bg_color(self, color: QColor):
+        self._bg_color = color
+        self.state_data.bg_color = color.name()
+        self.update()
 
-    def boundingRect(self):
+    @property
+    def border_color(self) -> QColor:
+        return self._border_color
+
+    @border_color.setter
+    def border_color(self, color: QColor):
+        self._border_color = color
+        self.state_data.border_color = color.name()
+        self.update()
+
+    @property
+    def text_color(self) -> QColor:
+        return self._text_color
+
+    @text_color.setter
+    def text_color(self, color: QColor):
+        self._text_color = color
+        self.state_data.text_color = color.name()
+        self.update()
+
+    @property
+    def border_width(self) -> float:
+        return self._border_width
+
+    @border_width.setter
+    def border_width(self, border_width: float):
+        self.prepareGeometryChange()
+        self._border_width = border_width
         r = QRectF(-self.width/2, -self.height/2, self.width, self.height)
+        self._bounds = r.adjusted(-border_width, -border_width, border_width, border_width)
 
-        return r.adjusted(-self.border_width, -self.border_width,
-                          self.border_width, self.border_width)
+    def boundingRect(self):
+        return self._bounds
 
     def paint(self, painter, option, widget=None):
         rect = self.boundingRect()
 
         self.brush.setColor(self.bg_color)
-        self.brush.setStyle(Qt.BrushStyle.SolidPattern)
         self.outerPen.setColor(self.border_color)
-        self.innerPen.setColor(self.border_color)
-
         self.outerPen.setWidthF(self.border_width)
 
         painter.setPen(self.outerPen)
         painter.setBrush(self.brush)
+
+        if option.levelOfDetailFromTransform(painter.worldTransform()) < DETAIL_LOD:
+            # Too small to read: a plain box without text or markers
+            painter.drawRect(rect)
+            return
+
         painter.drawRoundedRect(rect, 10, 10)
 
         if self.is_accepting:
             inner = rect.adjusted(5, 5, -5, -5)
+            self.innerPen.setColor(self.border_color)
             painter.setPen(self.innerPen)
             painter.drawRoundedRect(inner, 5, 5)
 
         if self.is_initial:
-            start_point = rect.center() - QPointF(self.width / 2, 0)
-            end_point = rect.center() - QPointF(self.width/2 - 20, 0)
-
-            self.arrow_line = QLineF(start_point, end_point)
-
             painter.setPen(self.outerPen)
             painter.drawLine(self.arrow_line)
 
-            head_size = 12
-            arrow_head = QPolygonF([
-                end_point,
-                QPointF(end_point.x() - head_size,
-                        end_point.y() - head_size / 1.5),
-                QPointF(end_point.x() - head_size,
-                        end_point.y() + head_size / 1.5)
-            ])
-            self.arrow_head = QGraphicsPolygonItem(arrow_head)
-
-            painter.setPen(self.outerPen)
             painter.setBrush(self.border_color)
-            painter.drawPolygon(arrow_head)
-        else:
-            pass
+            painter.drawPolygon(self.arrow_head)
 
-        painter.setPen(QPen(self.text_color))
+        self.textPen.setColor(self.text_color)
+        painter.setPen(self.textPen)
         painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, self.name)
 
     def itemChange(self, change, value):
         if change == QGraphicsItem.GraphicsItemChange.ItemPositionChange:
+            diff = value - self.pos()
             for transition in self.transitions:
-                diff = value - self.pos()
-
                 if transition.source == transition.destination:
-                    transition.control_points_item\
-                        .setPos(transition.control_point + diff)
-                    continue
-                transition.updatePath()
+                    # Moving the handle schedules the loop's path
+                    handle = transition.control_points_item
+                    handle.setPos(handle.pos() + diff)
+        elif change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged:
+            self.state_data.x = value.x()
+            self.state_data.y = value.y()
+            for transition in self.transitions:
+                if transition.source != transition.destination:
+                    transition.schedule_update()
         return super().itemChange(change, value)
 
     def mouseDoubleClickEvent(self, event):
@@ -198,23 +307,48 @@ class FSMModel:
         self.name = ""
         self.path = "./models"
         self.is_saved = True
-        self.states: list[StateItem] = []
-        self.transitions: list[TransitionItem] = []
         self.comments: list = []
 
+        # Insertion-ordered item sets plus lookup indexes, kept in sync by add/remove
+        self._states: dict[StateItem, None] = {}
+        self._transitions: dict[TransitionItem, None] = {}
+        self._states_by_id: dict[str, StateItem] = {}
+        self._transitions_by_id: dict[str, TransitionItem] = {}
+        self._states_by_name: dict[str, list[StateItem]] = {}
+        self._name_hint = 0     # Every "q<i>" with i below the hint is taken
+        self.transitions_version = 0   # Bumped when a transition is added, removed, re-laid out or recoloured
+
         # Simulation properties
         self.input_alphabet = set()      # Valid input symbols
         self.output_alphabet = set()     # Valid output symbols
 
         # Handles
         self._on_change_handles = []
+        self._on_item_change_handles = []
+
+        # Notifications held back by batch()
+        self._batch_depth = 0
+        self._batch_delta: ModelDelta | None = None
+        self._batch_changed = False
+
+    @property
+    def states(self) -> KeysView[StateItem]:
+        return self._states.keys()
+
+    @property
+    def transitions(self) -> KeysView[TransitionItem]:
+        return self._transitions.keys()
 
     def _handle_change(self):
+        if self._batch_depth:
+            self._batch_changed = True
+            return
         for handle in self._on_change_handles:
             handle(self)
 
     def on_change(self, handle):
-        self._on_change_handles.append(handle)
+        if handle not in self._on_change_handles:
+            self._on_change_handles.append(handle)
 
     def on_change_remove(self, handle):
         try:
@@ -222,13 +356,72 @@ class FSMModel:
         except ValueError:
             pass
 
+    def _handle_item_change(self, event: str, item=None, old_value=None):
+        if self._batch_depth:
+            self._batch_delta.record(event, item, old_value)
+            return
+        for handle in self._on_item_change_handles:
+            handle(event, item, old_value)
+
+    def on_item_change(self, handle):
+        """Subscribe to per-item events as handle(event, item, old_value).
+
+        Events are "state_added", "state_removed", "state_renamed",
+        "state_initial", "state_accepting", "transition_added",
+        "transition_removed", "cleared" and "batch", where ``old_value``
+        is the previous name or flag for renames and flag changes. A
+        "batch" event replaces the events of a batch(); its ``item`` is the
+        ModelDelta counting them, which also lists the add and remove
+        events when the batch had nothing else.
+        """
+        self._on_item_change_handles.append(handle)
+
+    def on_item_change_remove(self, handle):
+        try:
+            self._on_item_change_handles.remove(handle)
+        except ValueError:
+            pass
+
+    @contextmanager
+    def batch(self):
+        """Group mutations so observers are notified once, when the outermost batch ends.
+
+        Inside the batch, change and item handlers are not called. At the
+        end, item handlers get one "batch" event with the ModelDelta of the
+        whole batch, and change handlers are called once.
+        """
+        if self._batch_depth == 0:
+            self._batch_delta = ModelDelta()
+            self._batch_changed = False
+        self._batch_depth += 1
+        try:
+            yield self._batch_delta
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                delta, self._batch_delta = self._batch_delta, None
+                if delta:
+                    self._handle_item_change("batch", delta)
+                if self._batch_changed:
+                    self._handle_change()
+
     def add_state(self, state: StateItem):
-        self.states.append(state)
+        if state not in self._states:
+            self._states[state] = None
+            self._states_by_id.setdefault(state.id, state)
+            self._states_by_name.setdefault(state.name, []).append(state)
+            state.model = self
+            self._handle_item_change("state_added", state)
         self.is_saved = False
         self._handle_change()
 
     def add_transition(self, transition: "TransitionItem"):
-        self.transitions.append(transition)
+        if transition not in self._transitions:
+            self._transitions[transition] = None
+            self.transitions_version += 1
+            self._transitions_by_id.setdefault(transition.id, transition)
+            transition.model = self
+            self._handle_item_change("transition_added", transition)
         self.is_saved = False
         self._handle_change()
 
@@ -246,20 +439,44 @@ class FSMModel:
             pass
 
     def remove_state(self, state: StateItem):
-        try:
-            self.states.remove(state)
-            self.is_saved = False
-            self._handle_change()
-        except ValueError:
-            pass
+        if state not in self._states:
+            return
+        del self._states[state]
+        if self._states_by_id.get(state.id) is state:
+            del self._states_by_id[state.id]
+        self._unindex_name(state, state.name)
+        state.model = None
+        self._handle_item_change("state_removed", state)
+        self.is_saved = False
+        self._handle_change()
 
     def remove_transition(self, transition: "TransitionItem"):
-        try:
-            self.transitions.remove(transition)
-            self.is_saved = False
-            self._handle_change()
-        except ValueError:
-            pass
+        if transition not in self._transitions:
+            return
+        del self._transitions[transition]
+        self.transitions_version += 1
+        if self._transitions_by_id.get(transition.id) is transition:
+            del self._transitions_by_id[transition.id]
+        transition.model = None
+        self._handle_item_change("transition_removed", transition)
+        self.is_saved = False
+        self._handle_change()
+
+    def _rename_state(self, state: StateItem, old_name: str):
+        self._unindex_name(state, old_name)
+        self._states_by_name.setdefault(state.name, []).append(state)
+        self._handle_item_change("state_renamed", state, old_name)
+
+    def _unindex_name(self, state: StateItem, name: str):
+        states = self._states_by_name.get(name)
+        if states is None or state not in states:
+            return
+        states.remove(state)
+        if not states:
+            del self._states_by_name[name]
+            match = re.fullmatch(r"q(0|[1-9][0-9]*)", name)
+            if match:
+                self._name_hint = min(self._name_hint, int(match.group(1)))
 
     def set_name(self, name: str):
         self.name = name
@@ -274,147 +491,95 @@ class FSMModel:
         self._handle_change()
 
     def get_new_state_name(self):
-        i = 0
-        while True:
-            name = f"q{i}"
-            if not any(state.name == name for state in self.states):
-                return name
-            i += 1
-
-    def to_json(self):
-        model_json = {
-            "id": self.id,
-            "name": self.name,
-            "path": self.path,
-            "input_alphabet": list(self.input_alphabet),
-            "output_alphabet": list(self.output_alphabet)
-        }
-        states_json = []
-        transitions_json = []
-
+        while f"q{self._name_hint}" in self._states_by_name:
+            self._name_hint += 1
+        return f"q{self._name_hint}"
+
+    def to_data(self) -> MachineData:
+        """Qt-free snapshot of the machine sharing this model's state and transition data.
+
+        Later edits through the items show up in the returned data, so
+        serialize it with to_json before handing it to another thread.
+        """
+        data = MachineData()
+        data.id = self.id
+        data.name = self.name
+        data.path = self.path
+        data.input_alphabet = set(self.input_alphabet)
+        data.output_alphabet = set(self.output_alphabet)
         for state in self.states:
-            state_json = {
-                "id": state.id,
-                "name": state.name,
-                "is_initial": state.is_initial,
-                "is_accepting": state.is_accepting,
-                "output_value": state.output_value,
-                "entry_actions": state.entry_actions,
-                "exit_actions": state.exit_actions,
-                "properties": {
-                    "x": state.pos().x(),
-                    "y": state.pos().y(),
-                    "bg_color": state.bg_color.name(),
-                    "border_color": state.border_color.name(),
-                    "text_color": state.text_color.name()
-                }
-            }
-
-            states_json.append(state_json)
-
-        for transition in self.transitions:
-            transition_json = {
-                "id": transition.id,
-                "source": transition.source.id,
-                "destination": transition.destination.id,
-                "label": transition.label,
-                "input_symbols": transition.input_symbols,
-                "guard_condition": transition.guard_condition,
-                "output_value": transition.output_value,
-                "actions": transition.actions,
-                "properties": {
-                    "control_point": {
-                        "x": transition.control_point.x(),
-                        "y": transition.control_point.y(),
-                        "color": transition.control_point_color.name()
-                    },
-                    "color": transition.color.name(),
-                    "width": transition.width
-                }
-            }
-
-            transitions_json.append(transition_json)
-
-
-        # Add comments to JSON
-        comments_json = []
-        for comment in self.comments:
-            comment_json = {
-                "id": comment.id,
-                "text": comment.text,
-                "properties": {
-                    "x": comment.pos().x(),
-                    "y": comment.pos().y(),
-                    "bg_color": comment.bg_color.name(),
-                    "text_color": comment.text_color.name(),
-                    "border_color": comment.border_color.name()
-                }
+            data.add_state(state.state_data)
+        data.transitions = [transition.transition_data for transition in self.transitions]
+        data.comments = [{
+            "id": comment.id,
+            "text": comment.text,
+            "properties": {
+                "x": comment.pos().x(),
+                "y": comment.pos().y(),
+                "bg_color": comment.bg_color.name(),
+                "text_color": comment.text_color.name(),
+                "border_color": comment.border_color.name()
             }
-            comments_json.append(comment_json)
+        } for comment in self.comments]
+        return data
 
-        model_json["states"] = states_json
-        model_json["transitions"] = transitions_json
-        model_json["comments"] = comments_json
-
-        return model_json
+    def to_json(self):
+        return self.to_data().to_json()
 
     def clear(self):
-        for state in self.states:
-            state.scene().removeItem(state)
-
-        for transition in self.transitions:
-            transition.control_points_item.scene().removeItem(transition.control_points_item)
-            transition.scene().removeItem(transition)
+        with self.batch():
+            # Items of a model that is still loading may not be in the scene yet
+            for state in self.states:
+                if state.scene() is not None:
+                    state.scene().removeItem(state)
 
-        self.states = []
-        self.transitions = []
-        self.comments = []
+            for transition in self.transitions:
+                if transition.control_points_item.scene() is not None:
+                    transition.control_points_item.scene().removeItem(transition.control_points_item)
+                if transition.scene() is not None:
+                    transition.scene().removeItem(transition)
 
-        self._handle_change()
+            for state in self.states:
+                state.model = None
+            for transition in self.transitions:
+                transition.model = None
+
+            self._states = {}
+            self._transitions = {}
+            self._states_by_id = {}
+            self._transitions_by_id = {}
+            self._states_by_name = {}
+            self._name_hint = 0
+            self.transitions_version += 1
+            self.comments = []
+
+            self._handle_item_change("cleared")
+            self._handle_change()
 
     def get_state_by_id(self, state_id):
-        for state in self.states:
-            if state.id == state_id:
-                return state
+        return self._states_by_id.get(state_id)
+
+    def get_transition_by_id(self, transition_id):
+        return self._transitions_by_id.get(transition_id)
 
     def from_json(self, model_json):
-        self.id = model_json.get("id", uuid.uuid4().hex)
-        self.name = model_json.get("name", "")
-        self.is_saved = True
-        self.input_alphabet = set(model_json.get("input_alphabet", []))
-        self.output_alphabet = set(model_json.get("output_alphabet", []))
-
-        for state_json in model_json.get("states", []):
-            state = StateItem(state_json.get("name", ""), state_json.get("is_initial", False),
-                              state_json.get("is_accepting", False), id=state_json.get("id"))
-            props = state_json.get("properties", {})
-            state.setPos(props.get("x", 0), props.get("y", 0))
-            state.bg_color = QColor(props.get("bg_color", "#abdbe3"))
-            state.border_color = QColor(props.get("border_color", "#e28743"))
-            state.text_color = QColor(props.get("text_color", "#000000"))
-            state.output_value = state_json.get("output_value", "")
-            state.entry_actions = state_json.get("entry_actions", [])
-            state.exit_actions = state_json.get("exit_actions", [])
-            self.add_state(state)
-
-        for transition_json in model_json.get("transitions", []):
-            source = self.get_state_by_id(transition_json.get("source"))
-            destination = self.get_state_by_id(
-                transition_json.get("destination"))
-
-            transition = TransitionItem(
-                source, destination, transition_json.get("label", ""))
-            props = transition_json.get("properties", {})
-            transition.color = QColor(props.get("color", "#1e81b0"))
-            transition.width = props.get("width", 2)
-            cp_props = props.get("control_point", {})
-            transition.control_point_color = QColor(
-                cp_props.get("color", "#1e81b0"))
-            transition.control_point = QPointF(
-                cp_props.get("x", 0), cp_props.get("y", 0))
-            transition.input_symbols = transition_json.get("input_symbols", [])
-            transition.guard_condition = transition_json.get(
-                "guard_condition", "")
-            transition.output_value = transition_json.get("output_value", "")
-            transition.actions = transition_json.get("actions", [])
-            self.add_transition(transition)
+        data = MachineData()
+        data.from_json(model_json)
+
+        with self.batch():
+            self.id = data.id
+            self.name = data.name
+            self.is_saved = True
+            self.input_alphabet = data.input_alphabet
+            self.output_alphabet = data.output_alphabet
+
+            states = {}
+            for state_data in data.states:
+                state = StateItem(state_data=state_data)
+                states[state_data] = state
+                self.add_state(state)
+
+            for transition_data in data.transitions:
+                transition = TransitionItem(states[transition_data.source], states[transition_data.destination],
+                                            transition_data=transition_data)
+                self.add_transition(transition)
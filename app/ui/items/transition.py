@@ -1,8 +1,10 @@
 from PyQt5.QtWidgets import (QGraphicsItem, QGraphicsItemGroup,  QGraphicsTextItem, QGraphicsPolygonItem,
                              QGraphicsRectItem, QGraphicsObject )
-from PyQt5.QtCore import QRectF, Qt, QPointF, QPropertyAnimation, QEasingCurve, pyqtProperty
+from PyQt5.QtCore import (QRectF, Qt, QPointF, QPropertyAnimation, QEasingCurve, pyqtProperty, QObject,
+                          QMetaObject, pyqtSlot)
 from PyQt5.QtGui import QPen, QPainterPath, QPolygonF, QColor, QFont
 from app.ui.dialogs.transition_editor import TransitionEditorDialog
+from app.core.model import TransitionData
 
 import math
 import uuid
@@ -12,33 +14,105 @@ if TYPE_CHECKING:
     from app.ui.items.state import StateItem
 
 
+# Below this level of detail (device pixels per scene unit) items skip
+# text, arrowheads and styled pens, which cannot be made out anyway
+DETAIL_LOD = 0.5
+
+
+class PathScheduler(QObject):
+    """Coalesces transition path updates into one pass per frame.
+
+    Moving states marks their transitions dirty; the paths are rebuilt
+    once in a queued call, which runs before the scene processes the
+    repaint the move requested. A transition whose source and destination
+    both moved, or that was marked on several mouse events of the same
+    frame, is laid out once.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._dirty: dict[TransitionItem, None] = {}      # Insertion ordered set
+        self._flushing: dict[TransitionItem, None] = {}
+        self.last_frame_count = 0   # Paths rebuilt by the last flush
+        self.max_frame_count = 0
+        self.total_count = 0
+        self.frames = 0
+
+    def schedule(self, transition: "TransitionItem"):
+        if transition in self._flushing:
+            return
+        if not self._dirty:
+            QMetaObject.invokeMethod(self, "flush", Qt.ConnectionType.QueuedConnection)
+        self._dirty[transition] = None
+
+    @pyqtSlot()
+    def flush(self):
+        """Rebuild every dirty path now"""
+        if not self._dirty:
+            return
+        self._flushing, self._dirty = self._dirty, {}
+        try:
+            for transition in self._flushing:
+                transition.updatePath()
+        finally:
+            count = len(self._flushing)
+            self._flushing = {}
+        self.last_frame_count = count
+        self.max_frame_count = max(self.max_frame_count, count)
+        self.total_count += count
+        self.frames += 1
+
+    def reset_stats(self):
+        self.last_frame_count = self.max_frame_count = self.total_count = self.frames = 0
+
+
+_path_scheduler: PathScheduler | None = None
+
+
+def get_path_scheduler() -> PathScheduler:
+    """Process-wide scheduler shared by all transitions"""
+    global _path_scheduler
+    if _path_scheduler is None:
+        _path_scheduler = PathScheduler()
+    return _path_scheduler
+
+
 class TransitionItem(QGraphicsObject):
-    def __init__(self, source: "StateItem", destination: "StateItem", label="", parent=None):
-        super().__init__(parent)
-        self.id = uuid.uuid4().hex
+    """Graphics view of a TransitionData between two state items.
+
+    The control point is only known once it was loaded or laid out by
+    updatePath; until then ``control_point`` is unset.
+    """
 
+    def __init__(self, source: "StateItem", destination: "StateItem", label="", parent=None,
+                 transition_data: TransitionData = None):
+        super().__init__(parent)
         self.source: "StateItem" = source
         self.destination: "StateItem" = destination
-        self.label = label
         self.is_deleted = False
-        
-        # Simulation properties
-        self.input_symbols = []     # List of input symbols that trigger this transition
-        self.guard_condition = ""   # Boolean condition for transition
-        self.output_value = ""      # For Mealy machines
-        self.actions = []           # Actions to execute during transition
+        self.model = None           # Set while the transition belongs to a model
+
+        if transition_data is None:
+            transition_data = TransitionData(uuid.uuid4().hex, source.state_data, destination.state_data, label)
+        else:
+            self._control_point = QPointF(transition_data.control_x, transition_data.control_y)
+        self.transition_data = transition_data
 
         # Visual properties
-        self._width = 2
-        self.color = QColor("#1e81b0")
-        self.control_point_color = QColor("#1e81b0")
+        self._color = QColor(transition_data.color)
+        self._control_point_color = QColor(transition_data.control_point_color)
+        self._pen = QPen()
+        self._path: QPainterPath | None = None
+        self._bounds = QRectF()
+        self._geometry_key: tuple | None = None   # Endpoints and control point of _path
+        self._label_anchor = QPointF()
 
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable, False)
 
-        self.control_points_item = ControlPointItem(self)
-        self.control_points_item.setZValue(1)
-
-        self.label_item = TransitionLabel(self)
+        # Child items are built on first use, so loading a model does not
+        # pay for handles and labels that are not shown yet
+        self._control_points_item: "ControlPointItem | None" = None
+        self._label_item: "TransitionLabel | None" = None
 
         if self.scene() is not None:
             self.scene().addItem(self.label_item)
@@ -49,16 +123,37 @@ class TransitionItem(QGraphicsObject):
         self.source.transitions.append(self)
         self.destination.transitions.append(self)
 
+    @property
+    def control_points_item(self) -> "ControlPointItem":
+        if self._control_points_item is None:
+            self._control_points_item = ControlPointItem(self)
+            self._control_points_item.setZValue(1)
+        return self._control_points_item
+
+    @property
+    def label_item(self) -> "TransitionLabel":
+        if self._label_item is None:
+            self._label_item = TransitionLabel(self)
+        return self._label_item
+
+    def path(self) -> QPainterPath | None:
+        """Drawn curve in scene coordinates, None until laid out"""
+        return self._path
+
     def boundingRect(self):
-        if hasattr(self, '_path'):
-            return self._path.boundingRect()
-        return QRectF()
+        return self._bounds
 
     def paint(self, painter, option, widget=None):
-        if hasattr(self, '_path'):
-            painter.setPen(QPen(self.color, self.width))
-            painter.setBrush(Qt.BrushStyle.NoBrush)
-            painter.drawPath(self._path)
+        if self._path is None:
+            return
+        self._pen.setColor(self.color)
+        if option.levelOfDetailFromTransform(painter.worldTransform()) < DETAIL_LOD:
+            self._pen.setWidth(0)   # Cosmetic hairline
+        else:
+            self._pen.setWidthF(self.width)
+        painter.setPen(self._pen)
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        painter.drawPath(self._path)
 
     def reinit(self):
         if self.scene() is not None:
@@ -68,67 +163,68 @@ class TransitionItem(QGraphicsObject):
             self.label_item.updateUI()
             self.updatePath()
                 
+    def schedule_update(self):
+        """Rebuild the path with the next frame instead of right away"""
+        get_path_scheduler().schedule(self)
+
     def updatePath(self):
         if self.source == self.destination:
-            p2 = self.source.sceneBoundingRect().center()
-
-            if not hasattr(self, "control_point"):
-                mx = p2.x() - 100
-                my = p2.y()
-                self.control_point = QPointF(mx, my)
-            else:
-                if self.control_points_item.pos().x() == 0 and self.control_points_item.pos().y() == 0:
-                    return
-                self.control_point = self.control_points_item.pos()
-
-            circle_rect = self.circle_from_two_points(p2, self.control_point)
-            self.control_points_item.setPos(self.control_point)
-
-            painter = QPainterPath()
-            painter.addEllipse(circle_rect)
-            self._path = painter
-
-            _label_pos = self.get_normal_point_on_circle_qt(
-                painter.boundingRect().center(), self.control_point)
-            self.label_item.setPos(_label_pos)
-
-            self.control_points_item.updateUI()
-            self.prepareGeometryChange()
+            p1 = p2 = self.source.sceneBoundingRect().center()
         else:
             p1 = self.source.mapToScene(self.source.boundingRect().center())
             p2 = self.destination.mapToScene(
                 self.destination.boundingRect().center())
 
-            if not hasattr(self, "control_point"):
-                mx = (p1.x() + p2.x()) / 2
-                my = (p1.y() + p2.y()) / 2
-                self.control_point = QPointF(mx, my)
+        if not hasattr(self, "control_point"):
+            if self.source == self.destination:
+                self.control_point = QPointF(p2.x() - 100, p2.y())
             else:
-                if self.control_points_item.pos().x() == 0 and self.control_points_item.pos().y() == 0:
-                    return
-                self.control_point = self.control_points_item.pos()
+                self.control_point = QPointF((p1.x() + p2.x()) / 2, (p1.y() + p2.y()) / 2)
+        else:
+            if self.control_points_item.pos().x() == 0 and self.control_points_item.pos().y() == 0:
+                return
+            self.control_point = self.control_points_item.pos()
 
+        # The curve, label anchor and handle rotation only depend on the
+        # endpoints and the control point, so they are rebuilt when one moved
+        key = (p1.x(), p1.y(), p2.x(), p2.y(), self.control_point.x(), self.control_point.y())
+        if key != self._geometry_key:
+            self._geometry_key = key
+            self._build_geometry(p1, p2)
+
+        self.label_item.updateUI()
+        if self.source == self.destination:
+            self.label_item.setPos(self._label_anchor)
+        else:
+            self.label_item.setPos(self._label_anchor - self.label_item.boundingRect().center())
+        self.control_points_item.setBrush(self.control_point_color)
+
+    def _build_geometry(self, p1: QPointF, p2: QPointF):
+        if self.source == self.destination:
+            circle_rect = self.circle_from_two_points(p2, self.control_point)
+
+            path = QPainterPath()
+            path.addEllipse(circle_rect)
+
+            self._label_anchor = self.get_normal_point_on_circle_qt(
+                path.boundingRect().center(), self.control_point)
+        else:
             path = QPainterPath(p1)
             path.quadTo(self.control_point, p2)
-            self._path = path
-
-            mid_point = path.pointAtPercent(0.5)
-            mid_point -= self.label_item.boundingRect().center()
 
-            _label_pos = self.get_perpendicular_point(
+            self._label_anchor = self.get_perpendicular_point(
                 path.pointAtPercent(0.0),
                 path.pointAtPercent(0.5)
             )
 
-            mid_label = _label_pos - self.label_item.boundingRect().center()
-            self.label_item.setPos(mid_label)
-
-            self.control_points_item.setPos(self.control_point)
-            self.control_points_item.updateUI()
-            self.prepareGeometryChange()
+        self.control_points_item.setPos(self.control_point)
+        self.control_points_item.point_to_dest()
 
-        self.label_item.updateUI()
-        self.control_points_item.updateUI()
+        self.prepareGeometryChange()
+        self._path = path
+        self._bounds = path.boundingRect()
+        if self.model is not None:
+            self.model.transitions_version += 1
 
     def circle_from_two_points(self, p1: QPointF, p2: QPointF):
         center_x = (p1.x() + p2.x()) / 2
@@ -202,13 +298,91 @@ class TransitionItem(QGraphicsObject):
     
     @pyqtProperty(float)
     def width(self):
-        return self._width if hasattr(self, '_width') else 2
+        return self.transition_data.width
     
     @width.setter
     def width(self, value):
-        self._width = value
+        self.transition_data.width = value
         self.update()
 
+    @property
+    def id(self) -> str:
+        return self.transition_data.id
+
+    @property
+    def label(self) -> str:
+        return self.transition_data.label
+
+    @label.setter
+    def label(self, label: str):
+        self.transition_data.label = label
+
+    @property
+    def input_symbols(self) -> list[str]:
+        """Input symbols that trigger this transition"""
+        return self.transition_data.input_symbols
+
+    @input_symbols.setter
+    def input_symbols(self, symbols: list[str]):
+        self.transition_data.input_symbols = symbols
+
+    @property
+    def guard_condition(self) -> str:
+        """Boolean condition for transition"""
+        return self.transition_data.guard_condition
+
+    @guard_condition.setter
+    def guard_condition(self, condition: str):
+        self.transition_data.guard_condition = condition
+
+    @property
+    def output_value(self) -> str:
+        """Output for Mealy machines"""
+        return self.transition_data.output_value
+
+    @output_value.setter
+    def output_value(self, output_value: str):
+        self.transition_data.output_value = output_value
+
+    @property
+    def actions(self) -> list[str]:
+        """Actions to execute during transition"""
+        return self.transition_data.actions
+
+    @actions.setter
+    def actions(self, actions: list[str]):
+        self.transition_data.actions = actions
+
+    @property
+    def color(self) -> QColor:
+        return self._color
+
+    @color.setter
+    def color(self, color: QColor):
+        self._color = color
+        self.transition_data.color = color.name()
+        if self.model is not None:
+            self.model.transitions_version += 1
+
+    @property
+    def control_point_color(self) -> QColor:
+        return self._control_point_color
+
+    @control_point_color.setter
+    def control_point_color(self, color: QColor):
+        self._control_point_color = color
+        self.transition_data.control_point_color = color.name()
+
+    @property
+    def control_point(self) -> QPointF:
+        return self._control_point
+
+    @control_point.setter
+    def control_point(self, point: QPointF):
+        self._control_point = QPointF(point)
+        self.transition_data.control_x = point.x()
+        self.transition_data.control_y = point.y()
+
 
 class ControlPointItem(QGraphicsPolygonItem):
     def __init__(self, parent: TransitionItem = None):
@@ -229,8 +403,9 @@ class ControlPointItem(QGraphicsPolygonItem):
 
     def reinit(self):
         if self.scene() is not None:
-            self.build_arrow_shape()
-            self.updateUI()
+            if self.polygon().isEmpty():
+                self.build_arrow_shape()
+            self.setBrush(self.parent.control_point_color)
 
     def build_arrow_shape(self):
         """Build a triangle pointing up by default."""
@@ -260,11 +435,14 @@ class ControlPointItem(QGraphicsPolygonItem):
         self.setRotation(angle)
 
     def itemChange(self, change, value):
-        if change == QGraphicsItem.GraphicsItemChange.ItemPositionChange:
-            self.parent.updatePath()
-            self.point_to_dest()
+        if change == QGraphicsItem.GraphicsItemChange.ItemPositionHasChanged:
+            self.parent.schedule_update()
         return super().itemChange(change, value)
 
+    def paint(self, painter, option, widget=None):
+        if option.levelOfDetailFromTransform(painter.worldTransform()) >= DETAIL_LOD:
+            super().paint(painter, option, widget)
+
     def updateUI(self):
         self.point_to_dest()
         self.setBrush(self.parent.control_point_color)
@@ -279,7 +457,7 @@ class TransitionLabel(QGraphicsItemGroup):
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsFocusable, True)
         self.setFlag(QGraphicsItem.GraphicsItemFlag.ItemIsSelectable, True)
 
-        self.text_item = QGraphicsTextItem(parent.label, parent)
+        self.text_item = LabelTextItem(parent.label, parent)
         self.text_item.setFont(QFont("Arial", 12))
         self.text_item.setTextInteractionFlags(
             Qt.TextInteractionFlag.TextEditorInteraction)
@@ -288,7 +466,7 @@ class TransitionLabel(QGraphicsItemGroup):
         self.text_rect = self.text_item.boundingRect().adjusted(-self.padding, -
                                                                 self.padding, self.padding, self.padding)
 
-        self.border_item = QGraphicsRectItem(self.text_rect)
+        self.border_item = LabelBorderItem(self.text_rect)
         self.border_item.setPen(QPen(QColor("#e28743"), 2))
         self.border_item.setBrush(QColor("#ffffff"))
 
@@ -299,6 +477,28 @@ class TransitionLabel(QGraphicsItemGroup):
             QGraphicsTextItem.GraphicsItemFlag.ItemIsFocusable, True)
 
     def updateUI(self):
+        if self.text_item.toPlainText() == self.parent.label:
+            return
         self.text_item.setPlainText(self.parent.label)
         self.text_rect = self.text_item.boundingRect().adjusted(-self.padding, -self.padding, self.padding, self.padding)
-        self.border_item.setRect(self.text_rect)
\ No newline at end of file
+        self.border_item.setRect(self.text_rect)
+
+
+class LabelTextItem(QGraphicsTextItem):
+    """Transition label text, left out below DETAIL_LOD"""
+
+    def __init__(self, text: str, parent=None):
+        super().__init__(text, parent)
+        self.setCacheMode(QGraphicsItem.CacheMode.DeviceCoordinateCache)
+
+    def paint(self, painter, option, widget=None):
+        if option.levelOfDetailFromTransform(painter.worldTransform()) >= DETAIL_LOD:
+            super().paint(painter, option, widget)
+
+
+class LabelBorderItem(QGraphicsRectItem):
+    """Box behind a transition label, left out below DETAIL_LOD"""
+
+    def paint(self, painter, option, widget=None):
+        if option.levelOfDetailFromTransform(painter.worldTransform()) >= DETAIL_LOD:
+            super().paint(painter, option, widget)
@@ -10,7 +10,7 @@ from app.ui.docks.console import ConsoleDock
 from app.ui.docks.model import FSMModelDock
 from app.core.logger import ActivityLogger
 from app.core.validator import FSMValidator
-from app.core.commands import SaveFSMModelCommand, OpenMachine
+from app.core.commands import SaveFSMModelCommand, OpenMachine, MinimizeCommand
 from app.ui.dialogs.assistant_config import AssistantConfigDialog
 from app.ui.dialogs.batch_test import BatchTestDialog
 from app.core.recent_files import RecentFilesManager
@@ -84,7 +84,14 @@ class MainWindow(QMainWindow):
         
         delete_selected_action = QAction(QIcon(f"{ICONS_PATH}/delete.png"), "Delete Selected", self)
         delete_selected_action.setShortcut("Delete")
+        delete_selected_action.triggered.connect(self.canvas.delete_selected)
         edit_menu.addAction(delete_selected_action)
+
+        edit_menu.addSeparator()
+
+        minimize_action = QAction("Minimize States", self)
+        minimize_action.triggered.connect(self.minimize_fsm)
+        edit_menu.addAction(minimize_action)
         
         simulation_menu = menu.addMenu("Simulation")
         
@@ -233,6 +240,9 @@ class MainWindow(QMainWindow):
         self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.chat_dock)
 
         self.model_dock = FSMModelDock(self)
+        # Later models are registered by CanvasView.set_new_model
+        self.canvas.fsm_model.on_change(self.model_dock.update_model_info)
+        self.validator.issues_changed.connect(self.model_dock.update_validation_status)
         self.addDockWidget(Qt.DockWidgetArea.RightDockWidgetArea, self.model_dock)
 
         self.tabifyDockWidget(self.model_dock, self.properties_dock)
@@ -249,9 +259,14 @@ class MainWindow(QMainWindow):
         
 
 
+    def closeEvent(self, event):
+        self.validator.shutdown()
+        super().closeEvent(event)
+
     def _create_central_widget(self):
         self.canvas = CanvasView(self)
         self.setCentralWidget(self.canvas)
+        self.statusBar().addPermanentWidget(self.canvas.load_progress)
 
     def _set_selected_tool(self, tool: str):
         self.selected_tool = tool
@@ -279,9 +294,9 @@ class MainWindow(QMainWindow):
                     json_data = json.load(f)
                 
                 new_model = FSMModel()
-                new_model.on_change(self.model_dock.update_model_info)
-                new_model.set_path(file_path)
-                new_model.from_json(json_data)
+                with new_model.batch():
+                    new_model.set_path(file_path)
+                    new_model.from_json(json_data)
                 
                 self.canvas.set_new_model(new_model)
                 self.recent_files.add_file(file_path)
@@ -342,10 +357,31 @@ class MainWindow(QMainWindow):
         
         from app.ui.items.state import FSMModel
         new_model = FSMModel()
-        self.model_dock.update_model_info(new_model)
         self.canvas.set_new_model(new_model)
         self.logger.log("Created new empty FSM", self.__class__.__name__)
         
+    def minimize_fsm(self):
+        try:
+            command = MinimizeCommand(self.canvas)
+        except ValueError as e:
+            QMessageBox.warning(self, "Cannot Minimize", f"Cannot minimize this machine: {e}")
+            return
+
+        stats = command.stats
+        if (not command.determinized and stats.states_after == stats.states_before
+                and stats.transitions_after == stats.transitions_before):
+            self.logger.log("Machine is already minimal", self.__class__.__name__)
+            return
+
+        self.canvas.command_manager.execute(command)
+        if command.determinized:
+            self.logger.log("Machine has nondeterministic transitions, minimized its subset-construction DFA",
+                            self.__class__.__name__, "WARNING")
+        for names in stats.merged:
+            self.logger.log(f"Merged equivalent states: {', '.join(names)}", self.__class__.__name__)
+        if stats.unreachable_removed:
+            self.logger.log(f"Removed {stats.unreachable_removed} unreachable states", self.__class__.__name__)
+
     def show_code_generator(self, language=None):
         dialog = CodeGeneratorDialog(self.canvas.fsm_model, self)
         if language:
@@ -0,0 +1,447 @@
+"""Benchmark the code emitted by CodeGenerator across languages and styles.
+
+Every machine of a generated corpus is compiled by each backend (language
+and style) and fed the same random input stream, a random walk that always
+follows a transition. Each run reports steps/sec, memory, and whether its
+final state agrees with the simulator engine.
+
+Python output runs in-process. C++ and Java outputs are built with a local
+g++ or javac/java when one is on PATH, and skipped otherwise.
+
+Usage, from the repository root:
+    python -m benchmarks.codegen_benchmark [--machines small dense ...] [--steps N]
+                                           [--budget SECONDS] [--json results.json]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import string
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+
+from app.core.engine import CompiledFSM, NO_STATE
+from app.core.generator import CodeGenerator
+from app.core.model import MachineData
+
+
+# name: (states, symbols, transitions per state)
+MACHINES = {
+    "small": (6, 3, 3),
+    "dense": (200, 32, 32),
+    "sparse": (2000, 62, 2),
+    "10k": (10000, 8, 4),
+}
+
+# Single characters, so the byte-oriented C++ feed() applies to every symbol
+ALPHABET = string.ascii_letters + string.digits
+
+DEFAULT_STEPS = 200000
+DEFAULT_BUDGET = 5.0        # Seconds per run before it is cut short
+CHUNK = 1024                # Steps between budget checks
+MEMORY_STEPS = 100          # Most steps run under tracemalloc for the Python memory figure
+COMPILE_TIMEOUT = 300       # Seconds; map-style C++ constructors grow with the machine
+
+
+@dataclass
+class BenchResult:
+    machine: str
+    language: str
+    style: str
+    api: str
+    steps: int = 0
+    seconds: float = 0.0
+    memory_kb: int = 0
+    final_state: str = ""
+    complete: bool = False
+    agrees: bool | None = None
+    error: str = ""
+    timed_out: bool = False     # The build was too slow, which is a result rather than a failure
+
+    @property
+    def steps_per_second(self) -> float:
+        return self.steps / self.seconds if self.seconds > 0 else 0.0
+
+
+def make_machine(name: str, num_states: int, num_symbols: int, fanout: int, seed: int) -> dict:
+    """Random machine in MachineData.to_json form where every state has ``fanout`` outgoing symbols"""
+    rng = random.Random(seed)
+    symbols = list(ALPHABET[:num_symbols])
+    states = [{
+        "id": f"s{i}",
+        "name": f"q{i}",
+        "is_initial": i == 0,
+        "is_accepting": rng.random() < 0.2,
+        "output_value": "",
+        "properties": {"x": (i % 100) * 80, "y": (i // 100) * 80}
+    } for i in range(num_states)]
+
+    transitions = []
+    for i in range(num_states):
+        by_destination: dict[int, list[str]] = {}
+        for symbol in rng.sample(symbols, min(fanout, num_symbols)):
+            by_destination.setdefault(rng.randrange(num_states), []).append(symbol)
+        for destination, input_symbols in by_destination.items():
+            transitions.append({
+                "id": f"t{len(transitions)}",
+                "source": f"s{i}",
+                "destination": f"s{destination}",
+                "label": ",".join(input_symbols),
+                "input_symbols": input_symbols,
+                "properties": {}
+            })
+
+    return {
+        "id": name,
+        "name": f"bench {name}",
+        "input_alphabet": symbols,
+        "output_alphabet": [],
+        "states": states,
+        "transitions": transitions
+    }
+
+
+def random_walk(engine: CompiledFSM, steps: int, seed: int) -> tuple[list[str], str]:
+    """Input stream that always takes some transition, and the state it ends in"""
+    rng = random.Random(seed)
+    num_symbols = engine.num_symbols
+    outgoing = [[c for c in range(num_symbols) if engine.next_state[state * num_symbols + c] != NO_STATE]
+                for state in range(engine.num_states)]
+    state = engine.initial_state
+    stream = []
+    for _ in range(steps):
+        choices = outgoing[state]
+        if not choices:
+            break
+        symbol = rng.choice(choices)
+        stream.append(engine.symbols[symbol])
+        state = engine.next_state[state * num_symbols + symbol]
+    return stream, engine.state_names[state]
+
+
+def run_python(machine: str, style: str, code: str, class_name: str, stream: list[str],
+               budget: float) -> BenchResult:
+    namespace = {}
+    exec(compile(code, f"<{machine}-{style}>", "exec"), namespace)
+    cls = namespace[class_name]
+
+    if style == "table":
+        inputs = [cls.SYMBOL_INDEX[symbol] for symbol in stream]
+        result = BenchResult(machine, "python", style, "step(int)")
+        advance = "step"
+    else:
+        inputs = stream
+        result = BenchResult(machine, "python", style, "transition(str)")
+        advance = "transition"
+
+    # Memory is measured on a separate instance, tracing would skew the timing.
+    # Tracing is slow on allocation-heavy steps, so it also stops at the budget
+    tracemalloc.start()
+    start = time.perf_counter()
+    fsm = cls()
+    for value in inputs[:MEMORY_STEPS]:
+        getattr(fsm, advance)(value)
+        if time.perf_counter() - start > budget:
+            break
+    result.memory_kb = tracemalloc.get_traced_memory()[1] // 1024
+    tracemalloc.stop()
+
+    fsm = cls()
+    step = getattr(fsm, advance)
+    start = time.perf_counter()
+    for offset in range(0, len(inputs), CHUNK):
+        for value in inputs[offset:offset + CHUNK]:
+            step(value)
+        result.steps = min(offset + CHUNK, len(inputs))
+        if time.perf_counter() - start > budget:
+            break
+    result.seconds = time.perf_counter() - start
+    result.complete = result.steps == len(inputs)
+    result.final_state = fsm.get_current_state()
+    return result
+
+
+CPP_DRIVER = r"""
+#include "machine.hpp"
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <fstream>
+#include <string>
+#include <vector>
+#include <sys/resource.h>
+
+// Peak RSS of this process; ru_maxrss can carry over the forking parent's peak
+long peak_rss_kb() {
+    std::ifstream status("/proc/self/status");
+    std::string key;
+    while (status >> key) {
+        if (key == "VmHWM:") {
+            long kb = 0;
+            status >> kb;
+            return kb;
+        }
+    }
+    struct rusage usage;
+    getrusage(RUSAGE_SELF, &usage);
+    return usage.ru_maxrss;
+}
+
+int main(int argc, char** argv) {
+    std::ifstream in(argv[1]);
+    double budget = std::atof(argv[2]);
+    std::vector<std::string> stream;
+    std::string line;
+    while (std::getline(in, line)) {
+        stream.push_back(line);
+    }
+
+    CLASS_NAME fsm;
+    size_t done = 0;
+#if defined(STYLE_TABLE)
+    std::vector<int> inputs;
+    for (const std::string& symbol : stream) {
+        inputs.push_back(CLASS_NAME::symbol_id(symbol));
+    }
+#elif defined(STYLE_SWITCH)
+    std::string inputs;
+    for (const std::string& symbol : stream) {
+        inputs += symbol;
+    }
+#endif
+    auto start = std::chrono::steady_clock::now();
+    auto elapsed = [&]() {
+        return std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+    };
+    while (done < stream.size()) {
+        size_t end = done + CHUNK < stream.size() ? done + CHUNK : stream.size();
+#if defined(STYLE_TABLE)
+        for (; done < end; ++done) {
+            fsm.step(inputs[done]);
+        }
+#elif defined(STYLE_SWITCH)
+        size_t consumed = fsm.feed(reinterpret_cast<const uint8_t*>(inputs.data()) + done, end - done);
+        done += consumed;
+        if (done < end) {
+            break;
+        }
+#else
+        for (; done < end; ++done) {
+            fsm.transition(stream[done]);
+        }
+#endif
+        if (elapsed() > budget) {
+            break;
+        }
+    }
+    double seconds = elapsed();
+
+    std::printf("{\"steps\": %zu, \"seconds\": %.9f, \"memory_kb\": %ld, \"final_state\": \"%s\"}\n",
+                done, seconds, peak_rss_kb(), fsm.get_current_state().c_str());
+    return 0;
+}
+"""
+
+CPP_APIS = {"map": "transition(string)", "table": "step(int)", "switch": "feed(bytes)"}
+
+
+def run_cpp(machine: str, style: str, code: str, class_name: str, stream_path: str, workdir: str,
+            budget: float, compiler: str) -> BenchResult:
+    result = BenchResult(machine, "cpp", style, CPP_APIS[style])
+    directory = os.path.join(workdir, f"cpp-{machine}-{style}")
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "machine.hpp"), "w") as f:
+        f.write(code)
+    with open(os.path.join(directory, "main.cpp"), "w") as f:
+        f.write(CPP_DRIVER)
+
+    binary = os.path.join(directory, "bench")
+    if not _build(result, [compiler, "-std=c++17", "-O2", f"-DCLASS_NAME={class_name}", f"-DCHUNK={CHUNK}",
+                           f"-DSTYLE_{style.upper()}", "-o", binary, "main.cpp"], directory):
+        return result
+    return _run_driver(result, [binary, stream_path, str(budget)], len_stream(stream_path))
+
+
+JAVA_DRIVER = r"""
+import java.nio.file.*;
+import java.util.*;
+
+public class BenchMain {
+    public static void main(String[] args) throws Exception {
+        List<String> stream = Files.readAllLines(Paths.get(args[0]));
+        double budget = Double.parseDouble(args[1]);
+        boolean table = args[2].equals("table");
+        int[] inputs = new int[stream.size()];
+        if (table) {
+            for (int i = 0; i < inputs.length; i++) {
+                inputs[i] = CLASS_NAME.symbolId(stream.get(i));
+            }
+        }
+
+        CLASS_NAME fsm = new CLASS_NAME();
+        int done = 0;
+        long start = System.nanoTime();
+        while (done < inputs.length) {
+            int end = Math.min(done + CHUNK, inputs.length);
+            if (table) {
+                for (; done < end; done++) {
+                    fsm.step(inputs[done]);
+                }
+            } else {
+                for (; done < end; done++) {
+                    fsm.transition(stream.get(done));
+                }
+            }
+            if ((System.nanoTime() - start) / 1e9 > budget) {
+                break;
+            }
+        }
+        double seconds = (System.nanoTime() - start) / 1e9;
+
+        Runtime runtime = Runtime.getRuntime();
+        long memoryKb = (runtime.totalMemory() - runtime.freeMemory()) / 1024;
+        System.out.println("{\"steps\": " + done + ", \"seconds\": " + seconds + ", \"memory_kb\": " + memoryKb
+                           + ", \"final_state\": \"" + fsm.getCurrentState() + "\"}");
+    }
+}
+"""
+
+JAVA_APIS = {"map": "transition(String)", "table": "step(int)"}
+
+
+def run_java(machine: str, style: str, code: str, class_name: str, stream_path: str, workdir: str,
+             budget: float, javac: str, java: str) -> BenchResult:
+    result = BenchResult(machine, "java", style, JAVA_APIS[style])
+    directory = os.path.join(workdir, f"java-{machine}-{style}")
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{class_name}.java"), "w") as f:
+        f.write(code)
+    with open(os.path.join(directory, "BenchMain.java"), "w") as f:
+        f.write(JAVA_DRIVER.replace("CLASS_NAME", class_name).replace("CHUNK", str(CHUNK)))
+
+    if not _build(result, [javac, f"{class_name}.java", "BenchMain.java"], directory):
+        return result
+    return _run_driver(result, [java, "-cp", directory, "BenchMain", stream_path, str(budget), style],
+                       len_stream(stream_path))
+
+
+def len_stream(stream_path: str) -> int:
+    with open(stream_path) as f:
+        return sum(1 for _ in f)
+
+
+def _build(result: BenchResult, command: list[str], directory: str) -> bool:
+    """Run a compiler, recording why it failed on ``result``"""
+    try:
+        build = subprocess.run(command, cwd=directory, capture_output=True, text=True, timeout=COMPILE_TIMEOUT)
+    except subprocess.TimeoutExpired:
+        result.error = f"compilation took over {COMPILE_TIMEOUT}s"
+        result.timed_out = True
+        return False
+    if build.returncode != 0:
+        result.error = build.stderr.strip().splitlines()[0] if build.stderr.strip() else "compilation failed"
+        return False
+    return True
+
+
+def _run_driver(result: BenchResult, command: list[str], total: int) -> BenchResult:
+    run = subprocess.run(command, capture_output=True, text=True)
+    if run.returncode != 0:
+        result.error = run.stderr.strip().splitlines()[-1] if run.stderr.strip() else "run failed"
+        return result
+    output = json.loads(run.stdout.strip().splitlines()[-1])
+    result.steps = output["steps"]
+    result.seconds = output["seconds"]
+    result.memory_kb = output["memory_kb"]
+    result.final_state = output["final_state"]
+    result.complete = result.steps == total
+    return result
+
+
+def benchmark(machines: list[str], steps: int, budget: float, seed: int, languages: list[str]) -> list[BenchResult]:
+    compiler = shutil.which("g++") if "cpp" in languages else None
+    javac, java = (shutil.which("javac"), shutil.which("java")) if "java" in languages else (None, None)
+    if "cpp" in languages and compiler is None:
+        print("g++ not found, skipping C++", file=sys.stderr)
+    if "java" in languages and (javac is None or java is None):
+        print("javac/java not found, skipping Java", file=sys.stderr)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="fsm-bench-") as workdir:
+        for machine in machines:
+            model_json = make_machine(machine, *MACHINES[machine], seed)
+            stream, reference = random_walk(CompiledFSM.from_json(model_json), steps, seed)
+            stream_path = os.path.join(workdir, f"{machine}.txt")
+            with open(stream_path, "w") as f:
+                f.write("\n".join(stream) + "\n")
+
+            model = MachineData()
+            model.from_json(model_json)
+            generator = CodeGenerator(model)
+
+            for language in languages:
+                generator_class = generator.generators[language]
+                class_name = generator_class(model).sanitize_class_name(model.name)
+                for style in generator.get_supported_styles(language):
+                    code = CodeGenerator(model, style=style).generate_code(language)
+                    if language == "python":
+                        result = run_python(machine, style, code, class_name, stream, budget)
+                    elif language == "cpp" and compiler:
+                        result = run_cpp(machine, style, code, class_name, stream_path, workdir, budget, compiler)
+                    elif language == "java" and javac and java and style in JAVA_APIS:
+                        result = run_java(machine, style, code, class_name, stream_path, workdir, budget, javac, java)
+                    else:
+                        continue
+                    if result.complete and not result.error:
+                        result.agrees = result.final_state == reference
+                    results.append(result)
+                    print_result(result)
+    return results
+
+
+def print_header():
+    print(f"{'machine':<8} {'backend':<14} {'api':<20} {'steps':>8} {'steps/s':>14} {'memory':>10}  final state")
+
+
+def print_result(result: BenchResult):
+    backend = f"{result.language}/{result.style}"
+    if result.error:
+        print(f"{result.machine:<8} {backend:<14} {result.api:<20} error: {result.error}", flush=True)
+        return
+    if result.agrees is None:
+        verdict = "(cut short)"
+    else:
+        verdict = "agrees" if result.agrees else "DISAGREES"
+    print(f"{result.machine:<8} {backend:<14} {result.api:<20} {result.steps:>8} "
+          f"{result.steps_per_second:>14,.0f} {result.memory_kb:>8} KB  {result.final_state} {verdict}", flush=True)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark generated FSM code across languages and styles")
+    parser.add_argument("--machines", nargs="+", choices=list(MACHINES), default=list(MACHINES))
+    parser.add_argument("--languages", nargs="+", choices=["python", "cpp", "java"],
+                        default=["python", "cpp", "java"])
+    parser.add_argument("--steps", type=int, default=DEFAULT_STEPS, help="Length of each input stream")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET, help="Seconds per run before cutting it short")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    print_header()
+    results = benchmark(args.machines, args.steps, args.budget, args.seed, args.languages)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([dict(asdict(r), steps_per_second=r.steps_per_second) for r in results], f, indent=2)
+
+    failed = [r for r in results if (r.error and not r.timed_out) or r.agrees is False]
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
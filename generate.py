@@ -0,0 +1,173 @@
+"""Headless bulk code generation for saved FSM models.
+
+Generates code for every model JSON file found under the given paths,
+without PyQt. Java sources go to a directory named after the model file,
+since Java requires each file to be named after its class. Work runs in parallel across processes, one job per model
+and language. A model is skipped when its content hash, the template
+version and the options match the manifest of the previous run. Outputs
+are written atomically, so readers never see a partial file.
+
+Usage:
+    python generate.py MODELS... -o OUTPUT_DIR [-l python cpp java] [-s map|table|switch]
+                       [-j JOBS] [--determinize] [--force] [--template-cache DIR]
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from app.core.engine import json_rows
+from app.core.generator import CodeGenerator, content_hash
+from app.core.generators.base import configure_template_cache, template_version
+from app.core.model import MachineData
+
+
+EXTENSIONS = {"python": "py", "cpp": "cpp", "java": "java"}
+MANIFEST_NAME = ".fsm-generate.json"
+
+
+def find_models(paths: list[str]) -> list[str]:
+    """Model files named on the command line or found below the given directories"""
+    models = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                models.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(".json"))
+        else:
+            models.append(path)
+    return models
+
+
+def file_mode(path: str) -> int:
+    """Mode for ``path``: that of the existing file, else what open() would create"""
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def write_atomic(path: str, content: str):
+    """Write to a temporary file next to ``path`` and rename it into place"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        # mkstemp creates the file as 0600
+        os.chmod(temp_path, file_mode(path))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def output_path(model: MachineData, language: str, relative: str, output_dir: str) -> str:
+    stem = os.path.splitext(relative)[0]
+    if language == "java":
+        # Java requires the file to be named after its public class, which
+        # models in one directory may share, so each gets its own directory
+        generator_class = CodeGenerator(model).generators[language]
+        stem = os.path.join(stem, generator_class(model).sanitize_class_name(model.name))
+    return os.path.join(output_dir, f"{stem}.{EXTENSIONS[language]}")
+
+
+def generation_key(model: MachineData, model_json: dict, style: str, determinize: bool) -> str:
+    return content_hash(model.name, json_rows(model_json)) + f":{template_version()}:{style}:{determinize}"
+
+
+def generate_one(model_path: str, relative: str, language: str, output_dir: str, style: str, determinize: bool,
+                 previous: dict | None, force: bool) -> tuple[str, str, dict | None, str]:
+    """Generate one model in one language; returns (model, language, manifest entry, status)"""
+    try:
+        with open(model_path, "r") as f:
+            model_json = json.load(f)
+        model = MachineData()
+        model.from_json(model_json)
+
+        key = generation_key(model, model_json, style, determinize)
+        path = output_path(model, language, relative, output_dir)
+        if not force and previous == {"key": key, "output": path} and os.path.exists(path):
+            return relative, language, previous, "unchanged"
+
+        code = CodeGenerator(model, determinize, style).generate_code(language)
+        write_atomic(path, code)
+        return relative, language, {"key": key, "output": path}, "generated"
+    except Exception as e:
+        return relative, language, None, f"failed: {e}"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Generate code for saved FSM models without the GUI")
+    parser.add_argument("models", nargs="+", help="Model JSON files or directories to search")
+    parser.add_argument("-o", "--output", required=True, help="Directory for the generated sources")
+    parser.add_argument("-l", "--languages", nargs="+", choices=list(EXTENSIONS), default=list(EXTENSIONS))
+    parser.add_argument("-s", "--style", default="map", help="Generation style (map, table, or switch for C++)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--determinize", action="store_true", help="Generate from the subset-construction DFA")
+    parser.add_argument("--force", action="store_true", help="Regenerate models that did not change")
+    parser.add_argument("--template-cache", help="Directory to persist compiled templates in")
+    args = parser.parse_args(argv)
+
+    generators = CodeGenerator(MachineData()).generators
+    languages = [language for language in args.languages if args.style in generators[language].STYLES]
+    if not languages:
+        parser.error(f"style {args.style!r} is not supported by {', '.join(args.languages)}")
+    for language in args.languages:
+        if language not in languages:
+            print(f"Skipping {language}: style {args.style!r} is not supported", file=sys.stderr)
+
+    if args.template_cache:
+        # Workers inherit the environment, so they share the cache
+        os.environ["FSM_TEMPLATE_CACHE_DIR"] = args.template_cache
+        configure_template_cache(args.template_cache)
+
+    manifest_path = os.path.join(args.output, MANIFEST_NAME)
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    jobs = []
+    for model_path in find_models(args.models):
+        base = next((p for p in args.models if os.path.isdir(p) and
+                     os.path.commonpath([os.path.abspath(p), os.path.abspath(model_path)]) == os.path.abspath(p)),
+                    None)
+        relative = os.path.relpath(model_path, base) if base else os.path.basename(model_path)
+        for language in languages:
+            previous = manifest.get(relative, {}).get(language)
+            jobs.append((model_path, relative, language, args.output, args.style, args.determinize,
+                         previous, args.force))
+
+    counts = {"generated": 0, "unchanged": 0, "failed": 0}
+    with ProcessPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        futures = [executor.submit(generate_one, *job) for job in jobs]
+        for future in as_completed(futures):
+            relative, language, entry, status = future.result()
+            if entry is not None:
+                manifest.setdefault(relative, {})[language] = entry
+            else:
+                manifest.get(relative, {}).pop(language, None)
+            if status.startswith("failed"):
+                counts["failed"] += 1
+                print(f"{relative} [{language}] {status}", file=sys.stderr)
+            else:
+                counts[status] += 1
+                if status == "generated":
+                    print(f"{relative} [{language}] -> {entry['output']}")
+
+    write_atomic(manifest_path, json.dumps(manifest, indent=2, sort_keys=True))
+    print(f"{counts['generated']} generated, {counts['unchanged']} unchanged, {counts['failed']} failed")
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
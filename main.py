@@ -1,10 +1,17 @@
-from PyQt5.QtWidgets import QApplication
-from app.ui.main_window import MainWindow
-
 if __name__ == "__main__":
+    # Batch workers are spawned processes that import this file as
+    # __mp_main__, so the GUI is only imported when run as a script
+    import os
+    from PyQt5.QtCore import QStandardPaths
+    from PyQt5.QtWidgets import QApplication
+    from app.core.generators.base import configure_template_cache
+    from app.ui.main_window import MainWindow
+
     app = QApplication([])
+    configure_template_cache(os.path.join(QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation),
+                                          "FSM_Py2.0", "templates"))
 
     window = MainWindow()
     window.show()
     
-    app.exec()
\ No newline at end of file
+    app.exec()
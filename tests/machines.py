@@ -0,0 +1,106 @@
+"""Random machines in FSMModel.to_json form and a plain reference interpreter"""
+import random
+
+
+def random_machine(rng: random.Random, num_states: int, symbols: list[str], fanout: int,
+                   deterministic: bool = True, alphabet: list[str] | None = None, initial_count: int = 1,
+                   with_outputs: bool = True) -> dict:
+    """Machine where each state has up to ``fanout`` outgoing symbols.
+
+    Unless ``deterministic``, a symbol may leave a state on several
+    transitions. States and transitions get a few distinct outputs, so both
+    Moore and Mealy runs have something to compare, unless ``with_outputs``
+    is false.
+    """
+    state_outputs = ["", "x", "y"] if with_outputs else [""]
+    transition_outputs = ["", "0", "1"] if with_outputs else [""]
+    initial = set(rng.sample(range(num_states), initial_count))
+    states = [{
+        "id": f"s{i}",
+        "name": f"q{i}",
+        "is_initial": i in initial,
+        "is_accepting": rng.random() < 0.3,
+        "output_value": rng.choice(state_outputs),
+        "properties": {"x": i * 80, "y": 0}
+    } for i in range(num_states)]
+
+    transitions = []
+    for i in range(num_states):
+        chosen = rng.sample(symbols, min(fanout, len(symbols)))
+        if not deterministic:
+            chosen += rng.choices(symbols, k=fanout)
+        by_destination: dict[int, list[str]] = {}
+        for symbol in chosen:
+            destination = by_destination.setdefault(rng.randrange(num_states), [])
+            if symbol not in destination:
+                destination.append(symbol)
+        for destination, input_symbols in by_destination.items():
+            if deterministic:
+                input_symbols = [s for s in input_symbols
+                                 if not any(s in t["input_symbols"] for t in transitions if t["source"] == f"s{i}")]
+                if not input_symbols:
+                    continue
+            transitions.append({
+                "id": f"t{len(transitions)}",
+                "source": f"s{i}",
+                "destination": f"s{destination}",
+                "label": ",".join(input_symbols),
+                "input_symbols": input_symbols,
+                "output_value": rng.choice(transition_outputs),
+                "properties": {}
+            })
+
+    return {
+        "id": "random",
+        "name": "random",
+        "input_alphabet": list(alphabet or []),
+        "output_alphabet": [],
+        "states": states,
+        "transitions": transitions
+    }
+
+
+def random_words(rng: random.Random, symbols: list[str], count: int, max_length: int) -> list[list[str]]:
+    return [rng.choices(symbols, k=rng.randint(0, max_length)) for _ in range(count)]
+
+
+def reference_run(model_json: dict, inputs: list[str], mode: str = "Moore") -> tuple[str | None, list[str], str]:
+    """Scan the transition list like the original simulator: (final state name, outputs, status)"""
+    states = {state["id"]: state for state in model_json["states"]}
+    initial = [state for state in model_json["states"] if state["is_initial"]]
+    if not initial:
+        return None, [], "No initial state"
+    if len(initial) > 1:
+        return None, [], "Multiple initial states"
+    alphabet = model_json.get("input_alphabet")
+    if alphabet and any(symbol not in alphabet for symbol in inputs):
+        return None, [], "Invalid Input"
+
+    current = initial[0]
+    outputs = []
+    for symbol in inputs:
+        transition = next((t for t in model_json["transitions"]
+                           if t["source"] == current["id"] and symbol in t["input_symbols"]), None)
+        if transition is None:
+            return current["name"], outputs, "No transition"
+        current = states[transition["destination"]]
+        outputs.append(transition["output_value"] if mode == "Mealy" else current["output_value"])
+    return current["name"], outputs, "Accepted" if current["is_accepting"] else "Rejected"
+
+
+def reference_nfa_run(model_json: dict, inputs: list[str]) -> tuple[set[str], str]:
+    """Follow every matching transition at once: (active state ids, status)"""
+    active = {state["id"] for state in model_json["states"] if state["is_initial"]}
+    if not active:
+        return set(), "No initial state"
+    alphabet = model_json.get("input_alphabet")
+    if alphabet and any(symbol not in alphabet for symbol in inputs):
+        return set(), "Invalid Input"
+    accepting = {state["id"] for state in model_json["states"] if state["is_accepting"]}
+    for symbol in inputs:
+        following = {t["destination"] for t in model_json["transitions"]
+                     if t["source"] in active and symbol in t["input_symbols"]}
+        if not following:
+            return active, "No transition"
+        active = following
+    return active, "Accepted" if active & accepting else "Rejected"
@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from app.core.batch import run_batch, run_batch_parallel, tokenize
+from app.core.engine import CompiledFSM, NO_STATE
+from tests.machines import random_machine, random_words, reference_run
+
+
+SYMBOLS = ["a", "b", "c", "dd"]
+
+
+def machines():
+    rng = random.Random(1)
+    for seed in range(12):
+        yield random_machine(rng, rng.randint(1, 12), SYMBOLS, rng.randint(1, 3),
+                             deterministic=seed % 2 == 0,
+                             alphabet=SYMBOLS[:3] if seed % 3 == 0 else None)
+
+
+@pytest.mark.parametrize("mode", ["Moore", "Mealy"])
+def test_engine_matches_reference(mode):
+    rng = random.Random(2)
+    for model_json in machines():
+        engine = CompiledFSM.from_json(model_json)
+        for word in random_words(rng, SYMBOLS + ["zz"], 50, 10):
+            name, outputs, status = reference_run(model_json, word, mode)
+            result = engine.run(word, mode)
+            assert result.status == status
+            assert result.outputs == outputs
+            if name is not None:
+                assert engine.state_names[result.final_state] == name
+
+
+def test_engine_reports_initial_state_errors():
+    model_json = random_machine(random.Random(3), 4, SYMBOLS, 2, initial_count=2)
+    assert CompiledFSM.from_json(model_json).run(["a"]).status == "Multiple initial states"
+    for state in model_json["states"]:
+        state["is_initial"] = False
+    result = CompiledFSM.from_json(model_json).run(["a"])
+    assert (result.final_state, result.status) == (NO_STATE, "No initial state")
+
+
+def expected_rows(model_json: dict, words: list[list[str]], mode: str) -> list[dict]:
+    rows = []
+    for word in words:
+        name, outputs, status = reference_run(model_json, word, mode)
+        if status == "Invalid Input":
+            rows.append({"final_state": "N/A", "output": "N/A", "status": status})
+        else:
+            rows.append({"final_state": name, "output": ",".join(outputs), "status": status})
+    return rows
+
+
+@pytest.mark.parametrize("mode", ["Moore", "Mealy"])
+def test_batch_matches_reference(mode):
+    rng = random.Random(4)
+    for model_json in machines():
+        engine = CompiledFSM.from_json(model_json)
+        words = random_words(rng, SYMBOLS + ["zz"], 80, 12)
+        assert run_batch(engine, words, mode).to_dicts(engine) == expected_rows(model_json, words, mode)
+
+
+def test_batch_without_outputs():
+    model_json = next(machines())
+    engine = CompiledFSM.from_json(model_json)
+    words = random_words(random.Random(5), SYMBOLS, 20, 6)
+    result = run_batch(engine, words, collect_outputs=False)
+    assert [row["status"] for row in result.to_dicts(engine)] == [engine.run(word).status for word in words]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_parallel_batch_matches_reference(workers):
+    rng = random.Random(6)
+    model_json = random_machine(rng, 20, SYMBOLS, 3)
+    engine = CompiledFSM.from_json(model_json)
+    lines = [",".join(word) for word in random_words(rng, SYMBOLS, 103, 15)]
+
+    rows = [None] * len(lines)
+    for offset, shard, result in run_batch_parallel(engine, iter(lines), ",", "Mealy", workers, shard_size=10):
+        assert shard == lines[offset:offset + len(shard)]
+        rows[offset:offset + len(shard)] = result.to_dicts(engine)
+
+    words = [tokenize(line, ",") for line in lines]
+    assert rows == expected_rows(model_json, words, "Mealy")
+
+
+def test_parallel_batch_needs_one_initial_state():
+    model_json = random_machine(random.Random(7), 3, SYMBOLS, 2, initial_count=2)
+    with pytest.raises(ValueError):
+        next(run_batch_parallel(CompiledFSM.from_json(model_json), ["a"]))
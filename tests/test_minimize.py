@@ -0,0 +1,99 @@
+import random
+
+import pytest
+
+from app.core.engine import CompiledFSM, NO_STATE
+from app.core.minimize import minimize_json, reachable_states
+from tests.machines import random_machine, random_words, reference_run
+
+
+SYMBOLS = ["a", "b", "c"]
+
+
+def doubled(model_json: dict, rng: random.Random) -> dict:
+    """Copy every state, with each transition going to either copy of its destination.
+
+    A state and its copy are equivalent, so the result minimizes to at most
+    the states of ``model_json``.
+    """
+    copies = [dict(state, id=state["id"] + "'", name=state["name"] + "'", is_initial=False)
+              for state in model_json["states"]]
+    transitions = []
+    for source in ("", "'"):
+        for transition in model_json["transitions"]:
+            transitions.append(dict(transition, id=f"t{len(transitions)}", source=transition["source"] + source,
+                                    destination=transition["destination"] + rng.choice(("", "'"))))
+    return dict(model_json, states=model_json["states"] + copies, transitions=transitions)
+
+
+def machines():
+    rng = random.Random(10)
+    for i in range(40):
+        # Without outputs many more states are equivalent
+        model_json = random_machine(rng, rng.randint(1, 15), SYMBOLS, rng.randint(1, 3), with_outputs=i % 2 == 0)
+        yield doubled(model_json, rng) if i % 4 < 2 else model_json
+
+
+def naive_class_count(engine: CompiledFSM) -> int:
+    """Number of equivalence classes of the reachable states by repeated full refinement"""
+    num_symbols = engine.num_symbols
+    states = reachable_states(engine)
+
+    def cell(q, c):
+        return q * num_symbols + c
+
+    def transition_output(q, c):
+        t = engine.transition_table[cell(q, c)]
+        return None if t == NO_STATE else engine.transition_outputs[t]
+
+    classes = {q: (engine.accepting[q], engine.state_outputs[q],
+                   tuple(transition_output(q, c) for c in range(num_symbols))) for q in states}
+    while True:
+        refined = {q: (classes[q], tuple(classes.get(engine.next_state[cell(q, c)]) for c in range(num_symbols)))
+                   for q in states}
+        if len(set(refined.values())) == len(set(classes.values())):
+            return len(set(classes.values()))
+        classes = refined
+
+
+@pytest.mark.parametrize("mode", ["Moore", "Mealy"])
+def test_minimized_machine_is_equivalent(mode):
+    rng = random.Random(11)
+    for model_json in machines():
+        minimized, _ = minimize_json(model_json)
+        for word in random_words(rng, SYMBOLS, 100, 12):
+            _, outputs, status = reference_run(model_json, word, mode)
+            _, new_outputs, new_status = reference_run(minimized, word, mode)
+            assert (new_status, new_outputs) == (status, outputs)
+
+
+def test_minimized_machine_has_one_state_per_class():
+    for model_json in machines():
+        minimized, stats = minimize_json(model_json)
+        expected = naive_class_count(CompiledFSM.from_json(model_json))
+        assert stats.states_after == len(minimized["states"]) == expected
+        assert stats.states_before == len(model_json["states"])
+        assert minimize_json(minimized)[1].states_after == expected
+
+
+def test_merged_states_keep_their_representative():
+    model_json = {
+        "states": [
+            {"id": "s0", "name": "start", "is_initial": True, "is_accepting": False},
+            {"id": "s1", "name": "left", "is_initial": False, "is_accepting": True},
+            {"id": "s2", "name": "right", "is_initial": False, "is_accepting": True},
+            {"id": "s3", "name": "unreachable", "is_initial": False, "is_accepting": False},
+        ],
+        "transitions": [
+            {"id": "t0", "source": "s0", "destination": "s1", "input_symbols": ["a"]},
+            {"id": "t1", "source": "s0", "destination": "s2", "input_symbols": ["b"]},
+            {"id": "t2", "source": "s1", "destination": "s2", "input_symbols": ["a"]},
+            {"id": "t3", "source": "s2", "destination": "s1", "input_symbols": ["a"]},
+        ]
+    }
+    minimized, stats = minimize_json(model_json)
+    assert [state["name"] for state in minimized["states"]] == ["start", "left"]
+    assert stats.merged == [["left", "right"]]
+    assert stats.unreachable_removed == 1
+    assert {(t["source"], t["destination"], tuple(t["input_symbols"])) for t in minimized["transitions"]} == {
+        ("s0", "s1", ("a",)), ("s0", "s1", ("b",)), ("s1", "s1", ("a",))}
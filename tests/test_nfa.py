@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from app.core.engine import CompiledFSM
+from app.core.minimize import minimize_json
+from app.core.nfa import NFA, SubsetExplosionError, determinize_json, iter_bits
+from tests.machines import random_machine, random_words, reference_nfa_run, reference_run
+
+
+SYMBOLS = ["a", "b", "c"]
+
+
+def machines():
+    rng = random.Random(20)
+    for i in range(30):
+        num_states = rng.randint(1, 10)
+        yield random_machine(rng, num_states, SYMBOLS, rng.randint(1, 3), deterministic=False,
+                             alphabet=SYMBOLS[:2] if i % 5 == 0 else None,
+                             initial_count=rng.randint(1, min(2, num_states)))
+
+
+def test_nfa_matches_reference():
+    rng = random.Random(21)
+    for model_json in machines():
+        nfa = NFA.from_json(model_json)
+        ids = nfa.engine.state_ids
+        for word in random_words(rng, SYMBOLS, 60, 10):
+            active, status = reference_nfa_run(model_json, word)
+            mask, nfa_status = nfa.run(word)
+            assert nfa_status == status
+            assert {ids[i] for i in iter_bits(mask)} == active
+
+
+def test_determinized_machine_accepts_the_same_words():
+    rng = random.Random(22)
+    for model_json in machines():
+        dfa = NFA.from_json(model_json).determinize()
+        assert dfa.is_deterministic
+        for word in random_words(rng, SYMBOLS, 60, 10):
+            active, status = reference_nfa_run(model_json, word)
+            result = dfa.run(word)
+            assert result.status == status
+            if status in ("Accepted", "Rejected", "No transition"):
+                assert {dfa.state_ids[result.final_state]} == {"+".join(sorted(active, key=lambda s: int(s[1:])))}
+
+
+def test_determinize_json_is_deterministic_and_equivalent():
+    rng = random.Random(23)
+    for model_json in machines():
+        dfa_json = determinize_json(model_json)
+        assert CompiledFSM.from_json(dfa_json).is_deterministic
+        minimized, _ = minimize_json(dfa_json)
+        for word in random_words(rng, SYMBOLS, 60, 10):
+            status = reference_nfa_run(model_json, word)[1]
+            assert reference_run(dfa_json, word)[2] == status
+            assert reference_run(minimized, word)[2] == status
+
+
+def test_deterministic_machine_is_unchanged():
+    model_json = random_machine(random.Random(24), 8, SYMBOLS, 2)
+    dfa = NFA.from_json(model_json).determinize()
+    engine = CompiledFSM.from_json(model_json)
+    for word in random_words(random.Random(25), SYMBOLS, 60, 10):
+        expected = engine.run(word)
+        result = dfa.run(word)
+        assert (result.status, result.outputs) == (expected.status, expected.outputs)
+
+
+def test_subset_explosion_is_bounded():
+    # The classic (a|b)*a(a|b)^n language needs 2^(n+1) subsets
+    n = 6
+    states = [{"id": f"s{i}", "name": f"q{i}", "is_initial": i == 0, "is_accepting": i == n + 1}
+              for i in range(n + 2)]
+    transitions = [{"id": "loop", "source": "s0", "destination": "s0", "input_symbols": ["a", "b"]},
+                   {"id": "guess", "source": "s0", "destination": "s1", "input_symbols": ["a"]}]
+    transitions += [{"id": f"t{i}", "source": f"s{i}", "destination": f"s{i + 1}", "input_symbols": ["a", "b"]}
+                    for i in range(1, n + 1)]
+    nfa = NFA.from_json({"states": states, "transitions": transitions})
+
+    assert len(nfa.determinize().subsets) == 2 ** (n + 1)
+    with pytest.raises(SubsetExplosionError):
+        nfa.determinize(max_states=2 ** n)
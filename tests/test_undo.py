@@ -0,0 +1,123 @@
+import random
+
+import pytest
+
+
+@pytest.fixture
+def window(qapp):
+    from app.ui.main_window import MainWindow
+    window = MainWindow()
+    yield window
+    window.canvas.fsm_model.set_is_saved(True)
+    window.close()
+
+
+def snapshot(model) -> tuple:
+    model_json = model.to_json()
+    return (sorted((s["id"], s["name"], s["is_initial"], s["is_accepting"]) for s in model_json["states"]),
+            sorted((t["id"], t["source"], t["destination"], tuple(t["input_symbols"]))
+                   for t in model_json["transitions"]))
+
+
+class RandomCommands:
+    """Executes random undoable edits through the canvas command manager"""
+
+    def __init__(self, canvas, rng: random.Random):
+        self.canvas = canvas
+        self.rng = rng
+        self.count = 0
+
+    @property
+    def model(self):
+        return self.canvas.fsm_model
+
+    def add_state(self):
+        from app.core.commands import AddStateCommand
+        from app.ui.items.state import StateItem
+        self.count += 1
+        state = StateItem(f"q{self.count}", is_initial=not self.model.states)
+        state.setPos(self.count * 120, 0)
+        self.canvas.command_manager.execute(AddStateCommand(state, self.canvas.scene, self.model))
+
+    def add_transition(self):
+        from app.core.commands import AddTransitionCommand
+        from app.ui.items.transition import TransitionItem
+        states = list(self.model.states)
+        transition = TransitionItem(self.rng.choice(states), self.rng.choice(states), self.rng.choice("ab"))
+        self.canvas.command_manager.execute(AddTransitionCommand(transition, self.canvas.scene, self.model))
+
+    def delete(self, items):
+        from app.core.commands import DeleteCommand
+        self.canvas.command_manager.execute(DeleteCommand(self.rng.choice(list(items)), self.canvas.scene,
+                                                          self.model))
+
+    def delete_several(self):
+        from app.core.commands import DeleteCommand
+        manager = self.canvas.command_manager
+        transitions = list(self.model.transitions)
+        with manager.transaction("Deleted selected items", self.model):
+            for transition in self.rng.sample(transitions, min(2, len(transitions))):
+                manager.execute(DeleteCommand(transition, self.canvas.scene, self.model))
+            manager.execute(DeleteCommand(self.rng.choice(list(self.model.states)), self.canvas.scene, self.model))
+
+    def toggle(self):
+        from app.core.commands import ToggleAcceptingStateCommand, ToggleInitialStateCommand
+        command = ToggleInitialStateCommand if self.rng.random() < 0.25 else ToggleAcceptingStateCommand
+        self.canvas.command_manager.execute(command(self.rng.choice(list(self.model.states)), self.canvas.scene))
+
+    def minimize(self):
+        from app.core.commands import MinimizeCommand
+        try:
+            command = MinimizeCommand(self.canvas)
+        except ValueError:
+            return
+        self.canvas.command_manager.execute(command)
+
+    def run_one(self):
+        edits = [self.add_state, self.add_state, self.add_state]
+        if self.model.states:
+            edits += [self.add_transition, self.add_transition, self.toggle, self.toggle,
+                      lambda: self.delete(self.model.states)]
+        if self.model.transitions:
+            edits += [lambda: self.delete(self.model.transitions), self.delete_several]
+        if len(self.model.states) > 3:
+            edits += [self.minimize, self.minimize]
+        self.rng.choice(edits)()
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("live_commands", [1, 3])
+def test_undo_redo_round_trip(window, seed, live_commands):
+    canvas = window.canvas
+    manager = canvas.command_manager
+    manager.live_commands = live_commands
+    commands = RandomCommands(canvas, random.Random(seed))
+
+    # Model snapshot for every undo stack depth; merged toggles replace the top
+    history = [snapshot(canvas.fsm_model)]
+    for _ in range(60):
+        commands.run_one()
+        depth = len(manager.undo_stack)
+        del history[depth:]
+        history.append(snapshot(canvas.fsm_model))
+        assert len(history) == depth + 1
+
+    while manager.undo_stack:
+        manager.undo()
+        assert snapshot(canvas.fsm_model) == history[len(manager.undo_stack)]
+    assert snapshot(canvas.fsm_model) == history[0]
+
+    # Undoing a minimization clears what could be redone after it
+    while manager.redo_stack:
+        manager.redo()
+        assert snapshot(canvas.fsm_model) == history[len(manager.undo_stack)]
+
+    for _ in range(10):
+        manager.undo()
+    for _ in range(10):
+        manager.redo()
+    assert snapshot(canvas.fsm_model) == history[len(manager.undo_stack)]
+
+    scene = canvas.scene
+    assert all(state.scene() is scene for state in canvas.fsm_model.states)
+    assert all(transition.scene() is scene for transition in canvas.fsm_model.transitions)
@@ -0,0 +1,104 @@
+import random
+
+import pytest
+
+from app.core.validator import compute_issues
+
+
+@pytest.fixture
+def model(qapp):
+    from app.ui.items.state import FSMModel
+    return FSMModel()
+
+
+def counters(validator) -> tuple:
+    return (dict(validator._name_counts), validator._accepting_count, set(validator._initial_states),
+            set(validator._duplicate_names))
+
+
+def issues(validator) -> tuple[list[str], set[str]]:
+    """Issues from the validator's current snapshot; duplicate names are unordered"""
+    result, _ = compute_issues(validator._snapshot())
+    duplicates = set(validator._duplicate_names)
+    return [issue for issue in result if not issue.startswith("Duplicate state names")], duplicates
+
+
+class RandomEditor:
+    """Applies random edits to a model the way the commands do"""
+
+    def __init__(self, model, rng: random.Random):
+        from app.ui.items.state import StateItem
+        from app.ui.items.transition import TransitionItem
+        self.StateItem = StateItem
+        self.TransitionItem = TransitionItem
+        self.model = model
+        self.rng = rng
+
+    def add_state(self):
+        rng = self.rng
+        state = self.StateItem(rng.choice("ABCDEFGH"), is_initial=rng.random() < 0.2,
+                               is_accepting=rng.random() < 0.3)
+        self.model.add_state(state)
+
+    def remove_state(self):
+        state = self.rng.choice(list(self.model.states))
+        for transition in list(self.model.transitions):
+            if state in (transition.source, transition.destination):
+                self.model.remove_transition(transition)
+        self.model.remove_state(state)
+
+    def add_transition(self):
+        states = list(self.model.states)
+        self.model.add_transition(self.TransitionItem(self.rng.choice(states), self.rng.choice(states), "a"))
+
+    def remove_transition(self):
+        self.model.remove_transition(self.rng.choice(list(self.model.transitions)))
+
+    def rename(self):
+        self.rng.choice(list(self.model.states)).name = self.rng.choice("ABCDEFGH")
+
+    def toggle_initial(self):
+        state = self.rng.choice(list(self.model.states))
+        state.is_initial = not state.is_initial
+
+    def toggle_accepting(self):
+        state = self.rng.choice(list(self.model.states))
+        state.is_accepting = not state.is_accepting
+
+    def edit(self, structural_only: bool = False):
+        edits = [self.add_state, self.add_state]
+        if self.model.states:
+            edits += [self.remove_state, self.add_transition, self.add_transition]
+            if not structural_only:
+                edits += [self.rename, self.toggle_initial, self.toggle_accepting]
+        if self.model.transitions:
+            edits.append(self.remove_transition)
+        self.rng.choice(edits)()
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_incremental_validation_matches_rebuild(model, seed):
+    from app.core.validator import FSMValidator
+    validator = FSMValidator(model)
+    editor = RandomEditor(model, random.Random(seed))
+
+    for step in range(300):
+        if step % 10 == 0:
+            # Add/remove-only batches replay their events, mixed ones rebuild
+            with model.batch():
+                for _ in range(5):
+                    editor.edit(structural_only=step % 20 == 0)
+        else:
+            editor.edit()
+
+        fresh = FSMValidator(model)
+        assert counters(validator) == counters(fresh)
+        assert issues(validator) == issues(fresh)
+        model.on_item_change_remove(fresh._on_item_change)
+
+        if step % 7 == 0:
+            # Let the validator settle its reachable set, as a finished run does
+            validator.validate_now()
+            assert issues(validator) == issues(fresh)
+
+    validator.shutdown()